@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import { ArrowPathIcon, ArrowDownTrayIcon } from '@heroicons/react/24/outline';
 import TransactionsTable from '../components/Table/TransactionsTable';
@@ -26,6 +26,10 @@ const TransactionsPage = () => {
     itemsPerPage: 10
   });
 
+  // Keyset cursors of the page on screen; the backend ignores them once the
+  // filters or sort no longer match
+  const pageCursorsRef = useRef(null);
+
   // Filter state
   const [filters, setFilters] = useState({
     search: '',
@@ -71,11 +75,18 @@ const TransactionsPage = () => {
     try {
       setLoading(true);
       
-      // Load banks and cost centers in parallel
-      const [banksResponse, costCentersResponse] = await Promise.all([
-        window.electronAPI.callPython({ action: 'get_banks_list' }),
-        window.electronAPI.callPython({ action: 'get_cost_centers_list' })
-      ]);
+      // Load banks and cost centers in one round-trip
+      const batchResponse = await window.electronAPI.callPython({
+        action: 'batch',
+        payload: {
+          snapshot: true,
+          requests: [
+            { action: 'get_banks_list' },
+            { action: 'get_cost_centers_list' }
+          ]
+        }
+      });
+      const [banksResponse, costCentersResponse] = batchResponse.results || [batchResponse, batchResponse];
 
       if (banksResponse.success) {
         setBanks(banksResponse.banks || []);
@@ -114,19 +125,34 @@ const TransactionsPage = () => {
         sort_direction: sortDirection
       };
 
-      const [transactionsResponse, statisticsResponse] = await Promise.all([
-        window.electronAPI.callPython({
-          action: 'get_transactions_filtered',
-          payload: params
-        }),
-        window.electronAPI.callPython({
-          action: 'get_transaction_statistics',
-          payload: { ...filters }
-        })
-      ]);
+      // Stepping to an adjacent page seeks from the current page's boundary
+      const lastPage = pageCursorsRef.current;
+      if (lastPage && pagination.currentPage === lastPage.page + 1 && lastPage.nextCursor) {
+        params.cursor = lastPage.nextCursor;
+      } else if (lastPage && pagination.currentPage === lastPage.page - 1 && lastPage.prevCursor) {
+        params.cursor = lastPage.prevCursor;
+      }
+
+      // Listing and statistics read the same snapshot in one round-trip
+      const batchResponse = await window.electronAPI.callPython({
+        action: 'batch',
+        payload: {
+          snapshot: true,
+          requests: [
+            { action: 'get_transactions_filtered', payload: params },
+            { action: 'get_transaction_statistics', payload: { ...filters } }
+          ]
+        }
+      });
+      const [transactionsResponse, statisticsResponse] = batchResponse.results || [batchResponse, batchResponse];
 
       if (transactionsResponse.success) {
         setTransactions(transactionsResponse.transactions || []);
+        pageCursorsRef.current = {
+          page: pagination.currentPage,
+          nextCursor: transactionsResponse.pagination?.nextCursor,
+          prevCursor: transactionsResponse.pagination?.prevCursor
+        };
         setPagination(prev => ({
           ...prev,
           totalPages: transactionsResponse.pagination?.totalPages || 0,
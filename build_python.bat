@@ -45,6 +45,15 @@ pyinstaller --onefile ^
     --hidden-import google_sheets_manager ^
     --hidden-import home_data_manager ^
     --hidden-import transaction_manager ^
+    --hidden-import schema_migrations ^
+    --hidden-import action_registry ^
+    --hidden-import month_aggregates ^
+    --hidden-import transaction_import ^
+    --hidden-import transaction_export ^
+    --hidden-import query_cache ^
+    --hidden-import ledger ^
+    --hidden-import analytics_snapshot ^
+    --hidden-import downsample ^
     --add-data "auth_manager.py;." ^
     --add-data "bank_manager.py;." ^
     --add-data "billing_manager.py;." ^
@@ -54,6 +63,15 @@ pyinstaller --onefile ^
     --add-data "google_sheets_manager.py;." ^
     --add-data "home_data_manager.py;." ^
     --add-data "transaction_manager.py;." ^
+    --add-data "schema_migrations.py;." ^
+    --add-data "action_registry.py;." ^
+    --add-data "month_aggregates.py;." ^
+    --add-data "transaction_import.py;." ^
+    --add-data "transaction_export.py;." ^
+    --add-data "query_cache.py;." ^
+    --add-data "ledger.py;." ^
+    --add-data "analytics_snapshot.py;." ^
+    --add-data "downsample.py;." ^
     --add-data "requirements.txt;." ^
     --console ^
     main_handler.py
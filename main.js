@@ -3,6 +3,7 @@ const path = require('path');
 const fs = require('fs').promises;
 const fsSync = require('fs');
 const { spawn } = require('child_process'); // Add this import
+const readline = require('readline');
 
 const isDev = process.env.NODE_ENV === 'development' || !app.isPackaged;
 
@@ -112,9 +113,178 @@ app.on('activate', () => {
   if (BrowserWindow.getAllWindows().length === 0) createWindow();
 });
 
-// ---------------------- FIXED PYTHON LOGIC ---------------------- //
+// ---------------------- RESIDENT PYTHON BACKEND ---------------------- //
+// One long-lived `main_handler --server` process answers framed JSON requests
+// (see python_backend/PROTOCOL.md). If it cannot be started we fall back to
+// spawning one process per call.
+
+const PYTHON_SERVER_DISABLED = process.env.PYTHON_BACKEND_MODE === 'spawn';
+const PYTHON_SERVER_MAX_RESTARTS = 3;
+const PYTHON_CALL_TIMEOUT_MS = 30000;
+// Actions that work through whole statements, exports or remote sheets, or
+// over every row, may run for minutes and are never timed out; a batch is
+// untimed when any of its requests is
+const PYTHON_UNTIMED_ACTIONS = new Set([
+  'import_transactions', 'import_transaction_files', 'export_transactions', 'export_billing_data',
+  'sync_google_sheets', 'verify_ledger', 'repair_ledger', 'rebuild_month_aggregates'
+]);
+
+function pythonCallTimeout(action, payload) {
+  const actions = action === 'batch' ? (payload.requests || []).map((request) => request.action) : [action];
+  return actions.some((name) => PYTHON_UNTIMED_ACTIONS.has(name)) ? null : PYTHON_CALL_TIMEOUT_MS;
+}
+
+const pythonServer = {
+  process: null,
+  ready: null,
+  nextId: 1,
+  pending: new Map(),
+  restarts: 0
+};
+
+function startPythonServer() {
+  const args = isDev ? [SCRIPT_PATH, '--server'] : ['--server'];
+  const serverProcess = spawn(PYTHON_EXECUTABLE, args);
+  pythonServer.process = serverProcess;
+
+  pythonServer.ready = new Promise((resolve) => {
+    const lines = readline.createInterface({ input: serverProcess.stdout });
+
+    lines.on('line', (line) => {
+      let frame;
+      try {
+        frame = JSON.parse(line);
+      } catch (parseError) {
+        console.error(`[Python Server] Ignoring non-JSON output: ${line}`);
+        return;
+      }
+
+      if (frame.event === 'ready') {
+        console.log(`[Python Server] Ready (protocol ${frame.protocol})`);
+        resolve(true);
+        return;
+      }
+      if (frame.event === 'error') {
+        console.error(`[Python Server] Failed to start: ${frame.error}`);
+        resolve(false);
+        return;
+      }
+
+      const call = pythonServer.pending.get(frame.id);
+      if (!call) {
+        console.error(`[Python Server] Response for unknown request id: ${frame.id}`);
+        return;
+      }
+      if (frame.event === 'progress') {
+        // A long-running action is still alive: restart its timeout and tell the UI
+        if (call.timeout) {
+          clearTimeout(call.timer);
+          call.timer = setTimeout(call.onTimeout, call.timeout);
+        }
+        if (mainWindow && !mainWindow.isDestroyed()) {
+          mainWindow.webContents.send('python-progress', { action: call.action, ...frame.data });
+        }
+        return;
+      }
+      pythonServer.pending.delete(frame.id);
+      clearTimeout(call.timer);
+      call.resolve(frame.result);
+      armPythonCallTimer();
+    });
+
+    serverProcess.stderr.on('data', (data) => {
+      console.error(`[Python Server] ${data}`);
+    });
+
+    serverProcess.on('error', (error) => {
+      console.error(`[Python Server] Process error: ${error.message}`);
+      resolve(false);
+    });
+
+    serverProcess.on('close', (code) => {
+      console.log(`[Python Server] Process exited with code: ${code}`);
+      resolve(false);
+      if (pythonServer.process === serverProcess) {
+        pythonServer.process = null;
+        pythonServer.ready = null;
+      }
+      for (const [id, call] of pythonServer.pending) {
+        clearTimeout(call.timer);
+        call.resolve({
+          success: false,
+          error: `Python server exited with code ${code} before answering`
+        });
+        pythonServer.pending.delete(id);
+      }
+    });
+  });
+
+  return pythonServer.ready;
+}
+
+// The server answers in order, so only the oldest pending request is running;
+// a request's timeout starts when it reaches the front of the queue, not while
+// it waits behind a long import
+function armPythonCallTimer() {
+  const call = pythonServer.pending.values().next().value;
+  if (call && call.timeout && !call.timer) {
+    call.timer = setTimeout(call.onTimeout, call.timeout);
+  }
+}
+
+async function getPythonServer() {
+  if (PYTHON_SERVER_DISABLED) return null;
+
+  if (!pythonServer.process) {
+    if (pythonServer.restarts >= PYTHON_SERVER_MAX_RESTARTS) return null;
+    pythonServer.restarts += 1;
+    startPythonServer();
+  }
+
+  const isReady = await pythonServer.ready;
+  return isReady ? pythonServer.process : null;
+}
+
+function stopPythonServer() {
+  if (!pythonServer.process) return;
+  try {
+    pythonServer.process.stdin.end(JSON.stringify({ id: 'shutdown', action: 'shutdown' }) + '\n');
+  } catch (error) {
+    pythonServer.process.kill();
+  }
+}
 
 async function callPythonLogic({ action, payload = {} }) {
+  const serverProcess = await getPythonServer();
+  if (!serverProcess) {
+    return callPythonSpawn({ action, payload });
+  }
+
+  return new Promise((resolve) => {
+    const id = pythonServer.nextId++;
+    console.log(`[Python Server] Request ${id}: ${action} with payload:`, payload);
+
+    const timeout = pythonCallTimeout(action, payload);
+    const onTimeout = () => {
+      pythonServer.pending.delete(id);
+      resolve({
+        success: false,
+        error: `Python server did not answer ${action} within ${timeout / 1000} seconds`
+      });
+      armPythonCallTimer();
+    };
+
+    pythonServer.pending.set(id, { resolve, timer: null, timeout, onTimeout, action });
+    serverProcess.stdin.write(JSON.stringify({ id, action, payload }) + '\n');
+    armPythonCallTimer();
+  });
+}
+
+app.on('will-quit', stopPythonServer);
+
+// ---------------------- FIXED PYTHON LOGIC ---------------------- //
+
+async function callPythonSpawn({ action, payload = {} }) {
   return new Promise((resolve, reject) => {
     console.log(`[Python] Calling action: ${action} with payload:`, payload);
     
@@ -205,13 +375,16 @@ async function callPythonLogic({ action, payload = {} }) {
       });
     });
     
-    setTimeout(() => {
-      pythonProcess.kill();
-      resolve({
-        success: false,
-        error: 'Python process timed out after 30 seconds'
-      });
-    }, 30000);
+    const timeout = pythonCallTimeout(action, payload);
+    if (timeout) {
+      setTimeout(() => {
+        pythonProcess.kill();
+        resolve({
+          success: false,
+          error: `Python process timed out after ${timeout / 1000} seconds`
+        });
+      }, timeout);
+    }
   });
 }
 // ---------------------- IPC HANDLERS ---------------------- //
@@ -321,9 +494,13 @@ ipcMain.handle('export-transactions', async (event, options) => {
   }
 });
 
-ipcMain.handle('import-transactions', async (event, filePath) => {
+ipcMain.handle('import-transactions', async (event, filePath, options = {}) => {
   try {
-    const result = await callPythonLogic({ action: 'import_transactions', payload: { file_path: filePath } });
+    // options.stream imports large files in chunks and reports python-progress events
+    const result = await callPythonLogic({
+      action: 'import_transactions',
+      payload: { ...options, file_path: filePath }
+    });
     return result;
   } catch (error) {
     console.error('Error importing transactions:', error);
@@ -331,6 +508,20 @@ ipcMain.handle('import-transactions', async (event, filePath) => {
   }
 });
 
+ipcMain.handle('import-transaction-files', async (event, filePaths, options = {}) => {
+  try {
+    // Parses every file and sheet in parallel; progress arrives as python-progress events
+    const result = await callPythonLogic({
+      action: 'import_transaction_files',
+      payload: { ...options, file_paths: filePaths }
+    });
+    return result;
+  } catch (error) {
+    console.error('Error importing transaction files:', error);
+    return { success: false, error: error.message };
+  }
+});
+
 // Google Sheets sync handler
 ipcMain.handle('sync-google-sheets', async () => {
   try {
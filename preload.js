@@ -30,7 +30,8 @@ contextBridge.exposeInMainWorld('electronAPI', {
   
   // Banking specific operations
   exportTransactions: (options) => ipcRenderer.invoke('export-transactions', options),
-  importTransactions: (filePath) => ipcRenderer.invoke('import-transactions', filePath),
+  importTransactions: (filePath, options) => ipcRenderer.invoke('import-transactions', filePath, options),
+  importTransactionFiles: (filePaths, options) => ipcRenderer.invoke('import-transaction-files', filePaths, options),
   
   // Google Sheets operations
   syncGoogleSheets: () => ipcRenderer.invoke('sync-google-sheets'),
@@ -45,6 +46,7 @@ contextBridge.exposeInMainWorld('electronAPI', {
   // Event listeners for app updates
   onAppUpdate: (callback) => ipcRenderer.on('app-update', callback),
   onDataSync: (callback) => ipcRenderer.on('data-sync', callback),
+  onPythonProgress: (callback) => ipcRenderer.on('python-progress', callback),
   
   // Remove event listeners
   removeAllListeners: (channel) => ipcRenderer.removeAllListeners(channel)
@@ -0,0 +1,256 @@
+"""
+Action Registry Module
+Maps action names to handlers along with their payload schema and metadata
+"""
+
+import json
+import sys
+import time
+
+from query_cache import DATA_TABLES, bump_versions, cache_key, read_versions
+
+ACTIONS = {}
+
+# name -> {"count", "total_ms", "max_ms"} for every action dispatched in this process
+ACTION_TIMINGS = {}
+
+# Where report_progress() sends updates; the server points it at the current request
+_progress_sink = None
+
+# Cache for actions registered with cache=...; None disables caching
+_result_cache = None
+
+
+class ActionSpec:
+    """Everything the dispatcher needs to know about one action"""
+
+    def __init__(self, name, handler, schema=None, error=None, read_only=False, managers=(),
+                 cache=(), writes=None, cache_scope=None, prefetch=None):
+        self.name = name
+        self.handler = handler
+        # {"required": [...]} keys must be present, {"non_empty": [...]} must also be truthy
+        self.schema = schema or {}
+        self.error = error
+        self.read_only = read_only
+        self.managers = tuple(managers)
+        # Tables a cached result depends on; empty means the action is not cached
+        self.cache = tuple(cache)
+        # cache_scope(conn, payload, managers) -> finer versions the result depends on
+        self.cache_scope = cache_scope
+        # prefetch(payload) -> payloads worth computing ahead after serving payload
+        self.prefetch = prefetch
+        # Tables whose data version a write action bumps; all of them unless declared
+        self.writes = () if read_only else tuple(DATA_TABLES if writes is None else writes)
+
+    def validate(self, payload):
+        """Return an error message when the payload does not match the schema"""
+        if not isinstance(payload, dict):
+            return "Payload must be a JSON object"
+
+        missing = [field for field in self.schema.get('required', ()) if field not in payload]
+        missing += [field for field in self.schema.get('non_empty', ()) if not payload.get(field)]
+        if missing:
+            return self.error or f"Missing required fields: {', '.join(missing)}"
+        return None
+
+    @property
+    def cached(self):
+        return bool(self.cache or self.cache_scope)
+
+
+def action(name, schema=None, error=None, read_only=False, managers=(), cache=(), writes=None,
+           cache_scope=None, prefetch=None):
+    """Register the decorated function as the handler for an action.
+
+    The handler is called as handler(payload, managers) after the payload has
+    been validated against the schema and the listed managers have been built.
+    Read-only actions run inside one snapshot connection. A read-only action
+    with cache=(tables) has its successful results cached until one of those
+    tables changes, or until the versions its cache_scope returns change;
+    other actions bump the data version of the tables in writes (every table
+    when not given) once they have run. prefetch lists the payloads to cache
+    ahead after a request (see prefetch_requests).
+    """
+    def register(handler):
+        if name in ACTIONS:
+            raise ValueError(f"Action registered twice: {name}")
+        if (cache or cache_scope or prefetch) and not read_only:
+            raise ValueError(f"Only read-only actions can be cached: {name}")
+        ACTIONS[name] = ActionSpec(name, handler, schema, error, read_only, managers, cache, writes,
+                                   cache_scope, prefetch)
+        return handler
+    return register
+
+
+def get_action(name):
+    """Look up the spec for an action, or None"""
+    return ACTIONS.get(name)
+
+
+def set_progress_sink(sink):
+    """Route progress reports to sink(data), or back to stderr when sink is None"""
+    global _progress_sink
+    _progress_sink = sink
+
+
+def set_result_cache(cache):
+    """Install the query cache (query_cache.MemoryCache or DiskCache), or None"""
+    global _result_cache
+    _result_cache = cache
+
+
+def get_result_cache():
+    """The installed query cache, or None"""
+    return _result_cache
+
+
+def report_progress(data):
+    """Report progress of the running action.
+
+    The resident server forwards it to the client as a progress event for the
+    current request; in spawn mode it is written to stderr.
+    """
+    if _progress_sink is not None:
+        _progress_sink(data)
+    else:
+        sys.stderr.write(f"Progress: {json.dumps(data)}\n")
+        sys.stderr.flush()
+
+
+def record_timing(name, elapsed_ms):
+    """Add one run of an action to the per-action timing table"""
+    timing = ACTION_TIMINGS.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+    timing["count"] += 1
+    timing["total_ms"] += elapsed_ms
+    timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+
+
+def _bump_versions(managers, tables):
+    try:
+        with managers['db'].transaction() as conn:
+            bump_versions(conn, tables)
+    except Exception as e:
+        # Cached reads of these tables can no longer be trusted in this process
+        if _result_cache is not None:
+            _result_cache.clear()
+        sys.stderr.write(f"Failed to bump data versions: {e}\n")
+        sys.stderr.flush()
+
+
+def _cache_versions(spec, conn, payload, managers):
+    """Versions a cached result of spec must match, or None when the payload
+    has no valid scope (the handler then reports the error itself)"""
+    versions = read_versions(conn, spec.cache) if spec.cache else []
+    if spec.cache_scope is not None:
+        try:
+            versions += list(spec.cache_scope(conn, payload, managers))
+        except Exception:
+            return None
+    return versions
+
+
+def dispatch(name, payload, managers):
+    """Validate, route and time a single action"""
+    spec = ACTIONS.get(name)
+    if spec is None:
+        return {"success": False, "error": f"Unknown enhanced action: {name}"}
+
+    error = spec.validate(payload)
+    if error:
+        return {"success": False, "error": error}
+
+    start = time.perf_counter()
+    try:
+        for manager_name in spec.managers:
+            managers[manager_name]
+    except Exception as init_error:
+        return {"success": False, "error": f"Failed to initialize managers: {str(init_error)}"}
+
+    if spec.read_only:
+        with managers['db'].shared_connection(snapshot=True) as conn:
+            cache = _result_cache if spec.cached else None
+            result = None
+            if cache is not None:
+                # Versions first: the snapshot then holds data at least this new
+                versions = _cache_versions(spec, conn, payload, managers)
+                if versions is None:
+                    cache = None
+            if cache is not None:
+                key = cache_key(name, payload, managers['auth'].current_user_id)
+                result = cache.get(name, key, versions)
+            if result is None:
+                result = spec.handler(payload, managers)
+                if cache is not None and result.get('success'):
+                    cache.put(name, key, versions, result)
+    else:
+        try:
+            result = spec.handler(payload, managers)
+        finally:
+            if spec.writes:
+                _bump_versions(managers, spec.writes)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    record_timing(name, elapsed_ms)
+    sys.stderr.write(f"Debug: Action={name} took {elapsed_ms:.1f}ms\n")
+    sys.stderr.flush()
+    return result
+
+
+def prefetch_requests(name, payload, result):
+    """(action, payload) pairs worth caching ahead after name served payload"""
+    spec = ACTIONS.get(name)
+    if spec is None or spec.prefetch is None or not isinstance(result, dict) or not result.get('success'):
+        return []
+    try:
+        return [(name, ahead) for ahead in spec.prefetch(payload)]
+    except Exception:
+        return []
+
+
+def uncached(requests, managers):
+    """The (action, payload) pairs of requests warm would compute: those of
+    cached actions with a valid payload that are not in the cache already"""
+    cache = _result_cache
+    if cache is None:
+        return []
+    missing = []
+    with managers['db'].shared_connection(snapshot=True) as conn:
+        for name, payload in requests:
+            spec = ACTIONS.get(name)
+            if spec is None or not spec.cached or spec.validate(payload):
+                continue
+            for manager_name in spec.managers:
+                managers[manager_name]
+            versions = _cache_versions(spec, conn, payload, managers)
+            if versions is None:
+                continue
+            if not cache.contains(cache_key(name, payload, managers['auth'].current_user_id), versions):
+                missing.append((name, payload))
+    return missing
+
+
+def warm(name, payload, managers):
+    """Compute a cached read ahead of its request unless it is already cached.
+
+    Returns True when a result was computed and stored. Nothing is timed or
+    counted as a hit or miss, so the cache stats keep describing requests.
+    """
+    spec = ACTIONS.get(name)
+    cache = _result_cache
+    if spec is None or cache is None or not spec.cached or spec.validate(payload):
+        return False
+    for manager_name in spec.managers:
+        managers[manager_name]
+
+    with managers['db'].shared_connection(snapshot=True) as conn:
+        versions = _cache_versions(spec, conn, payload, managers)
+        if versions is None:
+            return False
+        key = cache_key(name, payload, managers['auth'].current_user_id)
+        if cache.contains(key, versions):
+            return False
+        result = spec.handler(payload, managers)
+        if not result.get('success'):
+            return False
+        cache.put(name, key, versions, result, prefetch=True)
+    return True
@@ -0,0 +1,457 @@
+"""
+Analytics Snapshot Module
+Columnar copy of one user's transactions for vectorized group-bys
+
+The snapshot keeps a few NumPy columns per transaction: id, date as an int32
+day number (days since 1970-01-01), the signed amount (see ledger), and the
+bank and cost center as int32 codes into small dictionaries. Columns live in
+raw files under a per-user directory and are opened with np.memmap, so
+opening a snapshot reads only its meta.json.
+
+Rows are stored in segments. A refresh appends the rows with ids above the
+newest one seen as a new segment; rows deleted or changed since (recorded in
+transaction_tombstones, schema migration 8) are dropped and re-read, which
+rewrites the segments into one. Every refresh writes new files and then
+replaces meta.json, so a reader in another process always sees a complete
+snapshot. A snapshot of another database (database_id in app_settings) is
+rebuilt, and so is one older than every row the log still keeps (it is
+capped, schema migration 10). Aggregations run per segment with np.bincount and are summed.
+"""
+
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+
+import ledger
+
+FORMAT_VERSION = 1
+
+COLUMNS = {
+    'id': np.int64,
+    'day': np.int32,
+    'amount': np.float64,
+    'bank': np.int32,
+    'cost_center': np.int32,
+}
+
+GROUP_KEYS = ('year', 'month', 'day', 'bank', 'cost_center')
+
+# Rows read from the database per batch while refreshing
+FETCH_SIZE = 100000
+
+# More segments than this are merged into one on the next refresh
+MAX_SEGMENTS = 8
+
+# Group-bys with more possible groups than this count with np.unique instead
+# of dense np.bincount arrays
+DENSE_GROUPS_LIMIT = 4_000_000
+
+# Unreferenced segment files older than this many seconds are deleted
+ORPHAN_AGE = 60
+
+# Parameters per IN (...) list; SQLite's default limit is 999
+ID_BATCH = 500
+
+# Unparseable dates are left out; cost_center -1 stands for none
+ROWS_SQL = f'''
+    SELECT t.id,
+           CAST(julianday(substr(t.date, 1, 10)) - 2440587.5 AS INTEGER),
+           {ledger.MOVEMENT_SQL.format(t='t.')},
+           t.bank_id,
+           COALESCE(t.cost_center_id, -1)
+    FROM transactions t
+    CROSS JOIN bank b ON b.id = t.bank_id
+    WHERE b.user_id = ? AND julianday(substr(t.date, 1, 10)) IS NOT NULL AND {{where}}
+    ORDER BY t.id
+'''
+
+
+def snapshot_directory(db_path, user_id):
+    """Where the snapshot of one user of a database lives"""
+    base = os.path.splitext(os.path.abspath(db_path))[0]
+    return f"{base}_analytics{os.sep}user_{int(user_id)}"
+
+
+def day_number(value):
+    """Day number of an ISO date string"""
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+def day_string(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def month_string(month):
+    return str(np.datetime64(int(month), 'M'))
+
+
+class AnalyticsSnapshot:
+    """The on-disk columnar snapshot of one user's transactions"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta = None
+        self.segments = []
+        self._lookups = {}
+
+    @classmethod
+    def open(cls, directory):
+        """Map an existing snapshot, or return an empty one to be refreshed"""
+        snapshot = cls(directory)
+        try:
+            with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as handle:
+                meta = json.load(handle)
+            if meta.get('format') == FORMAT_VERSION:
+                snapshot._load(meta)
+        except (OSError, ValueError, KeyError):
+            snapshot.meta = None
+            snapshot.segments = []
+        return snapshot
+
+    @property
+    def rows(self):
+        return self.meta['rows'] if self.meta else 0
+
+    def _load(self, meta):
+        segments = []
+        for segment in meta['segments']:
+            columns = {}
+            for column, dtype in COLUMNS.items():
+                path = self._path(segment['name'], column)
+                if segment['rows'] == 0:
+                    columns[column] = np.empty(0, dtype)
+                else:
+                    columns[column] = np.memmap(path, dtype=dtype, mode='r', shape=(segment['rows'],))
+            segments.append(columns)
+        self.meta = meta
+        self.segments = segments
+        self._lookups = {key: {value: code for code, value in enumerate(meta[key])}
+                         for key in ('banks', 'cost_centers')}
+
+    def _path(self, segment_name, column):
+        return os.path.join(self.directory, f"{segment_name}.{column}.bin")
+
+    def _empty_meta(self, user_id, database_id):
+        return {
+            'format': FORMAT_VERSION,
+            'user_id': user_id,
+            'database_id': database_id,
+            'last_id': 0,
+            'tombstone_seq': 0,
+            'rows': 0,
+            'min_day': None,
+            'max_day': None,
+            'banks': [],
+            'cost_centers': [],
+            'segments': []
+        }
+
+    def refresh(self, conn, user_id):
+        """Bring the snapshot up to date with the database.
+
+        Call inside a read transaction so the tombstones and rows come from
+        one state. Returns {"appended", "removed", "rebuilt"}.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM app_settings WHERE key = 'database_id'")
+        row = cursor.fetchone()
+        database_id = row[0] if row else None
+        cursor.execute('SELECT COALESCE(MAX(seq), 0), COALESCE(MIN(seq), 1) FROM transaction_tombstones')
+        tombstone_seq, oldest_seq = cursor.fetchone()
+
+        # The log keeps only its newest rows; a snapshot that has not seen
+        # the ones dropped before oldest_seq cannot be patched
+        meta = self.meta
+        rebuilt = (meta is None or meta['user_id'] != user_id or meta['database_id'] != database_id
+                   or meta['tombstone_seq'] > tombstone_seq or meta['tombstone_seq'] < oldest_seq - 1)
+        if rebuilt:
+            self.segments = []
+            self._lookups = {'banks': {}, 'cost_centers': {}}
+            meta = self._empty_meta(user_id, database_id)
+        else:
+            meta = json.loads(json.dumps(meta))
+
+        # Rows the snapshot may hold that were deleted or changed since
+        changed = []
+        if meta['tombstone_seq'] < tombstone_seq and meta['last_id']:
+            cursor.execute('''
+                SELECT DISTINCT transaction_id FROM transaction_tombstones
+                WHERE seq > ? AND transaction_id <= ?
+            ''', (meta['tombstone_seq'], meta['last_id']))
+            changed = [row[0] for row in cursor.fetchall()]
+
+        keep = None
+        removed = 0
+        if changed:
+            changed_ids = np.array(changed, dtype=np.int64)
+            keep = [~np.isin(segment['id'], changed_ids) for segment in self.segments]
+            removed = sum(int((~mask).sum()) for mask in keep)
+
+        batches = [(ROWS_SQL.format(where='t.id > ?'), (user_id, meta['last_id']))]
+        # Changed rows that still exist come back with their new values
+        for start in range(0, len(changed) if removed else 0, ID_BATCH):
+            ids = changed[start:start + ID_BATCH]
+            batches.append((ROWS_SQL.format(where=f"t.id IN ({', '.join('?' * len(ids))})"), (user_id, *ids)))
+
+        merge = removed > 0 or len(self.segments) >= MAX_SEGMENTS
+        writer = _SegmentWriter(self.directory)
+        if merge:
+            # Carry the kept rows over into the new segment, in slices so a
+            # large snapshot is never copied into memory whole
+            for index, segment in enumerate(self.segments):
+                for start in range(0, len(segment['id']), FETCH_SIZE * 10):
+                    stop = start + FETCH_SIZE * 10
+                    columns = {column: np.asarray(values[start:stop]) for column, values in segment.items()}
+                    if keep is not None:
+                        mask = keep[index][start:stop]
+                        columns = {column: values[mask] for column, values in columns.items()}
+                    writer.write(columns)
+
+        appended = 0
+        for sql, params in batches:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                writer.write(self._encode(rows, meta))
+                appended += len(rows)
+
+        if not (rebuilt or removed or appended or merge):
+            if meta['tombstone_seq'] != tombstone_seq:
+                meta['tombstone_seq'] = tombstone_seq
+                self._publish(meta)
+            return {"appended": 0, "removed": 0, "rebuilt": False}
+
+        segment = writer.close()
+        segments = [] if merge else list(meta['segments'])
+        if segment['rows']:
+            segments.append(segment)
+        else:
+            writer.discard()
+        meta['segments'] = segments
+        meta['rows'] = sum(entry['rows'] for entry in segments)
+        meta['tombstone_seq'] = tombstone_seq
+        if writer.max_id is not None:
+            meta['last_id'] = max(meta['last_id'], writer.max_id)
+        for bound, pick in (('min_day', min), ('max_day', max)):
+            values = [value for value in (meta[bound], getattr(writer, bound)) if value is not None]
+            meta[bound] = pick(values) if values else None
+
+        self._publish(meta)
+        return {"appended": appended, "removed": removed, "rebuilt": rebuilt}
+
+    def _encode(self, rows, meta):
+        """Columns for a batch of ROWS_SQL rows, extending the dictionaries"""
+        table = np.array(rows, dtype=np.float64)
+        return {
+            'id': table[:, 0].astype(np.int64),
+            'day': table[:, 1].astype(np.int32),
+            'amount': table[:, 2],
+            'bank': self._codes(table[:, 3].astype(np.int64), meta, 'banks'),
+            'cost_center': self._codes(table[:, 4].astype(np.int64), meta, 'cost_centers'),
+        }
+
+    def _codes(self, values, meta, key):
+        dictionary = meta[key]
+        lookup = self._lookups.setdefault(key, {})
+        unique, inverse = np.unique(values, return_inverse=True)
+        codes = np.empty(len(unique), dtype=np.int32)
+        for index, value in enumerate(unique.tolist()):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            codes[index] = code
+        return codes[inverse]
+
+    def _publish(self, meta):
+        """Atomically point meta.json at the new segments, then drop old files"""
+        temporary = os.path.join(self.directory, f"meta.{uuid.uuid4().hex}.tmp")
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle)
+        os.replace(temporary, os.path.join(self.directory, 'meta.json'))
+
+        self.segments = []
+        self._load(meta)
+        # Recent files may be a segment another process is still writing
+        live = {segment['name'] for segment in meta['segments']}
+        cutoff = time.time() - ORPHAN_AGE
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.split('.')[0] in live or not name.endswith(('.bin', '.tmp')):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                # Still mapped by a reader (Windows); a later refresh retries
+                pass
+
+    def group_totals(self, group_by, start_day=None, end_day=None, bank_ids=None):
+        """Income, expense and count per group of the non-empty groups.
+
+        group_by is a sequence of GROUP_KEYS; day bounds are half-open day
+        numbers. Returns (keys, income, expense, count) where keys maps each
+        group key to a list: day/month/year numbers since 1970, and bank_id
+        and cost_center_id (None for none) for the dictionary-coded keys.
+        """
+        unknown = [key for key in group_by if key not in GROUP_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown group keys: {', '.join(unknown)}")
+        empty = ({key: [] for key in group_by}, np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64))
+        if not self.rows:
+            return empty
+
+        low = self.meta['min_day'] if start_day is None else max(start_day, self.meta['min_day'])
+        high = self.meta['max_day'] + 1 if end_day is None else min(end_day, self.meta['max_day'] + 1)
+        if low >= high:
+            return empty
+        in_range = low > self.meta['min_day'] or high <= self.meta['max_day']
+
+        # Every group is one index into a flat array of shape `shape`. The
+        # day-based keys of all rows of one day add up to the same part of the
+        # index, so they come from one table over the days in range.
+        days = np.arange(low, high, dtype=np.int32)
+        offsets = []
+        shape = []
+        for key in group_by:
+            if key == 'day':
+                offsets.append(low)
+                shape.append(high - low)
+            elif key in ('month', 'year'):
+                first, last = _calendar_key(days[[0, -1]], key)
+                offsets.append(int(first))
+                shape.append(int(last - first) + 1)
+            else:
+                offsets.append(0)
+                shape.append(len(self.meta['banks' if key == 'bank' else 'cost_centers']))
+        strides = [int(np.prod(shape[index + 1:], dtype=np.int64)) for index in range(len(shape))]
+        groups = int(np.prod(shape, dtype=np.int64))
+
+        day_table = None
+        coded = []
+        for key, offset, stride in zip(group_by, offsets, strides):
+            if key in ('bank', 'cost_center'):
+                coded.append((key, stride))
+                continue
+            values = days if key == 'day' else _calendar_key(days, key)
+            part = (values.astype(np.int64) - offset) * stride
+            day_table = part if day_table is None else day_table + part
+
+        bank_codes = None
+        if bank_ids is not None:
+            bank_codes = np.array([self._lookups['banks'][bank_id] for bank_id in bank_ids
+                                   if bank_id in self._lookups['banks']], dtype=np.int32)
+
+        dense = groups <= DENSE_GROUPS_LIMIT
+        if dense:
+            income = np.zeros(groups)
+            net = np.zeros(groups)
+            count = np.zeros(groups, dtype=np.int64)
+        else:
+            parts = []
+
+        for segment in self.segments:
+            columns = segment
+            mask = None
+            if in_range:
+                mask = (segment['day'] >= low) & (segment['day'] < high)
+            if bank_codes is not None:
+                in_banks = np.isin(segment['bank'], bank_codes)
+                mask = in_banks if mask is None else mask & in_banks
+            if mask is not None:
+                columns = {column: values[mask] for column, values in segment.items() if column != 'id'}
+            amount = columns['amount']
+            if not len(amount):
+                continue
+
+            index = day_table[columns['day'] - low] if day_table is not None else None
+            for key, stride in coded:
+                part = columns[key].astype(np.int64) * stride
+                index = part if index is None else index + part
+            if index is None:
+                index = np.zeros(len(amount), dtype=np.int64)
+
+            positive = np.maximum(amount, 0.0)
+            if dense:
+                income += np.bincount(index, weights=positive, minlength=groups)
+                net += np.bincount(index, weights=amount, minlength=groups)
+                count += np.bincount(index, minlength=groups)
+            else:
+                parts.append((index, positive, np.asarray(amount)))
+
+        if dense:
+            present = np.flatnonzero(count)
+            income, net, count = income[present], net[present], count[present]
+        else:
+            if not parts:
+                return empty
+            present, inverse = np.unique(np.concatenate([part[0] for part in parts]), return_inverse=True)
+            income = np.bincount(inverse, weights=np.concatenate([part[1] for part in parts]))
+            net = np.bincount(inverse, weights=np.concatenate([part[2] for part in parts]))
+            count = np.bincount(inverse)
+        expense = np.maximum(income - net, 0.0)
+
+        keys = {}
+        for key, offset, values in zip(group_by, offsets, np.unravel_index(present, shape) if shape else ()):
+            values = (values + offset).tolist()
+            if key == 'bank':
+                keys[key] = [self.meta['banks'][code] for code in values]
+            elif key == 'cost_center':
+                keys[key] = [None if value == -1 else value
+                             for value in (self.meta['cost_centers'][code] for code in values)]
+            else:
+                keys[key] = values
+        return keys, income, expense, count
+
+
+def _calendar_key(day, key):
+    """Months or years since 1970 of day numbers"""
+    unit = 'M' if key == 'month' else 'Y'
+    return day.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+
+
+class _SegmentWriter:
+    """Writes one new segment's column files, batch by batch"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = f"seg-{uuid.uuid4().hex[:12]}"
+        self.rows = 0
+        self.max_id = None
+        self.min_day = None
+        self.max_day = None
+        self._handles = None
+
+    def write(self, columns):
+        if not len(columns['id']):
+            return
+        if self._handles is None:
+            self._handles = {column: open(os.path.join(self.directory, f"{self.name}.{column}.bin"), 'wb')
+                             for column in COLUMNS}
+        for column, dtype in COLUMNS.items():
+            np.ascontiguousarray(columns[column], dtype=dtype).tofile(self._handles[column])
+        self.rows += len(columns['id'])
+        batch_max = int(columns['id'].max())
+        self.max_id = batch_max if self.max_id is None else max(self.max_id, batch_max)
+        low, high = int(columns['day'].min()), int(columns['day'].max())
+        self.min_day = low if self.min_day is None else min(self.min_day, low)
+        self.max_day = high if self.max_day is None else max(self.max_day, high)
+
+    def close(self):
+        if self._handles is not None:
+            for handle in self._handles.values():
+                handle.close()
+        return {"name": self.name, "rows": self.rows}
+
+    def discard(self):
+        for column in COLUMNS:
+            try:
+                os.remove(os.path.join(self.directory, f"{self.name}.{column}.bin"))
+            except OSError:
+                pass
@@ -4,28 +4,25 @@ Handles user authentication, registration, and session management
 """
 
 import hashlib
-import jwt
-from google.auth.transport import requests
-from google.oauth2 import id_token
 
 
 class AuthManager:
     def __init__(self, db_manager):
         self.db = db_manager
         self.current_user_id = None
+        self._current_user = None
         self.load_current_user()
     
     def load_current_user(self):
         """Load the current logged-in user from settings"""
+        self._current_user = None
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM app_settings WHERE key = 'current_user_id'")
-            result = cursor.fetchone()
-            conn.close()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT value FROM app_settings WHERE key = 'current_user_id'")
+                result = cursor.fetchone()
             
-            if result:
-                self.current_user_id = int(result[0])
+            self.current_user_id = int(result[0]) if result else None
         except Exception as e:
             print(f"Error loading current user: {e}")
             self.current_user_id = None
@@ -33,35 +30,34 @@ class AuthManager:
     def save_current_user(self, user_id):
         """Save the current logged-in user to settings"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO app_settings (key, value, updated_at)
-                VALUES ('current_user_id', ?, CURRENT_TIMESTAMP)
-            ''', (str(user_id),))
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO app_settings (key, value, updated_at)
+                    VALUES ('current_user_id', ?, CURRENT_TIMESTAMP)
+                ''', (str(user_id),))
             self.current_user_id = user_id
+            self._current_user = None
         except Exception as e:
             print(f"Error saving current user: {e}")
     
     def clear_current_user(self):
         """Clear the current logged-in user"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM app_settings WHERE key = 'current_user_id'")
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM app_settings WHERE key = 'current_user_id'")
             self.current_user_id = None
+            self._current_user = None
         except Exception as e:
             print(f"Error clearing current user: {e}")
             
     def get_current_user(self):
-        """Get the currently logged-in user's data"""
-        if self.current_user_id:
-            return self.get_user_by_id(self.current_user_id)
-        return None
+        """Get the currently logged-in user's data (resolved once per session load)"""
+        if not self.current_user_id:
+            return None
+        if self._current_user is None or self._current_user['id'] != self.current_user_id:
+            self._current_user = self.get_user_by_id(self.current_user_id)
+        return self._current_user
     
     def hash_password(self, password):
         """Hash password using SHA-256"""
@@ -70,27 +66,24 @@ class AuthManager:
     def register_user(self, name, email, password):
         """Register a new user"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            # Check if user already exists
-            cursor.execute("SELECT id FROM user WHERE email = ?", (email,))
-            if cursor.fetchone():
-                conn.close()
-                return {"success": False, "error": "User with this email already exists"}
+                # Check if user already exists
+                cursor.execute("SELECT id FROM user WHERE email = ?", (email,))
+                if cursor.fetchone():
+                    return {"success": False, "error": "User with this email already exists"}
             
-            # Hash password
-            hashed_password = self.hash_password(password)
+                # Hash password
+                hashed_password = self.hash_password(password)
             
-            # Insert new user
-            cursor.execute('''
-                INSERT INTO user (name, email, password, role)
-                VALUES (?, ?, ?, 'user')
-            ''', (name, email, hashed_password))
+                # Insert new user
+                cursor.execute('''
+                    INSERT INTO user (name, email, password, role)
+                    VALUES (?, ?, ?, 'user')
+                ''', (name, email, hashed_password))
             
-            user_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+                user_id = cursor.lastrowid
             
             # Auto-login the new user
             self.save_current_user(user_id)
@@ -108,29 +101,25 @@ class AuthManager:
     def login_user(self, email, password):
         """Login user with email and password"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            # Get user by email
-            hashed_password = self.hash_password(password)
-            cursor.execute('''
-                SELECT id, name, email, role FROM user 
-                WHERE email = ? AND password = ?
-            ''', (email, hashed_password))
-            
-            user = cursor.fetchone()
+                # Get user by email
+                hashed_password = self.hash_password(password)
+                cursor.execute('''
+                    SELECT id, name, email, role FROM user 
+                    WHERE email = ? AND password = ?
+                ''', (email, hashed_password))
             
-            if not user:
-                conn.close()
-                return {"success": False, "error": "Invalid email or password"}
+                user = cursor.fetchone()
             
-            # Update last login
-            cursor.execute('''
-                UPDATE user SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-            ''', (user[0],))
+                if not user:
+                    return {"success": False, "error": "Invalid email or password"}
             
-            conn.commit()
-            conn.close()
+                # Update last login
+                cursor.execute('''
+                    UPDATE user SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (user[0],))
             
             # Save current user
             self.save_current_user(user[0])
@@ -154,6 +143,10 @@ class AuthManager:
     def google_auth(self, credential):
         """Handle Google OAuth authentication"""
         try:
+            # google-auth is only needed here, so keep it out of start-up
+            from google.auth.transport import requests
+            from google.oauth2 import id_token
+
             # Verify the Google ID token
             GOOGLE_CLIENT_ID = "YOUR_GOOGLE_CLIENT_ID"  # Replace with your actual client ID
             
@@ -169,46 +162,43 @@ class AuthManager:
             if not email:
                 return {"success": False, "error": "No email provided by Google"}
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            # Check if user exists
-            cursor.execute("SELECT id, name, email, role FROM user WHERE email = ?", (email,))
-            user = cursor.fetchone()
+                # Check if user exists
+                cursor.execute("SELECT id, name, email, role FROM user WHERE email = ?", (email,))
+                user = cursor.fetchone()
             
-            if user:
-                # Update Google token and last login
-                cursor.execute('''
-                    UPDATE user SET google_token = ?, last_login = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                ''', (credential, user[0]))
+                if user:
+                    # Update Google token and last login
+                    cursor.execute('''
+                        UPDATE user SET google_token = ?, last_login = CURRENT_TIMESTAMP 
+                        WHERE id = ?
+                    ''', (credential, user[0]))
                 
-                user_data = {
-                    "id": user[0],
-                    "name": user[1],
-                    "email": user[2],
-                    "role": user[3],
-                    "google_token": credential
-                }
-                user_id = user[0]
-            else:
-                # Create new user
-                cursor.execute('''
-                    INSERT INTO user (name, email, google_token, role)
-                    VALUES (?, ?, ?, 'user')
-                ''', (name, email, credential))
+                    user_data = {
+                        "id": user[0],
+                        "name": user[1],
+                        "email": user[2],
+                        "role": user[3],
+                        "google_token": credential
+                    }
+                    user_id = user[0]
+                else:
+                    # Create new user
+                    cursor.execute('''
+                        INSERT INTO user (name, email, google_token, role)
+                        VALUES (?, ?, ?, 'user')
+                    ''', (name, email, credential))
                 
-                user_id = cursor.lastrowid
-                user_data = {
-                    "id": user_id,
-                    "name": name,
-                    "email": email,
-                    "role": "user",
-                    "google_token": credential
-                }
-            
-            conn.commit()
-            conn.close()
+                    user_id = cursor.lastrowid
+                    user_data = {
+                        "id": user_id,
+                        "name": name,
+                        "email": email,
+                        "role": "user",
+                        "google_token": credential
+                    }
             
             # Save current user
             self.save_current_user(user_data["id"])
@@ -225,15 +215,14 @@ class AuthManager:
     def get_user_by_id(self, user_id):
         """Get user data by ID"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, name, email, role, google_sheet, google_token, last_login
-                FROM user WHERE id = ?
-            ''', (user_id,))
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, name, email, role, google_sheet, google_token, last_login
+                    FROM user WHERE id = ?
+                ''', (user_id,))
             
-            user = cursor.fetchone()
-            conn.close()
+                user = cursor.fetchone()
             
             if user:
                 return {
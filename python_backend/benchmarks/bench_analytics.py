@@ -0,0 +1,141 @@
+"""
+Analytics Snapshot Benchmark
+Builds the columnar analytics snapshot of a large transactions table, times
+opening it, its group-bys against the same GROUP BY in SQLite (checking both
+agree), incremental refreshes after inserts and deletes, and the rebuild
+once more rows changed than the tombstone log keeps
+"""
+
+import argparse
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+
+import analytics_snapshot
+import ledger
+from schema_migrations import TOMBSTONE_LIMIT
+
+# group_by -> (SQL key expressions, how a summary group maps to that key)
+GROUPINGS = {
+    'month': (["strftime('%Y-%m', substr(t.date, 1, 10))"], lambda g: (g['month'],)),
+    'year,cost_center': (["CAST(strftime('%Y', substr(t.date, 1, 10)) AS INTEGER)", 't.cost_center_id'],
+                         lambda g: (g['year'], g['cost_center_id'])),
+    'bank,month': (['t.bank_id', "strftime('%Y-%m', substr(t.date, 1, 10))"],
+                   lambda g: (g['bank_id'], g['month'])),
+    'day': (['substr(t.date, 1, 10)'], lambda g: (g['day'],)),
+}
+
+
+def sql_totals(conn, user_id, expressions):
+    """The same totals as get_analytics_summary, straight from SQLite"""
+    movement = ledger.MOVEMENT_SQL.format(t='t.')
+    keys = ', '.join(expressions)
+    rows = conn.execute(f'''
+        SELECT {keys},
+               TOTAL(MAX({movement}, 0)), TOTAL(MAX(-({movement}), 0)), COUNT(*)
+        FROM transactions t
+        JOIN bank b ON b.id = t.bank_id
+        WHERE b.user_id = ?
+        GROUP BY {keys}
+    ''', (user_id,)).fetchall()
+    width = len(expressions)
+    return {tuple(row[:width]): tuple(row[width:]) for row in rows}
+
+
+def check(summary, expected, key_of):
+    actual = {key_of(group): (group['income'], group['expense'], group['count']) for group in summary['groups']}
+    assert actual.keys() == expected.keys(), (len(actual), len(expected))
+    for key, (income, expense, count) in expected.items():
+        got = actual[key]
+        assert got[2] == count and abs(got[0] - income) < 0.01 and abs(got[1] - expense) < 0.01, (key, got)
+
+
+def timed(handle_action, managers, payload):
+    start = time.perf_counter()
+    result = handle_action('get_analytics_summary', payload, managers)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert result['success'], result
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+        start = time.perf_counter()
+        bank_ids = seed_transactions(managers, handle_action, args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+        user_id = managers['auth'].get_current_user()['id']
+        conn = managers['db'].get_connection()
+
+        result, elapsed = timed(handle_action, managers, {'group_by': 'year'})
+        print(f"build: {elapsed:.0f}ms, {result['snapshot']}")
+
+        directory = analytics_snapshot.snapshot_directory(managers['db'].db_path, user_id)
+        start = time.perf_counter()
+        snapshot = analytics_snapshot.AnalyticsSnapshot.open(directory)
+        print(f"open: {(time.perf_counter() - start) * 1000:.2f}ms, {snapshot.rows} rows")
+
+        print(f"{'group by':>18} {'groups':>7} {'snapshot ms':>12} {'sql ms':>9}")
+        for group_by, (expressions, key_of) in GROUPINGS.items():
+            samples = []
+            for _ in range(args.repeat):
+                summary, elapsed = timed(handle_action, managers, {'group_by': group_by})
+                samples.append(elapsed)
+            start = time.perf_counter()
+            expected = sql_totals(conn, user_id, expressions)
+            sql_ms = (time.perf_counter() - start) * 1000
+            check(summary, expected, key_of)
+            print(f"{group_by:>18} {len(summary['groups']):>7} {min(samples):12.1f} {sql_ms:9.0f}")
+
+        summary, elapsed = timed(handle_action, managers, {'group_by': 'month,cost_center', 'start': '2022-01-01',
+                                                           'end': '2023-01-01', 'bank_ids': bank_ids[:2]})
+        print(f"one year of two banks by month and cost center: {elapsed:.1f}ms, {len(summary['groups'])} groups")
+
+        # New rows are appended; deleted and edited rows are dropped and re-read
+        with managers['db'].transaction() as write_conn:
+            write_conn.executemany('''
+                INSERT INTO transactions (
+                    bank_id, bank_name, account_name, price, state, fee, before_balance, after_balance, date
+                ) VALUES (?, 'Bank 0', 'ACC-0', ?, 'Income', 0, 0, 0, '2024-12-31')
+            ''', [(bank_ids[0], float(index)) for index in range(1000)])
+        _, elapsed = timed(handle_action, managers, {'group_by': 'year'})
+        print(f"refresh after 1000 inserts: {elapsed:.0f}ms")
+
+        with managers['db'].transaction() as write_conn:
+            write_conn.execute('DELETE FROM transactions WHERE id IN (SELECT id FROM transactions ORDER BY id LIMIT 100)')
+            write_conn.execute("UPDATE transactions SET state = 'Income' WHERE id % 1000 = 7")
+        result, elapsed = timed(handle_action, managers, {'group_by': 'year'})
+        print(f"refresh after 100 deletes and {args.rows // 1000} edits: {elapsed:.0f}ms, {result['snapshot']}")
+
+        for group_by, (expressions, key_of) in GROUPINGS.items():
+            summary, _ = timed(handle_action, managers, {'group_by': group_by})
+            check(summary, sql_totals(conn, user_id, expressions), key_of)
+        print("snapshot matches SQL after refreshes")
+
+        # Past the tombstone cap the snapshot is rebuilt rather than patched
+        passes = 0
+        while conn.execute('SELECT MIN(seq) FROM transaction_tombstones').fetchone()[0] <= 1:
+            with managers['db'].transaction() as write_conn:
+                write_conn.execute('UPDATE transactions SET date = date')
+            passes += 1
+        kept = conn.execute('SELECT COUNT(*) FROM transaction_tombstones').fetchone()[0]
+        assert kept == TOMBSTONE_LIMIT, kept
+        result, elapsed = timed(handle_action, managers, {'group_by': 'year'})
+        assert result['snapshot']['rebuilt'], result['snapshot']
+        print(f"refresh after {passes} edits of every row: {elapsed:.0f}ms, {result['snapshot']}")
+        for group_by, (expressions, key_of) in GROUPINGS.items():
+            summary, _ = timed(handle_action, managers, {'group_by': group_by})
+            check(summary, sql_totals(conn, user_id, expressions), key_of)
+        print("snapshot matches SQL after a rebuild")
+
+        managers['db'].close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Backend Mode Benchmark
+Compares per-call latency of spawn-per-call against the resident --server mode
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HANDLER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_handler.py')
+
+
+def summarize(label, samples):
+    """Print latency figures for a list of samples in seconds"""
+    ms = sorted(sample * 1000 for sample in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label:<8} calls={len(ms):<5} mean={statistics.mean(ms):8.1f}ms "
+          f"p50={statistics.median(ms):8.1f}ms p95={p95:8.1f}ms")
+    return statistics.mean(ms)
+
+
+def bench_spawn(workdir, action, payload, calls):
+    """Run one process per call, exactly like callPythonLogic does today"""
+    args = [sys.executable, HANDLER, action]
+    if payload:
+        args += ['--payload', json.dumps(payload)]
+
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        completed = subprocess.run(args, cwd=workdir, capture_output=True, text=True)
+        samples.append(time.perf_counter() - start)
+        json.loads(completed.stdout.strip().splitlines()[-1])
+    return samples
+
+
+def bench_server(workdir, action, payload, calls):
+    """Start one resident process and send every call over stdin"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, HANDLER, '--server'],
+        cwd=workdir, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, text=True, bufsize=1
+    )
+    ready = json.loads(process.stdout.readline())
+    if ready.get('event') != 'ready':
+        raise RuntimeError(f"Server failed to start: {ready}")
+    startup = time.perf_counter() - start
+
+    samples = []
+    for request_id in range(calls):
+        start = time.perf_counter()
+        process.stdin.write(json.dumps({"id": request_id, "action": action, "payload": payload}) + "\n")
+        process.stdin.flush()
+        response = json.loads(process.stdout.readline())
+        samples.append(time.perf_counter() - start)
+        if response['id'] != request_id:
+            raise RuntimeError(f"Out of order response: {response}")
+
+    process.stdin.write(json.dumps({"id": 'bye', "action": 'shutdown'}) + "\n")
+    process.stdin.flush()
+    process.wait(timeout=10)
+    return startup, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--action', default='check_auth_status')
+    parser.add_argument('--payload', default='{}', help='JSON payload sent with every call')
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+    payload = json.loads(args.payload)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"action={args.action} calls={args.calls}")
+        spawn_mean = summarize('spawn', bench_spawn(workdir, args.action, payload, args.calls))
+        startup, samples = bench_server(workdir, args.action, payload, args.calls)
+        server_mean = summarize('server', samples)
+        print(f"server start-up (one-off): {startup * 1000:.1f}ms")
+        print(f"speed-up per call: {spawn_mean / server_mean:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Balance Series Benchmark
+Times get_bank_balance_series over five years of one bank against reading
+every transaction's after_balance and keeping each day's last one, checks
+both agree, and reports the size of the downsampled series
+"""
+
+import argparse
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+
+
+def scan_daily_balances(conn, bank_id, start, end):
+    """Closing balance per day with transactions, from a full pass over the bank's rows"""
+    closing = {}
+    for day, balance in conn.execute('''
+        SELECT substr(date, 1, 10), after_balance FROM transactions
+        WHERE bank_id = ? AND date >= ? AND date < ?
+        ORDER BY date, id
+    ''', (bank_id, start, end)):
+        closing[day] = balance
+    return closing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--banks', type=int, default=5)
+    parser.add_argument('--points', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+        bank_ids = seed_transactions(managers, handle_action, args.rows, banks=args.banks)
+        conn = managers['db'].get_connection()
+        bank_id = bank_ids[0]
+        start, end = '2020-01-01', '2025-01-01'
+
+        def series(**options):
+            began = time.perf_counter()
+            result = handle_action('get_bank_balance_series', dict(
+                {'bank_id': bank_id, 'start_date': start, 'end_date': end}, **options), managers)
+            assert result['success'], result
+            return result['data'], (time.perf_counter() - began) * 1000
+
+        full, elapsed = series()
+        print(f"daily series: {len(full['points'])} days in {elapsed:.0f}ms")
+
+        began = time.perf_counter()
+        closing = scan_daily_balances(conn, bank_id, start, end)
+        print(f"full scan of {args.rows // args.banks} rows: {(time.perf_counter() - began) * 1000:.0f}ms")
+        for point in full['points']:
+            if point['date'] in closing:
+                assert abs(point['balance'] - closing[point['date']]) < 1e-6, point
+
+        for method in ('lttb', 'min_max'):
+            sampled, elapsed = series(points=args.points, method=method)
+            print(f"{method}: {len(sampled['points'])} of {sampled['totalPoints']} points in {elapsed:.0f}ms")
+
+        managers['db'].close()
+
+
+if __name__ == '__main__':
+    main()
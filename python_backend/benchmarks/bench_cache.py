@@ -0,0 +1,101 @@
+"""
+Read Cache Benchmark
+Replays a session of page re-renders and back-and-forth paging against a
+large transactions table without a cache, with the in-memory cache of the
+resident server and with the on-disk cache of spawn-per-call processes, then
+checks that a write invalidates what it changed
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+from bench_pagination import report
+
+from action_registry import get_result_cache, set_result_cache
+from query_cache import DiskCache, MemoryCache
+
+
+def session_calls(month):
+    """The reads a user triggers while switching between pages and paging"""
+    listing = {'limit': 50, 'sort_field': 'date', 'sort_direction': 'desc'}
+    return [
+        ('get_transactions_filtered', listing),
+        ('get_transactions_filtered', dict(listing, page=2)),
+        ('get_transactions_filtered', dict(listing, page=3)),
+        ('get_transactions_filtered', dict(listing, page=2)),
+        ('get_transactions_filtered', listing),
+        ('get_transaction_statistics', {}),
+        ('get_banks_list', {}),
+        ('get_cost_center_options', {}),
+        ('get_dashboard_data', {'month': month}),
+        ('get_home_data', {}),
+    ]
+
+
+def run_session(handle_action, managers, calls, rounds):
+    """Per-action latencies in ms over `rounds` replays of the session"""
+    samples = {}
+    for _ in range(rounds):
+        for name, payload in calls:
+            start = time.perf_counter()
+            result = handle_action(name, payload, managers)
+            samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+            assert result['success'], (name, result)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--month', default='2023-06')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+
+        start = time.perf_counter()
+        seed_transactions(managers, handle_action, args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        calls = session_calls(args.month)
+        caches = (
+            ('none', None),
+            ('memory', MemoryCache()),
+            ('disk', DiskCache(os.path.join(workdir, 'app_database_cache.db'))),
+        )
+        for label, cache in caches:
+            set_result_cache(cache)
+            samples = run_session(handle_action, managers, calls, args.rounds)
+            total = sum(sum(values) for values in samples.values())
+            print(f"{label} cache: session total {total / args.rounds:.1f}ms per round")
+            for name, values in samples.items():
+                report(f"  {name}", values)
+            if cache is not None:
+                stats = cache.describe()
+                print(f"  hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.2f} "
+                      f"entries={stats['entries']} bytes={stats['bytes']}")
+
+        # A write must invalidate every cached read of the tables it changes,
+        # and only those
+        cache = get_result_cache()
+        listing = handle_action('get_transactions_filtered', {'limit': 50}, managers)
+        options_before = cache.describe()['actions']['get_cost_center_options']['hits']
+        newest = listing['transactions'][0]['id']
+        assert handle_action('delete_transaction', {'transaction_id': newest}, managers)['success']
+        listing = handle_action('get_transactions_filtered', {'limit': 50}, managers)
+        assert listing['transactions'][0]['id'] != newest, "stale listing served after a delete"
+        handle_action('get_cost_center_options', {}, managers)
+        assert cache.describe()['actions']['get_cost_center_options']['hits'] == options_before + 1
+        print("invalidation ok")
+
+        set_result_cache(None)
+        cache.close()
+        managers['db'].close()
+
+
+if __name__ == '__main__':
+    main()
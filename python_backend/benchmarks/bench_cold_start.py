@@ -0,0 +1,90 @@
+"""
+Cold Start Benchmark
+Runs one spawn-mode action under `python -X importtime`, reports import cost per
+module in milliseconds and fails when the cold start exceeds the budget
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+HANDLER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_handler.py')
+
+# "import time:       123 |       4567 |   package.module"
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_import_times(stderr):
+    """Return (module, self_ms, cumulative_ms, depth) for every imported module"""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            depth = (len(indent) - 1) // 2
+            modules.append((module, int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return modules
+
+
+def run_cold_start(workdir, action, payload):
+    """Run the action in a fresh interpreter and return (wall seconds, stderr)"""
+    args = [sys.executable, '-X', 'importtime', HANDLER, action]
+    if payload:
+        args += ['--payload', json.dumps(payload)]
+
+    start = time.perf_counter()
+    completed = subprocess.run(args, cwd=workdir, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    json.loads(completed.stdout.strip().splitlines()[-1])
+    return elapsed, completed.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--action', default='check_auth_status')
+    parser.add_argument('--payload', default='{}', help='JSON payload sent with the action')
+    parser.add_argument('--budget-ms', type=float, default=300.0,
+                        help='maximum allowed wall time for the cold start')
+    parser.add_argument('--top', type=int, default=15, help='number of modules to list')
+    parser.add_argument('--forbid', default='pandas,numpy,gspread,google,jwt',
+                        help='comma separated top-level packages a light action must not import')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # First run creates the scratch database; measure the second one
+        run_cold_start(workdir, args.action, json.loads(args.payload))
+        elapsed, stderr = run_cold_start(workdir, args.action, json.loads(args.payload))
+
+    modules = parse_import_times(stderr)
+    top_level = sorted((m for m in modules if m[3] == 0), key=lambda m: m[2], reverse=True)
+
+    print(f"action={args.action}")
+    print(f"{'module':<40} {'self ms':>9} {'cumulative ms':>14}")
+    for module, self_ms, cumulative_ms, _ in top_level[:args.top]:
+        print(f"{module:<40} {self_ms:9.1f} {cumulative_ms:14.1f}")
+
+    imports_ms = sum(m[2] for m in top_level)
+    print(f"total import time: {imports_ms:.1f}ms")
+    print(f"cold start wall time: {elapsed * 1000:.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failures = []
+    forbidden = {name for name in args.forbid.split(',') if name}
+    loaded = sorted({m[0].split('.')[0] for m in modules} & forbidden)
+    if loaded:
+        failures.append(f"heavy packages imported: {', '.join(loaded)}")
+    if elapsed * 1000 > args.budget_ms:
+        failures.append("cold start over budget")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark Data
+Builds scratch databases with a user, banks, cost centers and a large
+transactions table for the benchmarks in this folder
+"""
+
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_scratch_managers(workdir):
+    """Build the managers against app_database.db inside workdir, logged in as one user"""
+    os.chdir(workdir)
+    from main_handler import build_managers, handle_action
+
+    managers = build_managers()
+    handle_action('register_user', {'name': 'Bench', 'email': 'bench@example.com',
+                                    'password': 'secret'}, managers)
+    return managers, handle_action
+
+
+def seed_transactions(managers, handle_action, rows, banks=5, cost_centers=8,
+                      start=date(2020, 1, 1), days=5 * 365, seed=7):
+    """Insert `rows` transactions spread over `banks` banks and `days` days.
+
+    Rows go in with executemany inside one transaction; prices are stored
+    positive with the state giving the direction, as add_bill and imports
+    write them, balances are chained per bank in date order so before/after
+    balances are consistent, and the monthly aggregates are refreshed like
+    any other writer would.
+    Returns the list of bank ids.
+    """
+    import month_aggregates
+
+    bank_ids = []
+    for index in range(banks):
+        result = handle_action('add_bank', {'bank_name': f'Bank {index}', 'account': f'ACC-{index}',
+                                            'current_balance': 0}, managers)
+        bank_ids.append(result['bank_id'])
+
+    cost_center_ids = []
+    for index in range(cost_centers):
+        result = handle_action('add_cost_center', {'group': f'Group {index % 3}',
+                                                   'cost_center': f'Center {index}',
+                                                   'area': 'Bench'}, managers)
+        cost_center_ids.append(result['cost_center_id'])
+
+    rng = random.Random(seed)
+    balances = {bank_id: 0.0 for bank_id in bank_ids}
+    per_bank = rows // banks
+
+    def generate(bank_index, bank_id):
+        offsets = sorted(rng.randrange(days) for _ in range(per_bank))
+        for offset in offsets:
+            price = round(rng.uniform(1, 2000), 2)
+            state = 'Income' if rng.random() < 0.4 else 'Expense'
+            signed = price if state == 'Income' else -price
+            before = balances[bank_id]
+            balances[bank_id] = before + signed
+            cost_center_index = rng.randrange(len(cost_center_ids))
+            yield (bank_id, cost_center_ids[cost_center_index], f'Bank {bank_index}', f'ACC-{bank_index}',
+                   price, state, 0.0, f'Center {cost_center_index}', before, balances[bank_id],
+                   (start + timedelta(days=offset)).isoformat())
+
+    with managers['db'].transaction() as conn:
+        for bank_index, bank_id in enumerate(bank_ids):
+            conn.executemany('''
+                INSERT INTO transactions (
+                    bank_id, cost_center_id, bank_name, account_name, price, state,
+                    fee, cost_center_name, before_balance, after_balance, date
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', generate(bank_index, bank_id))
+            conn.execute('UPDATE bank SET current_balance = ? WHERE id = ?',
+                         (balances[bank_id], bank_id))
+            month_aggregates.refresh_bank(conn.cursor(), bank_id)
+    return bank_ids
@@ -0,0 +1,39 @@
+"""
+Export Benchmark
+Seeds scratch databases of growing size and runs export_transactions in a
+fresh spawn-mode process for CSV and XLSX, reporting rows/sec and peak memory
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_data import build_scratch_managers, seed_transactions
+from bench_import_memory import run_action
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100000,1000000', help='comma separated row counts')
+    parser.add_argument('--formats', default='csv,excel')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'format':<7} {'time s':>8} {'rows/s':>10} {'peak RSS MB':>12} {'peak anon MB':>13}")
+    for rows in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as workdir:
+            managers, handle_action = build_scratch_managers(workdir)
+            seed_transactions(managers, handle_action, rows)
+            managers['db'].close()
+            os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+            for format_type in args.formats.split(','):
+                target = os.path.join(workdir, f'export_{format_type}')
+                result, elapsed, peak_mb, anon_mb = run_action(
+                    workdir, 'export_transactions', {'format': format_type, 'file_path': target})
+                assert result['success'] and result['records_exported'] == rows, result
+                anon = f"{anon_mb:13.1f}" if anon_mb is not None else f"{'n/a':>13}"
+                print(f"{rows:>9} {format_type:<7} {elapsed:8.2f} {rows / elapsed:10.0f} {peak_mb:12.1f} {anon}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Import Benchmark
+Generates statement CSVs of the requested sizes and times import_transactions
+on each against a fresh scratch database, then times importing the same file
+again, which skips every row by its import fingerprint
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from bench_data import build_scratch_managers
+
+
+def write_statement(path, rows, accounts=12, days=365, seed=11):
+    """Write a CSV statement spread over `accounts` accounts and `days` days"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('date,bank_name,account_name,price,state,fee,cost_center_name\n')
+        for _ in range(rows):
+            account = rng.randrange(accounts)
+            day = start + timedelta(days=rng.randrange(days))
+            state = 'Income' if rng.random() < 0.4 else 'Expense'
+            handle.write(f'{day.isoformat()},Bank {account % 4},{1000 + account},'
+                         f'{rng.uniform(1, 2000):.2f},{state},{rng.choice((0, 0, 0.5, 1.5))},'
+                         f'Center {rng.randrange(8)}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100000,1000000', help='comma separated row counts')
+    parser.add_argument('--accounts', type=int, default=12)
+    args = parser.parse_args()
+
+    for rows in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as workdir:
+            managers, handle_action = build_scratch_managers(workdir)
+            path = os.path.join(workdir, f'statement_{rows}.csv')
+            write_statement(path, rows, accounts=args.accounts)
+
+            start = time.perf_counter()
+            result = handle_action('import_transactions', {'file_path': path}, managers)
+            elapsed = time.perf_counter() - start
+            assert result['success'] and result['imported_count'] == rows, result
+
+            print(f"rows={rows:<9} time={elapsed:8.2f}s throughput={rows / elapsed:10.0f} rows/s")
+
+            start = time.perf_counter()
+            result = handle_action('import_transactions', {'file_path': path}, managers)
+            elapsed = time.perf_counter() - start
+            assert result['success'] and result['skipped_count'] == rows, result
+            print(f"rows={rows:<9} re-import time={elapsed:8.2f}s (all skipped)")
+            managers['db'].close()
+            os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Import Memory Benchmark
+Runs import_transactions in a fresh spawn-mode process for growing statement
+sizes and reports the peak RSS of the bulk and streaming modes
+
+Peak RSS includes the database pages SQLite maps in through mmap_size, which
+are file-backed and grow with the database rather than with the import, so the
+peak anonymous (heap) memory is sampled from /proc as well where available.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_import import write_statement
+
+HANDLER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_handler.py')
+
+
+def read_anon_kb(pid):
+    """Current RssAnon of a process in kilobytes, or None off Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run_action(workdir, action, payload):
+    """Run one spawn-mode action.
+
+    Returns (result, wall seconds, peak RSS in MB, peak anonymous RSS in MB or None).
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, HANDLER, action, '--payload', json.dumps(payload)],
+                               cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    peak_anon = [None]
+    finished = threading.Event()
+
+    def sample():
+        while not finished.is_set():
+            current = read_anon_kb(process.pid)
+            if current is None:
+                return
+            peak_anon[0] = max(peak_anon[0] or 0, current)
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    output = process.stdout.read()
+    _, _, usage = os.wait4(process.pid, 0)
+    finished.set()
+    sampler.join()
+    elapsed = time.perf_counter() - start
+    # ru_maxrss and /proc figures are in kilobytes on Linux
+    anon_mb = peak_anon[0] / 1024 if peak_anon[0] is not None else None
+    return json.loads(output.strip().splitlines()[-1]), elapsed, usage.ru_maxrss / 1024, anon_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100000,500000,2000000', help='comma separated row counts')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'mode':<7} {'time s':>8} {'peak RSS MB':>12} {'peak anon MB':>13}")
+    for rows in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as source:
+            path = os.path.join(source, 'statement.csv')
+            write_statement(path, rows)
+
+            for mode, extra in (('bulk', {}), ('stream', {'stream': True, 'chunk_size': args.chunk_size})):
+                with tempfile.TemporaryDirectory() as workdir:
+                    run_action(workdir, 'register_user', {'name': 'Bench', 'email': 'bench@example.com',
+                                                          'password': 'secret'})
+                    result, elapsed, peak_mb, anon_mb = run_action(workdir, 'import_transactions',
+                                                                   dict(extra, file_path=path))
+                    assert result['success'] and result['imported_count'] == rows, result
+                    anon = f"{anon_mb:13.1f}" if anon_mb is not None else f"{'n/a':>13}"
+                    print(f"{rows:>9} {mode:<7} {elapsed:8.2f} {peak_mb:12.1f} {anon}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Ledger Benchmark
+Times delete_transaction at different depths of a bank's balance chain, to
+show the rechain cost follows the rows after the change, then times a full
+verify_ledger pass and the repair of a deliberately broken chain
+"""
+
+import argparse
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+
+DEPTHS = (0.0, 0.01, 0.1, 0.5, 1.0)
+
+
+def timed(handle_action, managers, name, payload):
+    start = time.perf_counter()
+    result = handle_action(name, payload, managers)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert result['success'], result
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--banks', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+        bank_ids = seed_transactions(managers, handle_action, args.rows, banks=args.banks)
+        conn = managers['db'].get_connection()
+
+        # Each depth deletes from its own bank so earlier deletes do not
+        # shorten the chain the next one is measured on
+        print(f"{'rows after':>11} {'delete ms':>10}")
+        for bank_id, depth in zip(bank_ids, DEPTHS):
+            ids = [row[0] for row in conn.execute(
+                'SELECT id FROM transactions WHERE bank_id = ? ORDER BY date DESC, id DESC', (bank_id,))]
+            index = min(int(len(ids) * depth), len(ids) - 1)
+            _, elapsed = timed(handle_action, managers, 'delete_transaction', {'transaction_id': ids[index]})
+            print(f"{index:>11} {elapsed:10.1f}")
+
+        result, elapsed = timed(handle_action, managers, 'verify_ledger', {})
+        assert result['consistent'], result
+        print(f"verify_ledger over {args.rows} rows: {elapsed:.0f}ms")
+
+        # Break one link early in a chain and let repair find and fix it
+        with managers['db'].transaction() as write_conn:
+            write_conn.execute('''
+                UPDATE transactions SET after_balance = after_balance + 100
+                WHERE id = (SELECT id FROM transactions WHERE bank_id = ? ORDER BY date, id LIMIT 1 OFFSET 10)
+            ''', (bank_ids[0],))
+        result, elapsed = timed(handle_action, managers, 'repair_ledger', {})
+        print(f"repair_ledger: {elapsed:.0f}ms, {result['banks']}")
+        result, _ = timed(handle_action, managers, 'verify_ledger', {})
+        assert result['consistent'], result
+
+        managers['db'].close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Month Navigation Benchmark
+Steps through dashboard months like a user would, pausing between clicks,
+against the resident server and against spawn-per-call processes, and
+reports how many clicks the prefetched neighbouring months turned into cache
+hits along with the latency of hits and misses
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+
+HANDLER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_handler.py')
+
+
+def clicks(start_year, bank_id):
+    """A year forward month by month, half a year back, then the same month a year earlier"""
+    months = [f"{start_year}-{month:02d}" for month in range(1, 13)]
+    months += months[-2:-8:-1] + [f"{start_year - 1}-06"]
+    calls = []
+    for month in months:
+        calls.append(('get_dashboard_data', {'month': month}))
+        calls.append(('get_bank_detail_data', {'bank_id': bank_id, 'month': month}))
+    return calls
+
+
+def report(label, samples):
+    """samples are (latency ms, hit) pairs"""
+    hits = [ms for ms, hit in samples if hit]
+    misses = [ms for ms, hit in samples if not hit]
+    line = f"{label:<7} clicks={len(samples)} hits={len(hits)} ({len(hits) / len(samples):.0%})"
+    if hits:
+        line += f" hit p50={statistics.median(hits):.1f}ms"
+    if misses:
+        line += f" miss p50={statistics.median(misses):.1f}ms"
+    print(line)
+
+
+def bench_server(workdir, calls, pause):
+    process = subprocess.Popen([sys.executable, HANDLER, '--server'], cwd=workdir, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    assert json.loads(process.stdout.readline()).get('event') == 'ready'
+
+    def request(request_id, action, payload):
+        process.stdin.write(json.dumps({"id": request_id, "action": action, "payload": payload}) + "\n")
+        process.stdin.flush()
+        while True:
+            frame = json.loads(process.stdout.readline())
+            if frame.get('id') == request_id and 'result' in frame:
+                return frame['result']
+
+    samples = []
+    hits = 0
+    for index, (action, payload) in enumerate(calls):
+        start = time.perf_counter()
+        assert request(index * 2, action, payload)['success']
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = request(index * 2 + 1, 'get_cache_stats', {})['cache']
+        samples.append((elapsed, stats['hits'] > hits))
+        hits = stats['hits']
+        time.sleep(pause)
+
+    request(-1, 'shutdown', {})
+    process.wait()
+    report('server', samples)
+    return stats
+
+
+def bench_spawn(workdir, calls, pause):
+    def run(action, payload):
+        completed = subprocess.run([sys.executable, HANDLER, action, '--payload', json.dumps(payload)],
+                                   cwd=workdir, capture_output=True, text=True)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    samples = []
+    hits = run('get_cache_stats', {})['cache']['hits']
+    for action, payload in calls:
+        start = time.perf_counter()
+        assert run(action, payload)['success']
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = run('get_cache_stats', {})['cache']
+        samples.append((elapsed, stats['hits'] > hits))
+        hits = stats['hits']
+        time.sleep(pause)
+
+    report('spawn', samples)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--year', type=int, default=2023)
+    parser.add_argument('--pause', type=float, default=0.5, help="Seconds between clicks")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+        bank_ids = seed_transactions(managers, handle_action, args.rows)
+        managers['db'].close()
+        calls = clicks(args.year, bank_ids[0])
+
+        stats = bench_server(workdir, calls, args.pause)
+        print(f"        prefetches={stats['prefetches']} entries={stats['entries']}")
+        stats = bench_spawn(workdir, calls, args.pause)
+        print(f"        prefetches={stats['prefetches']} entries={stats['entries']}")
+
+
+if __name__ == '__main__':
+    main()
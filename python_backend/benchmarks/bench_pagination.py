@@ -0,0 +1,77 @@
+"""
+Pagination Benchmark
+Compares page 1 against a deep page of get_transactions_filtered, addressed by
+OFFSET and by keyset cursor, with and without the total count
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+
+
+def time_calls(function, repeats):
+    """Return per-call latencies in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(f"{label:<44} mean={statistics.mean(samples):9.2f}ms p50={statistics.median(samples):9.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--deep-page', type=int, default=10_000)
+    parser.add_argument('--sort-field', default='date')
+    parser.add_argument('--sort-direction', default='desc')
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+
+        start = time.perf_counter()
+        seed_transactions(managers, handle_action, args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        base = {'limit': args.limit, 'sort_field': args.sort_field, 'sort_direction': args.sort_direction}
+
+        def listing(**extra):
+            result = handle_action('get_transactions_filtered', dict(base, **extra), managers)
+            assert result['success'], result
+            return result
+
+        # The cursor a client holds after viewing the page before the deep one
+        previous = listing(page=args.deep_page - 1, include_count=False)
+        deep_cursor = previous['pagination']['nextCursor']
+        assert ([t['id'] for t in listing(page=args.deep_page, include_count=False)['transactions']] ==
+                [t['id'] for t in listing(cursor=deep_cursor, include_count=False)['transactions']])
+
+        # Uncached count: bust the cache before every call
+        def page_one_uncached():
+            managers['transaction']._count_cache.clear()
+            listing(page=1)
+
+        report('page 1, count not cached', time_calls(page_one_uncached, args.repeats))
+        report('page 1, count cached', time_calls(lambda: listing(page=1), args.repeats))
+        report('page 1, count skipped', time_calls(lambda: listing(page=1, include_count=False), args.repeats))
+        report(f'page {args.deep_page}, OFFSET',
+               time_calls(lambda: listing(page=args.deep_page, include_count=False), args.repeats))
+        report(f'page {args.deep_page}, keyset cursor',
+               time_calls(lambda: listing(page=args.deep_page, cursor=deep_cursor, include_count=False),
+                          args.repeats))
+
+        managers['db'].close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Search Benchmark
+Times the transaction search box (page 1 of get_transactions_filtered with a
+`search` term, with and without the total count) through the search index
+and through the three-column LIKE scan it replaces, for selective, broad and
+short terms
+"""
+
+import argparse
+import tempfile
+import time
+
+from bench_data import build_scratch_managers, seed_transactions
+from bench_pagination import report, time_calls
+
+TERMS = ('Center 137', 'Center 1', 'ACC-7', 'Bank', '37', 'zzz')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--banks', type=int, default=20)
+    parser.add_argument('--cost-centers', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+
+        start = time.perf_counter()
+        seed_transactions(managers, handle_action, args.rows, banks=args.banks, cost_centers=args.cost_centers)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        transaction_manager = managers['transaction']
+
+        def like_search(term, probe_rows):
+            like = f"%{term}%"
+            condition = ('(t.cost_center_name LIKE ? OR t.bank_name LIKE ? OR t.account_name LIKE ?)',
+                         [like, like, like])
+            return condition, condition, None
+
+        def search(term, **extra):
+            # Busting the count cache makes every call count like a new keystroke would
+            transaction_manager._count_cache.clear()
+            result = handle_action('get_transactions_filtered', dict({'search': term, 'limit': 50}, **extra),
+                                   managers)
+            assert result['success'], result
+            return result
+
+        for term in TERMS:
+            matches = search(term)['pagination']['totalItems']
+            print(f"'{term}': {matches} matches")
+            for label, compile_search in (('index', None), ('LIKE', like_search)):
+                if compile_search:
+                    transaction_manager._compile_search = compile_search
+                report(f"  {label:<5} page 1 with count", time_calls(lambda: search(term), args.repeats))
+                report(f"  {label:<5} page 1 without count",
+                       time_calls(lambda: search(term, include_count=False), args.repeats))
+                report(f"  {label:<5} expenses since 2024 with count",
+                       time_calls(lambda: search(term, state='Expense', startDate='2024-01-01'), args.repeats))
+            del transaction_manager._compile_search
+
+        managers['db'].close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Ledger Check
+Makes backdated writes against a scratch database, through bills and through
+imports, and fails when a bank's balance chain or closing balance is wrong
+afterwards, verify_ledger does not report the chain as consistent, or a bill
+or its auto-save record disagrees with its transaction
+"""
+
+import csv
+import os
+import sys
+import tempfile
+
+from bench_data import build_scratch_managers
+
+
+def add_bank(handle_action, managers, name, opening):
+    result = handle_action('add_bank', {'bank_name': name, 'account': f'{name}-ACC',
+                                        'current_balance': opening}, managers)
+    assert result['success'], result
+    return result['bank_id']
+
+
+def add_bill(handle_action, managers, bank_id, date, price, state):
+    result = handle_action('add_bill', {'date': date, 'bank_id': bank_id, 'price': price, 'state': state,
+                                        'cost_center_id': None}, managers)
+    assert result['success'], result
+
+
+def write_statement(path, name, rows):
+    """rows are (date, price, state) tuples, written in the given order"""
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('date,bank_name,account_name,price,state,fee,cost_center_name\n')
+        for date, price, state in rows:
+            handle.write(f'{date},{name},{name}-ACC,{price},{state},0,\n')
+    return path
+
+
+def chain(conn, bank_id):
+    """The bank's (date, price, before, after) rows in chain order and its balance"""
+    rows = conn.execute('''
+        SELECT substr(date, 1, 10), price, before_balance, after_balance FROM transactions
+        WHERE bank_id = ? ORDER BY date, id
+    ''', (bank_id,)).fetchall()
+    balance = conn.execute('SELECT current_balance FROM bank WHERE id = ?', (bank_id,)).fetchone()[0]
+    return rows, balance
+
+
+def expect(conn, bank_id, opening, balance):
+    """The chain starts at opening, every link holds and the bank ends at balance"""
+    rows, stored = chain(conn, bank_id)
+    running = opening
+    for date, price, before, after in rows:
+        assert abs(before - running) < 0.005, (bank_id, date, before, running)
+        running = after
+    assert abs(running - balance) < 0.005 and abs(stored - balance) < 0.005, (bank_id, running, stored, balance)
+
+
+def check_verified(handle_action, managers):
+    result = handle_action('verify_ledger', {}, managers)
+    assert result['success'] and result['consistent'], result
+
+
+def check_bills(conn):
+    """Every bill holds the balances of its transaction"""
+    mismatched = conn.execute('''
+        SELECT b.id, b.current_balance, b.after_balance, t.before_balance, t.after_balance
+        FROM billing b JOIN transactions t ON t.billing_id = b.id
+        WHERE ABS(b.current_balance - t.before_balance) > 0.005 OR ABS(b.after_balance - t.after_balance) > 0.005
+    ''').fetchall()
+    assert not mismatched, mismatched
+
+
+def auto_saved(transaction_id, month):
+    """(before_balance, after_balance) add_bill wrote for a transaction to its monthly CSV"""
+    with open(os.path.join('auto_save', f'{month}.csv'), newline='', encoding='utf-8') as handle:
+        for record in csv.DictReader(handle):
+            if int(record['id']) == transaction_id:
+                return float(record['before_balance']), float(record['after_balance'])
+    return None
+
+
+def bank_id_of(conn, name):
+    return conn.execute('SELECT id FROM bank WHERE bank_name = ?', (name,)).fetchone()[0]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+        conn = managers['db'].get_connection()
+
+        # A bill dated before every existing row keeps the opening balance
+        bank_id = add_bank(handle_action, managers, 'Bills', 1000)
+        add_bill(handle_action, managers, bank_id, '2024-03-10', 100, 'Income')
+        add_bill(handle_action, managers, bank_id, '2024-03-05', 30, 'Expense')
+        expect(conn, bank_id, 1000, 1070)
+        check_verified(handle_action, managers)
+        check_bills(conn)
+        backdated = conn.execute("SELECT id FROM transactions WHERE bank_id = ? AND date = '2024-03-05'",
+                                 (bank_id,)).fetchone()[0]
+        assert auto_saved(backdated, '2024-03') == (1000, 970), auto_saved(backdated, '2024-03')
+        print("bill backdated before every row: OK")
+
+        # A bill between two others moves the later bill's balances as well
+        add_bill(handle_action, managers, bank_id, '2024-03-07', 5, 'Income')
+        expect(conn, bank_id, 1000, 1075)
+        check_bills(conn)
+        print("bill backdated between bills: OK")
+
+        # A statement with rows before, between and after the stored ones
+        bank_id = add_bank(handle_action, managers, 'Imports', 1000)
+        add_bill(handle_action, managers, bank_id, '2024-03-10', 100, 'Income')
+        add_bill(handle_action, managers, bank_id, '2024-05-10', 50, 'Expense')
+        statement = write_statement(os.path.join(workdir, 'backdated.csv'), 'Imports', [
+            ('2024-06-01', 200, 'Income'), ('2024-01-15', 20, 'Expense'), ('2024-04-01', 10, 'Income')])
+        result = handle_action('import_transactions', {'file_path': statement}, managers)
+        assert result['success'] and result['imported_count'] == 3, result
+        expect(conn, bank_id, 1000, 1240)
+        check_verified(handle_action, managers)
+        check_bills(conn)
+        print("backdated bulk import: OK")
+
+        # The same through a streamed import, two rows per chunk
+        bank_id = add_bank(handle_action, managers, 'Streams', 1000)
+        add_bill(handle_action, managers, bank_id, '2024-03-10', 100, 'Income')
+        statement = write_statement(os.path.join(workdir, 'streamed.csv'), 'Streams', [
+            ('2024-06-01', 200, 'Income'), ('2024-01-15', 20, 'Expense'),
+            ('2024-04-01', 10, 'Income'), ('2024-02-01', 5, 'Expense')])
+        result = handle_action('import_transactions', {'file_path': statement, 'stream': True,
+                                                       'chunk_size': 2}, managers)
+        assert result['success'] and result['imported_count'] == 4, result
+        expect(conn, bank_id, 1000, 1285)
+        check_verified(handle_action, managers)
+        print("backdated streamed import: OK")
+
+        # And through several files imported together
+        bank_id = add_bank(handle_action, managers, 'Files', 1000)
+        add_bill(handle_action, managers, bank_id, '2024-03-10', 100, 'Income')
+        first = write_statement(os.path.join(workdir, 'first.csv'), 'Files', [('2024-04-01', 10, 'Income')])
+        second = write_statement(os.path.join(workdir, 'second.csv'), 'Files', [('2024-01-15', 20, 'Expense')])
+        result = handle_action('import_transaction_files', {'file_paths': [first, second]}, managers)
+        assert result['success'], result
+        expect(conn, bank_id, 1000, 1090)
+        check_verified(handle_action, managers)
+        print("backdated multi-file import: OK")
+
+        # An unsorted file gets the same balances streamed as in bulk
+        rows = [(f'2024-{(index * 7) % 12 + 1:02d}-{(index * 5) % 28 + 1:02d}', index % 13 + 1,
+                 'Income' if index % 3 == 0 else 'Expense') for index in range(40)]
+        chains = []
+        for name, payload in (('Bulk', {}), ('Stream', {'stream': True, 'chunk_size': 7})):
+            add_bank(handle_action, managers, name, 500)
+            statement = write_statement(os.path.join(workdir, f'{name}.csv'), name, rows)
+            result = handle_action('import_transactions', dict(payload, file_path=statement), managers)
+            assert result['success'] and result['imported_count'] == len(rows), result
+            chains.append(chain(conn, bank_id_of(conn, name)))
+        assert chains[0] == chains[1], chains
+        check_verified(handle_action, managers)
+        print("unsorted file, streamed and bulk: OK")
+
+        managers['db'].close()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print("OK")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Prefetch Check
+Runs main_handler.py --prefetch the way a spawn-per-call process starts it
+(the frozen executable is built from the same script, so it takes the same
+arguments) and fails when the requested reads are not in the disk cache
+afterwards, or when a read whose neighbours are cached would still spawn a
+prefetch process
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_data import build_scratch_managers
+
+HANDLER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_handler.py')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        managers, handle_action = build_scratch_managers(workdir)
+        result = handle_action('add_bank', {'bank_name': 'Prefetch', 'account': 'PF-ACC',
+                                            'current_balance': 100}, managers)
+        assert result['success'], result
+        bank_id = result['bank_id']
+        managers['db'].close()
+
+        from action_registry import prefetch_requests, set_result_cache, uncached
+        from main_handler import build_managers, disk_cache_path
+        from query_cache import DiskCache
+
+        payload = {'bank_id': bank_id, 'month': '2024-03'}
+        requests = prefetch_requests('get_bank_detail_data', payload, {'success': True})
+        assert len(requests) == 3, requests
+
+        completed = subprocess.run([sys.executable, HANDLER, '--prefetch', json.dumps(requests)],
+                                   cwd=workdir, capture_output=True, text=True, timeout=60)
+        assert completed.returncode == 0, completed.stderr
+        assert not completed.stdout.strip(), completed.stdout
+
+        managers = build_managers()
+        cache = DiskCache(disk_cache_path(managers))
+        set_result_cache(cache)
+        stats = cache.describe()
+        assert stats['prefetches'] == 3 and stats['entries'] == 3, stats
+        print("--prefetch entry point: OK")
+
+        missing = uncached(requests, managers)
+        assert missing == [], missing
+        missing = uncached(requests + [('get_bank_detail_data', payload)], managers)
+        assert missing == [('get_bank_detail_data', payload)], missing
+        print("cached neighbours skipped: OK")
+
+        cache.close()
+        managers['db'].close()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print("OK")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Query Plan Check
+Runs the hot actions against a scratch database, captures every statement they
+issue and fails when EXPLAIN QUERY PLAN shows a full scan of an indexed table
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tables that must always be reached through an index on the hot paths
+HOT_TABLES = ('transactions', 'bank', 'billing', 'cost_centers', 'month_transactions')
+
+# "SCAN t", "SCAN transactions USING INDEX ...": a full pass over a table or index
+SCAN_LINE = re.compile(r'^SCAN (\w+)')
+
+# A LIMIT query that walks an index in ORDER BY order stops after LIMIT rows
+ORDERED_INDEX_SCAN = re.compile(r'^SCAN \w+ USING (COVERING )?INDEX ')
+
+# FROM/JOIN <table> [AS] <alias>, used to map plan aliases back to table names
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH', 'INSERT')
+
+
+def seed(handle_action, managers, workdir, banks, rows_per_bank):
+    """Create one user with a handful of banks, cost centers, bills and transactions"""
+    handle_action('register_user', {'name': 'Plan Check', 'email': 'plans@example.com',
+                                    'password': 'secret'}, managers)
+    for index in range(banks):
+        handle_action('add_bank', {'bank_name': f'Bank {index}', 'account': f'ACC-{index}',
+                                   'current_balance': 1000}, managers)
+    handle_action('add_cost_center', {'group': 'Operations', 'cost_center': 'Rent',
+                                      'area': 'Office'}, managers)
+    handle_action('add_bill', {'date': '2024-01-05', 'bank_id': 1, 'price': 50,
+                               'state': 'Expense', 'cost_center_id': 1}, managers)
+
+    csv_path = os.path.join(workdir, 'seed.csv')
+    with open(csv_path, 'w', encoding='utf-8') as handle:
+        handle.write('date,bank_name,account_name,price,state,fee,cost_center_name\n')
+        for index in range(banks):
+            for row in range(rows_per_bank):
+                state = 'Income' if row % 3 == 0 else 'Expense'
+                handle.write(f'2024-{row % 12 + 1:02d}-{row % 28 + 1:02d},Bank {index},ACC-{index},'
+                             f'{row % 97 + 1},{state},0,Rent\n')
+    handle_action('import_transactions', {'file_path': csv_path}, managers)
+
+
+# (action, payload) pairs that make up the hot paths
+HOT_ACTIONS = (
+    ('check_auth_status', {}),
+    ('get_home_data', {}),
+    ('get_banks_list', {}),
+    ('get_transactions_filtered', {'page': 1, 'limit': 50}),
+    ('get_transactions_filtered', {'page': 1, 'limit': 50, 'sort_field': 'price', 'include_count': False}),
+    ('get_transactions_filtered', {'page': 3, 'limit': 20, 'bank': 'Bank 1',
+                                   'sort_field': 'price', 'sort_direction': 'asc'}),
+    ('get_transaction_statistics', {'filters': {}}),
+    ('get_billing_data', {}),
+    ('get_cost_centers_list', {}),
+    ('get_cost_center_options', {}),
+    ('get_cost_center_by_id', {'cost_center_id': 1}),
+    ('get_dashboard_data', {'month': '2024-01'}),
+    ('get_bank_detail_data', {'bank_id': 1, 'month': '2024-01'}),
+    ('get_dashboard_range', {'start_month': '2023-07', 'end_month': '2024-06', 'by_cost_center': True}),
+    ('get_bank_balance_series', {'bank_id': 1, 'start_date': '2023-01-01', 'end_date': '2025-01-01',
+                                 'points': 100}),
+    ('add_cost_center', {'group': 'Operations', 'cost_center': 'Travel', 'area': 'Office'}),
+    ('add_bill', {'date': '2024-02-05', 'bank_id': 2, 'price': 20,
+                  'state': 'Income', 'cost_center_id': 1}),
+    ('delete_bill', {'bill_id': 1}),
+    ('delete_transaction', {'transaction_id': 2}),
+    ('delete_bank', {'bank_id': 3}),
+)
+
+
+def capture_statements(conn, run):
+    """Return the distinct statements issued on conn while run() executes"""
+    statements = []
+    seen = set()
+
+    def trace(sql):
+        text = ' '.join(sql.split())
+        if text.upper().startswith(EXPLAINABLE) and text not in seen:
+            seen.add(text)
+            statements.append(text)
+
+    conn.set_trace_callback(trace)
+    try:
+        run()
+    finally:
+        conn.set_trace_callback(None)
+    return statements
+
+
+def full_scans(conn, sql):
+    """Return the hot tables EXPLAIN QUERY PLAN reports as scanned"""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in ('ON', 'WHERE', 'SET', 'LEFT', 'JOIN', 'GROUP', 'ORDER', 'LIMIT'):
+            aliases[alias] = table
+
+    plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    ordered_limit = ' LIMIT ' in sql.upper() and not any('FOR ORDER BY' in line for line in plan)
+
+    scanned = []
+    for line in plan:
+        match = SCAN_LINE.match(line)
+        if not match or aliases.get(match.group(1)) not in HOT_TABLES:
+            continue
+        if ordered_limit and ORDERED_INDEX_SCAN.match(line):
+            continue
+        scanned.append(line)
+    return scanned
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--banks', type=int, default=4)
+    parser.add_argument('--rows-per-bank', type=int, default=250)
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every statement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from main_handler import build_managers, handle_action
+
+        managers = build_managers()
+        seed(handle_action, managers, workdir, args.banks, args.rows_per_bank)
+        conn = managers['db']._thread_connection()
+
+        def run_hot_actions():
+            for action, payload in HOT_ACTIONS:
+                result = handle_action(action, payload, managers)
+                if not result.get('success'):
+                    print(f"warning: {action} failed: {result.get('error')}")
+
+        statements = capture_statements(conn, run_hot_actions)
+
+        failures = []
+        for sql in statements:
+            scanned = full_scans(conn, sql)
+            if args.verbose or scanned:
+                print(sql)
+                for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}'):
+                    print(f"    {row[3]}")
+            if scanned:
+                failures.append((sql, scanned))
+
+        managers['db'].close()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    print(f"checked {len(statements)} statements")
+    if failures:
+        print(f"FAIL: {len(failures)} statements scan a hot table")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,15 +4,17 @@ import csv
 from datetime import datetime
 import json
 
+import ledger
+import month_aggregates
+
 class BillingManager:
     def __init__(self, db_manager, auth_manager):
         self.db_manager = db_manager
         self.auth_manager = auth_manager
         self.auto_save_folder = "auto_save"
-        self._ensure_auto_save_folder()
 
     def _ensure_auto_save_folder(self):
-        """Ensure auto-save folder exists"""
+        """Ensure auto-save folder exists (created on first write, not on start-up)"""
         if not os.path.exists(self.auto_save_folder):
             os.makedirs(self.auto_save_folder)
 
@@ -23,79 +25,77 @@ class BillingManager:
             return {"success": False, "error": "User not authenticated"}
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            # Get billing records with bank and cost center info
-            cursor.execute("""
-                SELECT 
-                    b.id,
-                    b.date,
-                    b.state,
-                    b.bank_name,
-                    b.account_name,
-                    b.price,
-                    b.fee,
-                    b.current_balance,
-                    b.after_balance,
-                    COALESCE(cc.name, 'Uncategorized') as cost_center_name,
-                    b.cost_center_id,
-                    b.created_at
-                FROM billing b
-                LEFT JOIN cost_centers cc ON b.cost_center_id = cc.id
-                JOIN bank bank_table ON b.bank_id = bank_table.id
-                WHERE bank_table.user_id = ?
-                ORDER BY b.date DESC, b.created_at DESC
-            """, (current_user['id'],))
-
-            billing_records = cursor.fetchall()
-
-            # Get recent transactions (last 50)
-            cursor.execute("""
-                SELECT 
-                    t.id,
-                    t.date,
-                    t.price,
-                    t.state,
-                    t.fee,
-                    t.bank_name,
-                    t.account_name,
-                    t.before_balance,
-                    t.after_balance,
-                    COALESCE(cc.name, 'Uncategorized') as cost_center_name,
-                    t.cost_center_id,
-                    t.created_at
-                FROM transactions t
-                LEFT JOIN cost_centers cc ON t.cost_center_id = cc.id
-                JOIN bank b ON t.bank_id = b.id
-                WHERE b.user_id = ?
-                ORDER BY t.date DESC, t.created_at DESC
-                LIMIT 10
-            """, (current_user['id'],))
-
-            recent_transactions = cursor.fetchall()
-
-            # Get bank options for dropdown
-            cursor.execute("""
-                SELECT id, bank_name, account, current_balance
-                FROM bank
-                WHERE user_id = ?
-                ORDER BY bank_name
-            """, (current_user['id'],))
-
-            bank_options = cursor.fetchall()
-
-            # Get cost center options
-            cursor.execute("""
-                SELECT id, name, group_name, cost_center, area
-                FROM cost_centers
-                WHERE user_id = ? OR user_id IS NULL
-                ORDER BY name
-            """, (current_user['id'],))
-
-            cost_center_options = cursor.fetchall()
-
-            conn.close()
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+
+                # Get billing records with bank and cost center info
+                cursor.execute("""
+                    SELECT 
+                        b.id,
+                        b.date,
+                        b.state,
+                        b.bank_name,
+                        b.account_name,
+                        b.price,
+                        b.fee,
+                        b.current_balance,
+                        b.after_balance,
+                        COALESCE(cc.name, 'Uncategorized') as cost_center_name,
+                        b.cost_center_id,
+                        b.created_at
+                    FROM billing b
+                    LEFT JOIN cost_centers cc ON b.cost_center_id = cc.id
+                    JOIN bank bank_table ON b.bank_id = bank_table.id
+                    WHERE bank_table.user_id = ?
+                    ORDER BY b.date DESC, b.created_at DESC
+                """, (current_user['id'],))
+
+                billing_records = cursor.fetchall()
+
+                # Get recent transactions (last 50)
+                cursor.execute("""
+                    SELECT 
+                        t.id,
+                        t.date,
+                        t.price,
+                        t.state,
+                        t.fee,
+                        t.bank_name,
+                        t.account_name,
+                        t.before_balance,
+                        t.after_balance,
+                        COALESCE(cc.name, 'Uncategorized') as cost_center_name,
+                        t.cost_center_id,
+                        t.created_at
+                    FROM transactions t
+                    LEFT JOIN cost_centers cc ON t.cost_center_id = cc.id
+                    JOIN bank b ON t.bank_id = b.id
+                    WHERE b.user_id = ?
+                    ORDER BY t.date DESC, t.created_at DESC
+                    LIMIT 10
+                """, (current_user['id'],))
+
+                recent_transactions = cursor.fetchall()
+
+                # Get bank options for dropdown
+                cursor.execute("""
+                    SELECT id, bank_name, account, current_balance
+                    FROM bank
+                    WHERE user_id = ?
+                    ORDER BY bank_name
+                """, (current_user['id'],))
+
+                bank_options = cursor.fetchall()
+
+                # Get cost center options
+                cursor.execute("""
+                    SELECT id, name, group_name, cost_center, area
+                    FROM cost_centers
+                    WHERE user_id = ? OR user_id IS NULL
+                    ORDER BY name
+                """, (current_user['id'],))
+
+                cost_center_options = cursor.fetchall()
 
             return {
                 "success": True,
@@ -168,86 +168,93 @@ class BillingManager:
                 return {"success": False, "error": f"{field} is required"}
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            # Get bank information
-            cursor.execute("""
-                SELECT bank_name, account, current_balance
-                FROM bank
-                WHERE id = ? AND user_id = ?
-            """, (bill_data['bank_id'], current_user['id']))
-
-            bank_info = cursor.fetchone()
-            if not bank_info:
-                return {"success": False, "error": "Invalid bank selected"}
-
-            bank_name, account_name, current_balance = bank_info
-            price = float(bill_data['price'])
+            with self.db_manager.transaction() as conn:
+                cursor = conn.cursor()
+
+                # Get bank information
+                cursor.execute("""
+                    SELECT bank_name, account, current_balance
+                    FROM bank
+                    WHERE id = ? AND user_id = ?
+                """, (bill_data['bank_id'], current_user['id']))
+
+                bank_info = cursor.fetchone()
+                if not bank_info:
+                    return {"success": False, "error": "Invalid bank selected"}
+
+                bank_name, account_name, current_balance = bank_info
+                price = float(bill_data['price'])
+                # A bill dated before every row keeps the chain's opening
+                # balance rather than starting it from the current one
+                opening = ledger.opening_balance(cursor, bill_data['bank_id'])
             
             
-            # Calculate balances
-            if bill_data['state'] == "Income":
-                after_balance = current_balance + price
-            elif bill_data['state'] == "Expense":
-                after_balance = current_balance - price
-
-            # Insert billing record
-            cursor.execute("""
-                INSERT INTO billing (
-                    date, state, bank_name, account_name, bank_id,
-                    price, cost_center_id, current_balance, after_balance
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                bill_data['date'],
-                bill_data['state'],
-                bank_name,
-                account_name,
-                bill_data['bank_id'],
-                price,                
-                bill_data['cost_center_id'],
-                current_balance,
-                after_balance
-            ))
-
-            billing_id = cursor.lastrowid
-
-            # Create corresponding transaction
-            cursor.execute("""
-                INSERT INTO transactions (
-                    bank_id, cost_center_id, billing_id, bank_name, account_name,
-                    price, state, cost_center_name, before_balance, after_balance, date
-                )
-                SELECT 
-                    ?, ?, ?, ?, ?, ?, ?, 
-                    COALESCE(cc.name, 'Uncategorized'), ?, ?, ?
-                FROM (SELECT 1) dummy
-                LEFT JOIN cost_centers cc ON cc.id = ?
-            """, (
-                bill_data['bank_id'],
-                bill_data.get('cost_center_id'),
-                billing_id,
-                bank_name,
-                account_name,
-                price,  # Negative for expense
-                bill_data['state'],               
-                current_balance,
-                after_balance,
-                bill_data['date'],  
-                bill_data.get('cost_center_id'),              
-            ))
-
-            transaction_id = cursor.lastrowid
-
-            # Update bank balance
-            cursor.execute("""
-                UPDATE bank 
-                SET current_balance = ?
-                WHERE id = ?
-            """, (after_balance, bill_data['bank_id']))
-
-            conn.commit()
+                # Calculate balances
+                if bill_data['state'] == "Income":
+                    after_balance = current_balance + price
+                elif bill_data['state'] == "Expense":
+                    after_balance = current_balance - price
+
+                # Insert billing record
+                cursor.execute("""
+                    INSERT INTO billing (
+                        date, state, bank_name, account_name, bank_id,
+                        price, cost_center_id, current_balance, after_balance
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    bill_data['date'],
+                    bill_data['state'],
+                    bank_name,
+                    account_name,
+                    bill_data['bank_id'],
+                    price,                
+                    bill_data['cost_center_id'],
+                    current_balance,
+                    after_balance
+                ))
+
+                billing_id = cursor.lastrowid
+
+                # Create corresponding transaction
+                cursor.execute("""
+                    INSERT INTO transactions (
+                        bank_id, cost_center_id, billing_id, bank_name, account_name,
+                        price, state, cost_center_name, before_balance, after_balance, date
+                    )
+                    SELECT 
+                        ?, ?, ?, ?, ?, ?, ?, 
+                        COALESCE(cc.name, 'Uncategorized'), ?, ?, ?
+                    FROM (SELECT 1) dummy
+                    LEFT JOIN cost_centers cc ON cc.id = ?
+                """, (
+                    bill_data['bank_id'],
+                    bill_data.get('cost_center_id'),
+                    billing_id,
+                    bank_name,
+                    account_name,
+                    price,  # Negative for expense
+                    bill_data['state'],               
+                    current_balance,
+                    after_balance,
+                    bill_data['date'],  
+                    bill_data.get('cost_center_id'),              
+                ))
+
+                transaction_id = cursor.lastrowid
+
+                # Keep the monthly aggregate in step with the new transaction
+                month_aggregates.refresh_bank_months(cursor, bill_data['bank_id'], bill_data['date'])
+
+                # A bill dated before later rows moves their balances too;
+                # this also sets the bank balance and the bills' balances
+                ledger.rechain(cursor, bill_data['bank_id'], bill_data['date'], transaction_id, opening=opening)
+
+                # The balances above are only right for the newest row; the
+                # rechained ones are what the bill and the auto-save record keep
+                cursor.execute('SELECT before_balance, after_balance FROM transactions WHERE id = ?',
+                               (transaction_id,))
+                current_balance, after_balance = cursor.fetchone()
 
             # Create auto-save CSV file
             self._create_auto_save_csv(bill_data['date'], {
@@ -262,8 +269,6 @@ class BillingManager:
                 'cost_center_id': bill_data.get('cost_center_id')
             })
 
-            conn.close()
-
             return {
                 "success": True,
                 "message": "Bill added successfully",
@@ -273,13 +278,12 @@ class BillingManager:
 
         except Exception as e:
             return {"success": False, "error": f"Failed to add bill: {str(e)}"}
-        finally:
-            if conn:
-                conn.close()
 
     def _create_auto_save_csv(self, transaction_date, transaction_data):
         """Create or append to monthly CSV file"""
         try:
+            self._ensure_auto_save_folder()
+
             # Parse date to get year and month
             date_obj = datetime.strptime(transaction_date, '%Y-%m-%d')
             year_month = date_obj.strftime('%Y-%m')
@@ -318,85 +322,84 @@ class BillingManager:
             return {"success": False, "error": "User not authenticated"}
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            # Build query with filters
-            query = """
-                SELECT 
-                    b.id,
-                    b.date,
-                    b.state,
-                    b.bank_name,
-                    b.account_name,
-                    b.price,
-                    b.fee,
-                    b.current_balance,
-                    b.after_balance,
-                    COALESCE(cc.name, 'Uncategorized') as cost_center_name,
-                    b.created_at
-                FROM billing b
-                LEFT JOIN cost_centers cc ON b.cost_center_id = cc.id
-                JOIN bank bank_table ON b.bank_id = bank_table.id
-                WHERE bank_table.user_id = ?
-            """
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+
+                # Build query with filters
+                query = """
+                    SELECT 
+                        b.id,
+                        b.date,
+                        b.state,
+                        b.bank_name,
+                        b.account_name,
+                        b.price,
+                        b.fee,
+                        b.current_balance,
+                        b.after_balance,
+                        COALESCE(cc.name, 'Uncategorized') as cost_center_name,
+                        b.created_at
+                    FROM billing b
+                    LEFT JOIN cost_centers cc ON b.cost_center_id = cc.id
+                    JOIN bank bank_table ON b.bank_id = bank_table.id
+                    WHERE bank_table.user_id = ?
+                """
             
-            params = [current_user['id']]
+                params = [current_user['id']]
             
-            # Add filters if provided
-            if filters:
-                if filters.get('date_from'):
-                    query += " AND b.date >= ?"
-                    params.append(filters['date_from'])
-                if filters.get('date_to'):
-                    query += " AND b.date <= ?"
-                    params.append(filters['date_to'])
-                if filters.get('bank_id'):
-                    query += " AND b.bank_id = ?"
-                    params.append(filters['bank_id'])
+                # Add filters if provided
+                if filters:
+                    if filters.get('date_from'):
+                        query += " AND b.date >= ?"
+                        params.append(filters['date_from'])
+                    if filters.get('date_to'):
+                        query += " AND b.date <= ?"
+                        params.append(filters['date_to'])
+                    if filters.get('bank_id'):
+                        query += " AND b.bank_id = ?"
+                        params.append(filters['bank_id'])
             
-            query += " ORDER BY b.date DESC, b.created_at DESC"
+                query += " ORDER BY b.date DESC, b.created_at DESC"
             
-            cursor.execute(query, params)
-            data = cursor.fetchall()
+                cursor.execute(query, params)
+                data = cursor.fetchall()
             
-            # Create export file
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                # Create export file
+                self._ensure_auto_save_folder()
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             
-            if export_format.lower() == 'csv':
-                filename = f"billing_export_{timestamp}.csv"
-                filepath = os.path.join(self.auto_save_folder, filename)
+                if export_format.lower() == 'csv':
+                    filename = f"billing_export_{timestamp}.csv"
+                    filepath = os.path.join(self.auto_save_folder, filename)
                 
-                headers = [
-                    'ID', 'Date', 'Description', 'Bank Name', 'Account Name',
-                    'Amount', 'Fee', 'Balance Before', 'Balance After', 
-                    'Cost Center', 'Created At'
-                ]
+                    headers = [
+                        'ID', 'Date', 'Description', 'Bank Name', 'Account Name',
+                        'Amount', 'Fee', 'Balance Before', 'Balance After', 
+                        'Cost Center', 'Created At'
+                    ]
                 
-                with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(headers)
-                    writer.writerows(data)
+                    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+                        writer = csv.writer(csvfile)
+                        writer.writerow(headers)
+                        writer.writerows(data)
                     
-            elif export_format.lower() == 'excel':
-                try:
-                    import pandas as pd
+                elif export_format.lower() == 'excel':
+                    try:
+                        import pandas as pd
                     
-                    filename = f"billing_export_{timestamp}.xlsx"
-                    filepath = os.path.join(self.auto_save_folder, filename)
+                        filename = f"billing_export_{timestamp}.xlsx"
+                        filepath = os.path.join(self.auto_save_folder, filename)
                     
-                    df = pd.DataFrame(data, columns=[
-                        'ID', 'Date', 'Description', 'Bank Name', 'Account Name',
-                        'Amount', 'Fee', 'Balance Before', 'Balance After',
-                        'Cost Center', 'Created At'
-                    ])
+                        df = pd.DataFrame(data, columns=[
+                            'ID', 'Date', 'Description', 'Bank Name', 'Account Name',
+                            'Amount', 'Fee', 'Balance Before', 'Balance After',
+                            'Cost Center', 'Created At'
+                        ])
                     
-                    df.to_excel(filepath, index=False)
+                        df.to_excel(filepath, index=False)
                     
-                except ImportError:
-                    return {"success": False, "error": "pandas library required for Excel export"}
-            
-            conn.close()
+                    except ImportError:
+                        return {"success": False, "error": "pandas library required for Excel export"}
             
             return {
                 "success": True,
@@ -416,45 +419,50 @@ class BillingManager:
             return {"success": False, "error": "User not authenticated"}
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            # Get bill information
-            cursor.execute("""
-                SELECT b.bank_id, b.price, b.fee
-                FROM billing b
-                JOIN bank bank_table ON b.bank_id = bank_table.id
-                WHERE b.id = ? AND bank_table.user_id = ?
-            """, (bill_id, current_user['id']))
-
-            bill_info = cursor.fetchone()
-            if not bill_info:
-                return {"success": False, "error": "Bill not found"}
-
-            bank_id, price, fee = bill_info
-            total_amount = float(price) + float(fee or 0)
-
-            # Delete associated transaction
-            cursor.execute("""
-                DELETE FROM transactions 
-                WHERE billing_id = ?
-            """, (bill_id,))
-
-            # Delete billing record
-            cursor.execute("""
-                DELETE FROM billing 
-                WHERE id = ?
-            """, (bill_id,))
-
-            # Restore bank balance
-            cursor.execute("""
-                UPDATE bank 
-                SET current_balance = current_balance + ?
-                WHERE id = ?
-            """, (total_amount, bank_id))
-
-            conn.commit()
-            conn.close()
+            with self.db_manager.transaction() as conn:
+                cursor = conn.cursor()
+
+                # Get bill information
+                cursor.execute("""
+                    SELECT b.bank_id, b.date
+                    FROM billing b
+                    JOIN bank bank_table ON b.bank_id = bank_table.id
+                    WHERE b.id = ? AND bank_table.user_id = ?
+                """, (bill_id, current_user['id']))
+
+                bill_info = cursor.fetchone()
+                if not bill_info:
+                    return {"success": False, "error": "Bill not found"}
+
+                bank_id, bill_date = bill_info
+
+                # The chain restarts where the bill's transaction was
+                cursor.execute("""
+                    SELECT date, id, before_balance
+                    FROM transactions
+                    WHERE billing_id = ?
+                    ORDER BY date, id
+                    LIMIT 1
+                """, (bill_id,))
+                first_removed = cursor.fetchone() or (bill_date, None, None)
+
+                # Delete associated transaction
+                cursor.execute("""
+                    DELETE FROM transactions 
+                    WHERE billing_id = ?
+                """, (bill_id,))
+
+                # Delete billing record
+                cursor.execute("""
+                    DELETE FROM billing 
+                    WHERE id = ?
+                """, (bill_id,))
+
+                month_aggregates.refresh_bank_months(cursor, bank_id, bill_date)
+
+                # Later rows and the bank balance lose the bill's movement
+                removed_date, removed_id, before_balance = first_removed
+                ledger.rechain(cursor, bank_id, removed_date, removed_id, opening=before_balance)
 
             return {"success": True, "message": "Bill deleted successfully"}
 
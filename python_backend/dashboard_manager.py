@@ -2,10 +2,21 @@ import sqlite3
 from datetime import datetime, timedelta
 import calendar
 
+import downsample
+import month_aggregates
+
+# Longest range get_dashboard_range serves, in months
+MAX_RANGE_MONTHS = 240
+
+# Longest range get_bank_balance_series serves, in days
+MAX_SERIES_DAYS = 20 * 366
+
 class DashboardManager:
     def __init__(self, db_manager, auth_manager):
         self.db_manager = db_manager
         self.auth_manager = auth_manager
+        # user_id -> AnalyticsSnapshot, kept open across calls of the resident server
+        self._snapshots = {}
 
     def get_dashboard_data(self, month):
         """Get all dashboard data for a specific month"""
@@ -14,22 +25,15 @@ class DashboardManager:
             return {"success": False, "error": "User not authenticated"}
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
 
-            # Parse month (format: YYYY-MM)
-            year, month_num = map(int, month.split('-'))
-            
-            # Get monthly data per bank
-            monthly_bank_data = self._get_monthly_bank_data(cursor, current_user['id'], year, month_num)
+                # Parse month (format: YYYY-MM)
+                year, month_num = map(int, month.split('-'))
             
-            # Get annual cost center data per bank
-            annual_bank_cost_center_data = self._get_annual_bank_cost_center_data(cursor, current_user['id'], year)
-            
-            # Get total annual cost center data
-            total_annual_cost_center_data = self._get_total_annual_cost_center_data(cursor, current_user['id'], year)
-
-            conn.close()
+                # All three panels come from one scan of the year's aggregates
+                monthly_bank_data, annual_bank_cost_center_data, total_annual_cost_center_data = \
+                    self._get_dashboard_panels(cursor, current_user['id'], year, month_num)
 
             return {
                 "success": True,
@@ -50,30 +54,33 @@ class DashboardManager:
             return {"success": False, "error": "User not authenticated"}
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
 
-            # Parse month (format: YYYY-MM)
-            year, month_num = map(int, month.split('-'))
+                # Parse month (format: YYYY-MM)
+                year, month_num = map(int, month.split('-'))
             
-            # Get monthly balance data for chart
-            monthly_balance_data = self._get_bank_monthly_balance_data(cursor, bank_id, year, month_num)
+                # Get monthly balance data for chart
+                monthly_balance_data = self._get_bank_monthly_balance_data(cursor, bank_id, year, month_num)
+
+                # Closing balance of every day of the month, for the chart's shape within the month
+                daily_balance_data = [{"date": day, "balance": balance} for day, balance in
+                                      self._get_bank_daily_balances(cursor, bank_id, *self._month_range(year, month_num))]
             
-            # Get annual cost center data for this bank
-            annual_cost_center_data = self._get_bank_annual_cost_center_data(cursor, bank_id, year)
+                # Get annual cost center data for this bank
+                annual_cost_center_data = self._get_bank_annual_cost_center_data(cursor, bank_id, year)
             
-            # Get monthly transactions for this bank
-            monthly_transactions = self._get_bank_monthly_transactions(cursor, bank_id, year, month_num)
+                # Get monthly transactions for this bank
+                monthly_transactions = self._get_bank_monthly_transactions(cursor, bank_id, year, month_num)
             
-            # Get monthly statistics
-            monthly_stats = self._get_bank_monthly_stats(cursor, bank_id, year, month_num)
-
-            conn.close()
+                # Get monthly statistics
+                monthly_stats = self._get_bank_monthly_stats(cursor, bank_id, year, month_num)
 
             return {
                 "success": True,
                 "data": {
                     "monthlyBalanceData": monthly_balance_data,
+                    "dailyBalanceData": daily_balance_data,
                     "annualCostCenterData": annual_cost_center_data,
                     "monthlyTransactions": monthly_transactions,
                     "monthlyStats": monthly_stats
@@ -83,136 +90,406 @@ class DashboardManager:
         except Exception as e:
             return {"success": False, "error": f"Failed to get bank detail data: {str(e)}"}
 
-    def _get_monthly_bank_data(self, cursor, user_id, year, month):
-        """Get monthly income/expense data for each bank"""
+    def get_dashboard_range(self, start_month, end_month, by_cost_center=False):
+        """Dense monthly income/expense/balance series per bank for the months
+        from start_month to end_month (YYYY-MM, inclusive), optionally split
+        by cost center; months without transactions are zero-filled"""
+        current_user = self.auth_manager.get_current_user()
+        if not current_user:
+            return {"success": False, "error": "User not authenticated"}
+
+        try:
+            months = self._month_sequence(start_month, end_month)
+
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                banks = self._get_bank_month_series(cursor, current_user['id'], months, by_cost_center)
+
+            return {
+                "success": True,
+                "data": {
+                    "months": months,
+                    "banks": banks
+                }
+            }
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to get dashboard range: {str(e)}"}
+
+    def get_bank_balance_series(self, bank_id, start_date, end_date, points=None, method='lttb'):
+        """Daily closing balance of one bank over [start_date, end_date),
+        downsampled to at most `points` points when given"""
+        current_user = self.auth_manager.get_current_user()
+        if not current_user:
+            return {"success": False, "error": "User not authenticated"}
+
+        try:
+            if method not in downsample.METHODS:
+                return {"success": False, "error": f"Unknown downsampling method: {method}"}
+            start = datetime.strptime(start_date[:10], '%Y-%m-%d').date()
+            end = datetime.strptime(end_date[:10], '%Y-%m-%d').date()
+            if end <= start:
+                return {"success": False, "error": "End date must be after start date"}
+            if (end - start).days > MAX_SERIES_DAYS:
+                return {"success": False, "error": f"Range is limited to {MAX_SERIES_DAYS} days"}
+
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1 FROM bank WHERE id = ? AND user_id = ?', (bank_id, current_user['id']))
+                if cursor.fetchone() is None:
+                    return {"success": False, "error": "Bank not found"}
+                series = self._get_bank_daily_balances(cursor, bank_id, start.isoformat(), end.isoformat())
+
+            sampled = downsample.downsample(list(enumerate(balance for _, balance in series)),
+                                            int(points) if points else None, method)
+            return {
+                "success": True,
+                "data": {
+                    "bank_id": bank_id,
+                    "method": method if len(sampled) < len(series) else None,
+                    "totalPoints": len(series),
+                    "points": [{"date": series[index][0], "balance": balance} for index, balance in sampled]
+                }
+            }
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to get bank balance series: {str(e)}"}
+
+    def rebuild_month_aggregates(self):
+        """Recompute the monthly aggregates of the current user's banks from raw transactions"""
+        current_user = self.auth_manager.get_current_user()
+        if not current_user:
+            return {"success": False, "error": "User not authenticated"}
+
+        try:
+            with self.db_manager.transaction() as conn:
+                bank_count = month_aggregates.rebuild(conn.cursor(), current_user['id'])
+
+            return {
+                "success": True,
+                "message": "Monthly aggregates rebuilt successfully",
+                "bank_count": bank_count
+            }
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to rebuild monthly aggregates: {str(e)}"}
+
+    def get_analytics_summary(self, group_by, start=None, end=None, bank_ids=None):
+        """Income, expense and transaction count of the current user's
+        transactions grouped by any of year, month, day, bank and cost_center,
+        optionally within [start, end) dates and a set of banks"""
+        current_user = self.auth_manager.get_current_user()
+        if not current_user:
+            return {"success": False, "error": "User not authenticated"}
+
+        import analytics_snapshot
+
+        try:
+            if isinstance(group_by, str):
+                group_by = [key.strip() for key in group_by.split(',') if key.strip()]
+            start_day = analytics_snapshot.day_number(start) if start else None
+            end_day = analytics_snapshot.day_number(end) if end else None
+
+            with self.db_manager.connection() as conn:
+                snapshot, refreshed = self._analytics_snapshot(conn, current_user['id'])
+                keys, income, expense, count = snapshot.group_totals(group_by, start_day, end_day, bank_ids)
+                cursor = conn.cursor()
+                bank_names = {}
+                cost_center_names = {}
+                if 'bank' in group_by:
+                    cursor.execute('SELECT id, bank_name FROM bank WHERE user_id = ?', (current_user['id'],))
+                    bank_names = dict(cursor.fetchall())
+                if 'cost_center' in group_by:
+                    cursor.execute('SELECT id, name FROM cost_centers WHERE user_id = ?', (current_user['id'],))
+                    cost_center_names = dict(cursor.fetchall())
+
+            groups = []
+            for index in range(len(count)):
+                group = {}
+                for key in group_by:
+                    value = keys[key][index]
+                    if key == 'year':
+                        group['year'] = 1970 + value
+                    elif key == 'month':
+                        group['month'] = analytics_snapshot.month_string(value)
+                    elif key == 'day':
+                        group['day'] = analytics_snapshot.day_string(value)
+                    elif key == 'bank':
+                        group['bank_id'] = value
+                        group['bank_name'] = bank_names.get(value)
+                    else:
+                        group['cost_center_id'] = value
+                        group['cost_center_name'] = cost_center_names.get(value, 'Uncategorized')
+                group.update({
+                    "income": float(income[index]),
+                    "expense": float(expense[index]),
+                    "net": float(income[index] - expense[index]),
+                    "count": int(count[index])
+                })
+                groups.append(group)
+
+            return {
+                "success": True,
+                "group_by": list(group_by),
+                "groups": groups,
+                "snapshot": dict(refreshed, rows=snapshot.rows)
+            }
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to get analytics summary: {str(e)}"}
+
+    def _analytics_snapshot(self, conn, user_id):
+        """The user's analytics snapshot, brought up to date within conn's read"""
+        import analytics_snapshot
+
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            directory = analytics_snapshot.snapshot_directory(self.db_manager.db_path, user_id)
+            snapshot = self._snapshots[user_id] = analytics_snapshot.AnalyticsSnapshot.open(directory)
+        refreshed = snapshot.refresh(conn, user_id)
+        return snapshot, refreshed
+
+    def _month_range(self, year, month):
+        """Half-open [start, end) date bounds for a month.
+
+        Comparing the raw date column against constant bounds lets SQLite use
+        the (bank_id, date) and (bank_id, month_date) indexes; dates stored
+        with a time part still fall inside the range.
+        """
+        start = f"{year:04d}-{month:02d}-01"
+        if month == 12:
+            end = f"{year + 1:04d}-01-01"
+        else:
+            end = f"{year:04d}-{month + 1:02d}-01"
+        return start, end
+
+    def month_cache_versions(self, conn, month, bank_id=None):
+        """What a cached get_dashboard_data (or, with bank_id,
+        get_bank_detail_data) result for month depends on besides cost center
+        names: the month_versions counters of the months it reads and the
+        identity of the banks it shows.
+
+        The dashboard reads the whole year of every bank of the user. A bank's
+        detail also shows running balances, which every earlier write to the
+        bank shifts, so it depends on all of the bank's months up to the end
+        of the year. Writes to other months and banks leave either cached.
+        """
+        year = int(month.split('-')[0])
+        year_start, year_end = self._year_range(year)
+        cursor = conn.cursor()
+        if bank_id is None:
+            cursor.execute("""
+                SELECT COUNT(*), COALESCE(SUM(v.version), 0)
+                FROM bank b
+                JOIN month_versions v ON v.bank_id = b.id AND v.month_date >= ? AND v.month_date < ?
+                WHERE b.user_id = ?
+            """, (year_start, year_end, self.auth_manager.current_user_id))
+            versions = list(cursor.fetchone())
+            cursor.execute('SELECT id, bank_name, account FROM bank WHERE user_id = ? ORDER BY id',
+                           (self.auth_manager.current_user_id,))
+        else:
+            cursor.execute("""
+                SELECT COUNT(*), COALESCE(SUM(version), 0)
+                FROM month_versions
+                WHERE bank_id = ? AND month_date < ?
+            """, (bank_id, year_end))
+            versions = list(cursor.fetchone())
+            # A bank without transactions charts its current balance
+            cursor.execute("""
+                SELECT id, bank_name, account,
+                       CASE WHEN EXISTS (SELECT 1 FROM transactions WHERE bank_id = bank.id)
+                            THEN NULL ELSE current_balance END
+                FROM bank WHERE id = ?
+            """, (bank_id,))
+        return versions + [list(row) for row in cursor.fetchall()]
+
+    def _month_sequence(self, start_month, end_month):
+        """Every YYYY-MM month from start_month to end_month inclusive"""
+        start_year, start_num = map(int, start_month.split('-'))
+        end_year, end_num = map(int, end_month.split('-'))
+        first = start_year * 12 + start_num - 1
+        last = end_year * 12 + end_num - 1
+        if not 1 <= start_num <= 12 or not 1 <= end_num <= 12:
+            raise ValueError("Months must be in YYYY-MM format")
+        if last < first:
+            raise ValueError("End month is before start month")
+        if last - first >= MAX_RANGE_MONTHS:
+            raise ValueError(f"Range is limited to {MAX_RANGE_MONTHS} months")
+        return [f"{index // 12:04d}-{index % 12 + 1:02d}" for index in range(first, last + 1)]
+
+    def _year_range(self, year):
+        """Half-open [start, end) date bounds for a year"""
+        return f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+
+    def _get_dashboard_panels(self, cursor, user_id, year, month):
+        """Monthly income/expense per bank, annual cost center data per bank
+        and annual cost center data across banks.
+
+        One scan of the year's monthly aggregates, which month_transactions
+        already holds grouped by (month, bank, cost center, state), feeds all
+        three: the monthly panel picks the selected month and the annual
+        panels roll the rows up by cost center name. Cost center names are
+        looked up once per distinct id rather than joined into every row.
+        """
         cursor.execute("""
-            SELECT 
-                b.id AS bank_id,
-                b.bank_name,
-                b.account,
-                COALESCE(SUM(CASE WHEN t.state = 'Income' THEN t.price ELSE 0 END), 0) AS income,
-                COALESCE(SUM(CASE WHEN t.state = 'Expense' THEN t.price ELSE 0 END), 0) AS expense,
-                COALESCE(SUM(CASE 
-                    WHEN t.state = 'Income' THEN t.price
-                    WHEN t.state = 'Expense' THEN -t.price
-                    ELSE 0
-                END), 0) AS balance
+            SELECT b.id, b.bank_name, b.account, m.cost_center_id, m.month_date, m.state,
+                   m.total_income, m.total_Expenses
             FROM bank b
-            LEFT JOIN transactions t ON b.id = t.bank_id 
-                AND strftime('%Y', t.date) = ? 
-                AND strftime('%m', t.date) = ?
+            LEFT JOIN month_transactions m ON b.id = m.bank_id AND m.month_date >= ? AND m.month_date < ?
             WHERE b.user_id = ?
-            GROUP BY b.id, b.bank_name, b.account
-            ORDER BY b.bank_name
-        """, (str(year), f"{month:02d}", user_id))
+        """, (*self._year_range(year), user_id))
+        rows = cursor.fetchall()
 
-        banks_data = cursor.fetchall()
-        
-        result = []
-        for bank_data in banks_data:
-            monthly_data = [{
+        cost_center_ids = sorted({row[3] for row in rows if row[3] is not None})
+        cost_center_names = {}
+        if cost_center_ids:
+            cursor.execute(f"SELECT id, name FROM cost_centers WHERE id IN ({', '.join('?' * len(cost_center_ids))})",
+                           cost_center_ids)
+            cost_center_names = dict(cursor.fetchall())
+
+        selected_month = f"{year:04d}-{month:02d}"
+        banks = {}
+        bank_cost_centers = {}
+        total_cost_centers = {}
+        for bank_id, bank_name, account, cost_center_id, month_date, state, income, expense in rows:
+            bank = banks.setdefault(bank_id, {"bank_id": bank_id, "bank_name": bank_name, "account": account,
+                                              "income": 0.0, "expense": 0.0})
+            if month_date is None:
+                continue
+            if month_date[:7] == selected_month:
+                # Net of the rows filed under each state, as the monthly panel has always shown
+                if state == 'Income':
+                    bank["income"] += income - expense
+                elif state == 'Expense':
+                    bank["expense"] += income - expense
+
+            name = cost_center_names.get(cost_center_id, 'Uncategorized')
+            for totals in (bank_cost_centers.setdefault(bank_id, {}).setdefault(name, [0.0, 0.0]),
+                           total_cost_centers.setdefault(name, [0.0, 0.0])):
+                totals[0] += income
+                totals[1] += expense
+
+        ordered_banks = sorted(banks.values(), key=lambda bank: (bank["bank_name"], bank["bank_id"]))
+
+        monthly_bank_data = [{
+            "bank_id": bank["bank_id"],
+            "bank_name": bank["bank_name"],
+            "account": bank["account"],
+            "monthlyData": [{
                 "month": f"{year}-{month:02d}",
-                "income": float(bank_data[3]),
-                "expense": float(bank_data[4]),
-                "balance": float(bank_data[5])
+                "income": float(bank["income"]),
+                "expense": float(bank["expense"]),
+                "balance": float(bank["income"] - bank["expense"])
             }]
-            
-            result.append({
-                "bank_id": bank_data[0],
-                "bank_name": bank_data[1],
-                "account": bank_data[2],
-                "monthlyData": monthly_data
-            })
+        } for bank in ordered_banks]
 
-        return result
+        def cost_center_data(totals):
+            """Cost centers with any income or expense, largest expense first"""
+            data = [{"name": name, "income": float(income), "expense": float(expense)}
+                    for name, (income, expense) in totals.items() if income > 0 or expense > 0]
+            data.sort(key=lambda item: item["expense"], reverse=True)
+            return data
 
+        annual_bank_cost_center_data = []
+        for bank in ordered_banks:
+            data = cost_center_data(bank_cost_centers.get(bank["bank_id"], {}))
+            if data:
+                annual_bank_cost_center_data.append({
+                    "bank_id": bank["bank_id"],
+                    "bank_name": bank["bank_name"],
+                    "costCenterData": data
+                })
 
-    def _get_annual_bank_cost_center_data(self, cursor, user_id, year):
-        """Get annual cost center data for each bank"""
-        cursor.execute("""
-            SELECT 
-                b.id as bank_id,
+        return monthly_bank_data, annual_bank_cost_center_data, cost_center_data(total_cost_centers)
+
+    def _get_bank_month_series(self, cursor, user_id, months, by_cost_center):
+        """Per-bank monthly series over months from one grouped query of the
+        monthly aggregates; income and expense follow the monthly panel"""
+        start_year, start_num = map(int, months[0].split('-'))
+        end_year, end_num = map(int, months[-1].split('-'))
+        cost_center_column = "m.cost_center_id" if by_cost_center else "NULL"
+        cursor.execute(f"""
+            SELECT
+                b.id,
                 b.bank_name,
-                COALESCE(cc.name, 'Uncategorized') as cost_center_name,
-                COALESCE(SUM(CASE WHEN t.price > 0 THEN t.price ELSE 0 END), 0) as income,
-                COALESCE(SUM(CASE WHEN t.price < 0 THEN ABS(t.price) ELSE 0 END), 0) as expense
+                b.account,
+                substr(m.month_date, 1, 7),
+                {cost_center_column},
+                COALESCE(SUM(CASE WHEN m.state = 'Income' THEN m.total_income - m.total_Expenses END), 0),
+                COALESCE(SUM(CASE WHEN m.state = 'Expense' THEN m.total_income - m.total_Expenses END), 0)
             FROM bank b
-            LEFT JOIN transactions t ON b.id = t.bank_id AND strftime('%Y', t.date) = ?
-            LEFT JOIN cost_centers cc ON t.cost_center_id = cc.id
+            LEFT JOIN month_transactions m ON b.id = m.bank_id AND m.month_date >= ? AND m.month_date < ?
             WHERE b.user_id = ?
-            GROUP BY b.id, b.bank_name, cc.name
-            HAVING (income > 0 OR expense > 0)
-            ORDER BY b.bank_name, expense DESC
-        """, (str(year), user_id))
+            GROUP BY b.id, m.month_date, {cost_center_column}
+        """, (self._month_range(start_year, start_num)[0], self._month_range(end_year, end_num)[1], user_id))
+        rows = cursor.fetchall()
 
-        data = cursor.fetchall()
-        
-        # Group by bank
-        banks_data = {}
-        for row in data:
-            bank_id = row[0]
-            if bank_id not in banks_data:
-                banks_data[bank_id] = {
-                    "bank_id": bank_id,
-                    "bank_name": row[1],
-                    "costCenterData": []
-                }
-            
-            banks_data[bank_id]["costCenterData"].append({
-                "name": row[2],
-                "income": float(row[3]),
-                "expense": float(row[4])
-            })
+        cost_center_names = {}
+        cost_center_ids = sorted({row[4] for row in rows if row[4] is not None})
+        if cost_center_ids:
+            cursor.execute(f"SELECT id, name FROM cost_centers WHERE id IN ({', '.join('?' * len(cost_center_ids))})",
+                           cost_center_ids)
+            cost_center_names = dict(cursor.fetchall())
 
-        return list(banks_data.values())
+        position = {month: index for index, month in enumerate(months)}
 
-    def _get_total_annual_cost_center_data(self, cursor, user_id, year):
-        """Get total annual cost center data across all banks"""
-        cursor.execute("""
-            SELECT 
-                COALESCE(cc.name, 'Uncategorized') as cost_center_name,
-                COALESCE(SUM(CASE WHEN t.price > 0 THEN t.price ELSE 0 END), 0) as income,
-                COALESCE(SUM(CASE WHEN t.price < 0 THEN ABS(t.price) ELSE 0 END), 0) as expense
-            FROM transactions t
-            JOIN bank b ON t.bank_id = b.id
-            LEFT JOIN cost_centers cc ON t.cost_center_id = cc.id
-            WHERE b.user_id = ? AND strftime('%Y', t.date) = ?
-            GROUP BY cc.name
-            HAVING (income > 0 OR expense > 0)
-            ORDER BY expense DESC
-        """, (user_id, str(year)))
+        def empty_series():
+            return [[0.0, 0.0] for _ in months]
 
-        data = cursor.fetchall()
-        
-        return [{
-            "name": row[0],
-            "income": float(row[1]),
-            "expense": float(row[2])
-        } for row in data]
+        banks = {}
+        for bank_id, bank_name, account, month, cost_center_id, income, expense in rows:
+            bank = banks.setdefault(bank_id, {"bank_id": bank_id, "bank_name": bank_name, "account": account,
+                                              "series": empty_series(), "cost_centers": {}})
+            if month is None or month not in position:
+                continue
+            index = position[month]
+            bank["series"][index][0] += income
+            bank["series"][index][1] += expense
+            if by_cost_center:
+                series = bank["cost_centers"].setdefault(cost_center_id, empty_series())
+                series[index][0] += income
+                series[index][1] += expense
+
+        def monthly_data(series):
+            return [{
+                "month": month,
+                "income": float(income),
+                "expense": float(expense),
+                "balance": float(income - expense)
+            } for month, (income, expense) in zip(months, series)]
+
+        result = []
+        for bank in sorted(banks.values(), key=lambda bank: (bank["bank_name"], bank["bank_id"])):
+            entry = {
+                "bank_id": bank["bank_id"],
+                "bank_name": bank["bank_name"],
+                "account": bank["account"],
+                "monthlyData": monthly_data(bank["series"])
+            }
+            if by_cost_center:
+                entry["costCenterData"] = sorted(({
+                    "cost_center_id": cost_center_id,
+                    "name": cost_center_names.get(cost_center_id, 'Uncategorized'),
+                    "monthlyData": monthly_data(series)
+                } for cost_center_id, series in bank["cost_centers"].items()), key=lambda item: item["name"])
+            result.append(entry)
+
+        return result
 
     def _get_bank_monthly_balance_data(self, cursor, bank_id, year, month):
         """Get monthly balance data for a specific bank (for chart)"""
-        # Get daily balance changes for the month
         cursor.execute("""
             SELECT 
-                date,
-                SUM(CASE WHEN price > 0 THEN price ELSE 0 END) as daily_income,
-                SUM(CASE WHEN price < 0 THEN ABS(price) ELSE 0 END) as daily_expense,
-                SUM(price) as daily_balance
-            FROM transactions 
+                COALESCE(SUM(total_income), 0) as total_income,
+                COALESCE(SUM(total_Expenses), 0) as total_expense,
+                COALESCE(SUM(total_income - total_Expenses), 0) as total_balance
+            FROM month_transactions 
             WHERE bank_id = ? 
-                AND strftime('%Y', date) = ? 
-                AND strftime('%m', date) = ?
-            GROUP BY date
-            ORDER BY date
-        """, (bank_id, str(year), f"{month:02d}"))
+                AND month_date >= ? 
+                AND month_date < ?
+        """, (bank_id, *self._month_range(year, month)))
 
-        daily_data = cursor.fetchall()
-        
-        # Aggregate to monthly totals
-        total_income = sum(row[1] for row in daily_data)
-        total_expense = sum(row[2] for row in daily_data)
-        total_balance = sum(row[3] for row in daily_data)
+        total_income, total_expense, total_balance = cursor.fetchone()
 
         return [{
             "month": f"{year}-{month:02d}",
@@ -221,20 +498,55 @@ class DashboardManager:
             "balance": float(total_balance)
         }]
 
+    def _get_bank_daily_balances(self, cursor, bank_id, start, end):
+        """(date, closing balance) for every day in [start, end).
+
+        A day's closing balance is the after_balance of its last transaction
+        in chain order; one index seek per day finds it, so the cost follows
+        the number of days and not of transactions, and days without
+        transactions carry the previous balance forward. Days before the
+        bank's first transaction take its opening balance.
+        """
+        cursor.execute("""
+            WITH RECURSIVE days(day) AS (
+                SELECT date(?)
+                UNION ALL
+                SELECT date(day, '+1 day') FROM days WHERE day < date(?, '-1 day')
+            )
+            SELECT day,
+                   (SELECT t.after_balance FROM transactions t
+                    WHERE t.bank_id = ? AND t.date < date(day, '+1 day')
+                    ORDER BY t.date DESC, t.id DESC
+                    LIMIT 1)
+            FROM days
+        """, (start, end, bank_id))
+        days = cursor.fetchall()
+
+        opening = None
+        if any(balance is None for _, balance in days):
+            cursor.execute("""
+                SELECT COALESCE(
+                    (SELECT before_balance FROM transactions WHERE bank_id = ? ORDER BY date, id LIMIT 1),
+                    (SELECT current_balance FROM bank WHERE id = ?))
+            """, (bank_id, bank_id))
+            opening = cursor.fetchone()[0]
+
+        return [(day, float(balance if balance is not None else opening or 0)) for day, balance in days]
+
     def _get_bank_annual_cost_center_data(self, cursor, bank_id, year):
         """Get annual cost center data for a specific bank"""
         cursor.execute("""
             SELECT 
                 COALESCE(cc.name, 'Uncategorized') as cost_center_name,
-                COALESCE(SUM(CASE WHEN t.price > 0 THEN t.price ELSE 0 END), 0) as income,
-                COALESCE(SUM(CASE WHEN t.price < 0 THEN ABS(t.price) ELSE 0 END), 0) as expense
-            FROM transactions t
-            LEFT JOIN cost_centers cc ON t.cost_center_id = cc.id
-            WHERE t.bank_id = ? AND strftime('%Y', t.date) = ?
+                COALESCE(SUM(m.total_income), 0) as income,
+                COALESCE(SUM(m.total_Expenses), 0) as expense
+            FROM month_transactions m
+            LEFT JOIN cost_centers cc ON m.cost_center_id = cc.id
+            WHERE m.bank_id = ? AND m.month_date >= ? AND m.month_date < ?
             GROUP BY cc.name
             HAVING (income > 0 OR expense > 0)
             ORDER BY expense DESC
-        """, (bank_id, str(year)))
+        """, (bank_id, *self._year_range(year)))
 
         data = cursor.fetchall()
         
@@ -260,10 +572,10 @@ class DashboardManager:
             FROM transactions t
             LEFT JOIN cost_centers cc ON t.cost_center_id = cc.id
             WHERE t.bank_id = ? 
-                AND strftime('%Y', t.date) = ? 
-                AND strftime('%m', t.date) = ?
+                AND t.date >= ? 
+                AND t.date < ?
             ORDER BY t.date DESC, t.id DESC
-        """, (bank_id, str(year), f"{month:02d}"))
+        """, (bank_id, *self._month_range(year, month)))
 
         data = cursor.fetchall()
         
@@ -283,15 +595,15 @@ class DashboardManager:
         """Get monthly statistics for a specific bank"""
         cursor.execute("""
             SELECT 
-                COALESCE(SUM(CASE WHEN price > 0 THEN price ELSE 0 END), 0) as total_income,
-                COALESCE(SUM(CASE WHEN price < 0 THEN price ELSE 0 END), 0) as total_expense,
-                COALESCE(SUM(price), 0) as net_balance,
-                COUNT(*) as transaction_count
-            FROM transactions 
+                COALESCE(SUM(total_income), 0) as total_income,
+                COALESCE(-SUM(total_Expenses), 0) as total_expense,
+                COALESCE(SUM(total_income - total_Expenses), 0) as net_balance,
+                COALESCE(SUM(transaction_count), 0) as transaction_count
+            FROM month_transactions 
             WHERE bank_id = ? 
-                AND strftime('%Y', date) = ? 
-                AND strftime('%m', date) = ?
-        """, (bank_id, str(year), f"{month:02d}"))
+                AND month_date >= ? 
+                AND month_date < ?
+        """, (bank_id, *self._month_range(year, month)))
 
         data = cursor.fetchone()
         
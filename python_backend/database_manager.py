@@ -1,149 +1,145 @@
 import sqlite3
-import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from schema_migrations import migrate
+
+# Applied to every connection the manager opens. journal_mode=WAL is stored in
+# the database file; the rest are per connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
 
 
 class DatabaseManager:
-    def __init__(self, db_path="app_database.db"):
+    def __init__(self, db_path="app_database.db", cached_statements=256):
         self.db_path = db_path
+        self.cached_statements = cached_statements
+        # One long-lived connection per thread: a single connection for a
+        # spawn-per-call process, a small pool in the resident server
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
         self.init_database()
-    
+
     def init_database(self):
-        """Initialize database and create tables if they don't exist"""
+        """Bring the schema up to date.
+
+        The fast path reads PRAGMA user_version and returns without running any
+        DDL when the schema is current; see schema_migrations for the steps.
+        A failed migration is rolled back and raised, so no action ever runs
+        against a half-migrated schema.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create user table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password TEXT,
-                    google_sheet TEXT,
-                    google_token TEXT,
-                    role TEXT NOT NULL DEFAULT 'user',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP
-                )
-            ''')
-            
-            # Create bank table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bank (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bank_name TEXT NOT NULL,
-                    account TEXT NOT NULL,
-                    current_balance REAL NOT NULL DEFAULT 0.0,
-                    endpoint TEXT,
-                    color TEXT DEFAULT 'blue',
-                    user_id INTEGER NOT NULL,
-                    role TEXT NOT NULL DEFAULT 'checking',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES user(id)
-                )
-            ''')
-            
-            # Create area table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS area (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    area_name TEXT NOT NULL
-                )
-            ''')
-            
-            # Create cost_center table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cost_centers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    group_name TEXT NOT NULL,
-                    cost_center TEXT NOT NULL,
-                    area TEXT NOT NULL,
-                    state TEXT,
-                    user_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES user(id)
-                )
-            ''')
-            
-            # Create billing table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS billing (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date DATE NOT NULL,
-                    state TEXT NOT NULL,
-                    bank_name TEXT NOT NULL,
-                    account_name TEXT NOT NULL,
-                    bank_id INTEGER NOT NULL,
-                    price REAL NOT NULL,
-                    fee REAL DEFAULT 0,
-                    cost_center_id INTEGER,
-                    current_balance REAL NOT NULL,
-                    after_balance REAL NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (bank_id) REFERENCES bank(id),
-                    FOREIGN KEY (cost_center_id) REFERENCES cost_center(id)
-                )
-            ''')
-            
-            # Create transaction table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bank_id INTEGER NOT NULL,
-                    cost_center_id INTEGER,
-                    billing_id INTEGER,
-                    bank_name TEXT NOT NULL,
-                    account_name TEXT NOT NULL,
-                    price REAL NOT NULL,
-                    state TEXT NOT NULL,
-                    fee REAL DEFAULT 0,
-                    cost_center_name TEXT,
-                    before_balance REAL NOT NULL,
-                    after_balance REAL NOT NULL,
-                    date DATE NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (bank_id) REFERENCES bank(id),
-                    FOREIGN KEY (cost_center_id) REFERENCES cost_center(id),
-                    FOREIGN KEY (billing_id) REFERENCES billing(id)
-                )
-            ''')
-            # Create month_transaction table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS month_transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    month_date DATE NOT NULL,
-                    bank_id INTEGER NOT NULL,
-                    cost_center_id INTEGER,
-                    bank_name TEXT NOT NULL,
-                    account_name TEXT NOT NULL,                    
-                    state TEXT NOT NULL,                    
-                    cost_center_name TEXT,
-                    total_income REAL NOT NULL,
-                    total_Expenses REAL NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (bank_id) REFERENCES bank(id),
-                    FOREIGN KEY (cost_center_id) REFERENCES cost_center(id)                    
-                )
-            ''')            
-            # Create app_settings table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS app_settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                applied = migrate(conn)
+            finally:
+                conn.close()
+
+            if applied:
+                sys.stderr.write(f"Applied schema migrations: {applied}\n")
             return True
         except Exception as e:
-            print(f"Database initialization error: {e}")
-            return False
-    
+            sys.stderr.write(f"Database initialization error: {e}\n")
+            raise
+
+    def _open_connection(self):
+        """Open a tuned connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=5.0,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _thread_connection(self):
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Yield the thread's connection for reads; it stays open for reuse"""
+        yield self._thread_connection()
+
+    @contextmanager
+    def transaction(self):
+        """Yield the thread's connection and commit on success, roll back on error.
+
+        Nested blocks join the outermost transaction, which alone commits.
+        """
+        conn = self._thread_connection()
+        self._local.depth += 1
+        try:
+            yield conn
+        except Exception:
+            self._local.depth -= 1
+            if self._local.depth == 0 and conn.in_transaction:
+                conn.rollback()
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0 and conn.in_transaction:
+            conn.commit()
+
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
\ No newline at end of file
+        """Get database connection (close() on it is a no-op; see connection())"""
+        return SharedConnection(self._thread_connection())
+
+    @contextmanager
+    def shared_connection(self, snapshot=False):
+        """Run the block on the thread's connection.
+
+        With snapshot=True the block runs inside one read transaction, so every
+        query sees the same committed state. Only read-only work belongs in a
+        snapshot; it is rolled back on exit.
+        """
+        conn = self._thread_connection()
+        started = snapshot and not conn.in_transaction
+        if started:
+            conn.execute('BEGIN')
+        try:
+            yield SharedConnection(conn)
+        finally:
+            if started and conn.in_transaction:
+                conn.rollback()
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+class SharedConnection:
+    """Connection proxy whose close() is a no-op, so code written against
+    short-lived connections can use the pooled one"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
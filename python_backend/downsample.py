@@ -0,0 +1,62 @@
+"""
+Downsample Module
+Reduces long chart series to a requested number of points
+
+Both methods keep the first and last points. lttb (Largest-Triangle-Three-
+Buckets) keeps from every bucket the point that forms the largest triangle
+with the point kept before it and the average of the next bucket, which
+preserves the visual shape of the line. min_max keeps the lowest and highest
+point of every bucket, so no extreme is lost.
+"""
+
+METHODS = ('lttb', 'min_max')
+
+
+def downsample(points, threshold, method='lttb'):
+    """At most threshold of points, a list of (x, y) pairs in x order"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if threshold is None or threshold >= len(points) or threshold < 3:
+        return list(points)
+    if method == 'lttb':
+        return lttb(points, threshold)
+    return min_max(points, threshold)
+
+
+def lttb(points, threshold):
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    sampled = [points[0]]
+    previous_x, previous_y = points[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # The last bucket looks ahead to the final point only
+        following = points[end:min(int((bucket + 2) * bucket_size) + 1, len(points))] or points[-1:]
+        average_x = sum(x for x, _ in following) / len(following)
+        average_y = sum(y for _, y in following) / len(following)
+
+        best, best_area = None, -1.0
+        for x, y in points[start:end]:
+            area = abs((previous_x - average_x) * (y - previous_y) - (previous_x - x) * (average_y - previous_y))
+            if area > best_area:
+                best, best_area = (x, y), area
+        sampled.append(best)
+        previous_x, previous_y = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def min_max(points, threshold):
+    inner = points[1:-1]
+    buckets = max(1, (threshold - 2) // 2)
+    bucket_size = len(inner) / buckets
+    sampled = [points[0]]
+    for bucket in range(buckets):
+        chunk = inner[int(bucket * bucket_size):int((bucket + 1) * bucket_size)]
+        if not chunk:
+            continue
+        low = min(chunk, key=lambda point: point[1])
+        high = max(chunk, key=lambda point: point[1])
+        sampled.extend(sorted({low, high}))
+    sampled.append(points[-1])
+    return sampled
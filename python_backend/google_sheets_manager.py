@@ -1,7 +1,3 @@
-import gspread
-from google.oauth2.service_account import Credentials
-
-
 class GoogleSheetsManager:
     def __init__(self, db_manager, auth_manager):
         self.db = db_manager
@@ -10,6 +6,9 @@ class GoogleSheetsManager:
     def sync_with_google_sheets(self):
         """Sync transactions with Google Sheets"""
         try:
+            import gspread
+            from google.oauth2.service_account import Credentials
+
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
@@ -0,0 +1,209 @@
+"""
+Ledger Module
+Keeps each bank's running balance chain consistent across its transactions
+
+A bank's transactions form a chain in (date, id) order: every row's
+before_balance is the previous row's after_balance, and after_balance adds
+the row's movement, +price for Income and -price for Expense (fees are not
+part of the balance, as on import). The bank's current_balance is the last
+after_balance. Writers that insert out of order or delete call rechain with
+the (date, id) key of the change; later rows are recomputed in one UPDATE
+driven by a window function, so the cost grows with the rows after the
+change only. A bill stores the balances of its transaction too, so rechain
+copies them onto the billing rows of the transactions it rewrote. verify
+checks every link of every chain in one pass and repair rebuilds chains
+from their first broken link.
+"""
+
+import month_aggregates
+
+# Signed movement of a row; prices are stored positive with the state giving
+# the direction, though older rows may carry the sign themselves
+MOVEMENT_SQL = "CASE WHEN {t}state = 'Income' THEN ABS({t}price) ELSE -ABS({t}price) END"
+
+# Differences below this are float noise, not a broken chain
+TOLERANCE = 0.005
+
+# Rows whose balances are already this close are left alone by rechain, so
+# summing in a different order than the original writer does not rewrite them
+PRECISION = 1e-6
+
+RECHAIN_SQL = f'''
+    UPDATE transactions
+    SET before_balance = chain.after_balance - chain.movement,
+        after_balance = chain.after_balance
+    FROM (
+        SELECT id, movement,
+               :opening + SUM(movement) OVER (ORDER BY date, id ROWS UNBOUNDED PRECEDING) AS after_balance
+        FROM (
+            SELECT id, date, {MOVEMENT_SQL.format(t='')} AS movement
+            FROM transactions
+            WHERE bank_id = :bank_id AND (date, id) >= (:date, :id)
+        )
+    ) AS chain
+    WHERE transactions.id = chain.id
+      AND (transactions.after_balance IS NULL
+           OR transactions.before_balance IS NULL
+           OR ABS(transactions.after_balance - chain.after_balance) > :precision
+           OR ABS(transactions.before_balance - (chain.after_balance - chain.movement)) > :precision)
+'''
+
+# Bills keep the before and after balance of their transaction
+SYNC_BILLING_SQL = '''
+    UPDATE billing
+    SET current_balance = t.before_balance, after_balance = t.after_balance
+    FROM transactions t
+    WHERE t.billing_id = billing.id
+      AND t.bank_id = :bank_id AND (t.date, t.id) >= (:date, :id)
+      AND (billing.current_balance IS NOT t.before_balance OR billing.after_balance IS NOT t.after_balance)
+'''
+
+
+def rechain(cursor, bank_id, start_date=None, start_id=None, opening=None):
+    """Recompute the balances of a bank's rows from (start_date, start_id) on.
+
+    The chain continues from the after_balance of the last row before that
+    key. When no row precedes it, it starts from opening or, failing that,
+    from the stored before_balance of the first row being recomputed. Without
+    a start key the whole chain is rebuilt. The bank's current_balance is set
+    to the end of the chain, and the bills of rewritten rows take their new
+    balances. Returns the number of rows rewritten.
+    """
+    if start_date is None:
+        start_date, start_id = '', 0
+    elif start_id is None:
+        start_id = 0
+
+    cursor.execute('''
+        SELECT after_balance FROM transactions
+        WHERE bank_id = ? AND (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC
+        LIMIT 1
+    ''', (bank_id, start_date, start_id))
+    row = cursor.fetchone()
+    if row is not None:
+        opening = row[0] or 0.0
+    elif opening is None:
+        cursor.execute('''
+            SELECT before_balance FROM transactions
+            WHERE bank_id = ? AND (date, id) >= (?, ?)
+            ORDER BY date, id
+            LIMIT 1
+        ''', (bank_id, start_date, start_id))
+        row = cursor.fetchone()
+        opening = (row[0] or 0.0) if row is not None else None
+
+    rewritten = 0
+    if opening is not None:
+        cursor.execute(RECHAIN_SQL, {'bank_id': bank_id, 'date': start_date, 'id': start_id, 'opening': opening,
+                                     'precision': PRECISION})
+        rewritten = cursor.rowcount
+    if rewritten:
+        cursor.execute(SYNC_BILLING_SQL, {'bank_id': bank_id, 'date': start_date, 'id': start_id})
+        # Balances from the start month on changed without touching the
+        # monthly aggregates; cached views of those months depend on them
+        cursor.execute('''
+            SELECT date FROM transactions WHERE bank_id = ? AND (date, id) >= (?, ?)
+            ORDER BY date, id LIMIT 1
+        ''', (bank_id, start_date, start_id))
+        row = cursor.fetchone()
+        if row is not None:
+            month_aggregates.touch_month(cursor, bank_id, row[0])
+
+    settle_bank(cursor, bank_id, opening)
+    return rewritten
+
+
+def opening_balance(cursor, bank_id):
+    """The balance a bank's chain starts from (its first row's before_balance),
+    or None when it has no rows. A writer that may insert ahead of every row
+    reads it first and passes it to rechain as opening."""
+    cursor.execute('''
+        SELECT before_balance FROM transactions WHERE bank_id = ? ORDER BY date, id LIMIT 1
+    ''', (bank_id,))
+    row = cursor.fetchone()
+    return (row[0] or 0.0) if row is not None else None
+
+
+def settle_bank(cursor, bank_id, opening=None):
+    """Set a bank's current_balance to the end of its chain; a bank without
+    rows takes opening when given and otherwise keeps its balance"""
+    cursor.execute('''
+        UPDATE bank
+        SET current_balance = COALESCE(
+            (SELECT after_balance FROM transactions WHERE bank_id = ? ORDER BY date DESC, id DESC LIMIT 1),
+            ?, current_balance)
+        WHERE id = ?
+    ''', (bank_id, opening, bank_id))
+
+
+def verify(cursor, user_id=None):
+    """Check every bank's chain, or only those of one user's banks.
+
+    A chain is sound when each row's after_balance is its before_balance
+    plus its movement and each before_balance is the previous row's
+    after_balance, and the bank's current_balance is its opening balance
+    (the first row's before_balance) plus every movement. Returns one dict
+    per bank that fails: bank_id, the number of broken links, the (date, id)
+    of the first of them, and the stored and expected current_balance.
+    """
+    user_filter = 'WHERE b.user_id = :user_id' if user_id is not None else ''
+    movement = MOVEMENT_SQL.format(t='t.')
+    # Only the broken links come back, in chain order
+    cursor.execute(f'''
+        SELECT bank_id, date, id
+        FROM (
+            SELECT t.bank_id, t.id, t.date, t.before_balance, t.after_balance,
+                   {movement} AS movement,
+                   LAG(t.after_balance) OVER (PARTITION BY t.bank_id ORDER BY t.date, t.id) AS previous_after
+            FROM transactions t
+            JOIN bank b ON b.id = t.bank_id
+            {user_filter}
+        )
+        WHERE before_balance IS NULL OR after_balance IS NULL
+           OR ABS(before_balance - COALESCE(previous_after, before_balance)) > :tolerance
+           OR ABS(after_balance - before_balance - movement) > :tolerance
+        ORDER BY bank_id, date, id
+    ''', {'user_id': user_id, 'tolerance': TOLERANCE})
+    broken = {}
+    for bank_id, broken_date, broken_id in cursor.fetchall():
+        link = broken.setdefault(bank_id, {"count": 0, "first": {"date": broken_date, "id": broken_id}})
+        link["count"] += 1
+
+    cursor.execute(f'''
+        SELECT b.id, b.current_balance,
+               (SELECT COALESCE(t.before_balance, 0) FROM transactions t
+                WHERE t.bank_id = b.id ORDER BY t.date, t.id LIMIT 1),
+               (SELECT TOTAL({movement}) FROM transactions t WHERE t.bank_id = b.id)
+        FROM bank b
+        {user_filter}
+    ''', {'user_id': user_id})
+    problems = []
+    for bank_id, current_balance, opening, moved in cursor.fetchall():
+        if opening is None:
+            continue
+        expected_balance = opening + moved
+        link = broken.get(bank_id)
+        if link or abs((current_balance or 0.0) - expected_balance) > TOLERANCE:
+            problems.append({
+                "bank_id": bank_id,
+                "broken_links": link["count"] if link else 0,
+                "first_broken": link["first"] if link else None,
+                "current_balance": current_balance,
+                "expected_balance": expected_balance
+            })
+    return problems
+
+
+def repair(cursor, user_id=None):
+    """Rebuild what verify reports as broken and return its report: each
+    broken chain from its first broken row on, then every bank's balance"""
+    problems = verify(cursor, user_id)
+    for problem in problems:
+        first = problem['first_broken']
+        if first is None:
+            settle_bank(cursor, problem['bank_id'])
+            problem['rows_rewritten'] = 0
+        else:
+            problem['rows_rewritten'] = rechain(cursor, problem['bank_id'], first['date'], first['id'])
+    return problems
@@ -1,17 +1,66 @@
+import importlib
 import json
+import multiprocessing
+import os
+import queue
+import subprocess
 import sys
+import threading
+import time
 import traceback
 
-# Import all manager modules
-from database_manager import DatabaseManager
-from auth_manager import AuthManager
-from bank_manager import BankManager
-from transaction_manager import TransactionManager
-from google_sheets_manager import GoogleSheetsManager
-from home_data_manager import HomeDataManager
-from cost_center_manager import CostCenterManager
-from dashboard_manager import DashboardManager
-from billing_manager import BillingManager
+from action_registry import (ACTION_TIMINGS, action, dispatch, get_action, get_result_cache, prefetch_requests,
+                             report_progress, set_progress_sink, set_result_cache, uncached, warm)
+from query_cache import DiskCache, MemoryCache
+
+# Version of the framed stdin/stdout protocol used by --server (see PROTOCOL.md)
+PROTOCOL_VERSION = 1
+
+# Most prefetches the resident server keeps queued for idle time
+MAX_PENDING_PREFETCHES = 12
+
+# Manager name -> (module, class, constructor dependencies). Modules are imported
+# and managers constructed on first use so that light actions never pay for
+# pandas, gspread or google-auth.
+MANAGER_SPECS = {
+    'db': ('database_manager', 'DatabaseManager', ()),
+    'auth': ('auth_manager', 'AuthManager', ('db',)),
+    'bank': ('bank_manager', 'BankManager', ('db', 'auth')),
+    'transaction': ('transaction_manager', 'TransactionManager', ('db', 'auth')),
+    'google_sheets': ('google_sheets_manager', 'GoogleSheetsManager', ('db', 'auth')),
+    'cost_center': ('cost_center_manager', 'CostCenterManager', ('db', 'auth')),
+    'home_data': ('home_data_manager', 'HomeDataManager', ('db', 'auth', 'bank', 'transaction')),
+    'dashboard': ('dashboard_manager', 'DashboardManager', ('db', 'auth')),
+    'billing': ('billing_manager', 'BillingManager', ('db', 'auth'))
+}
+
+
+class LazyManagers:
+    """Mapping of manager name to instance that builds each manager on first access"""
+
+    def __init__(self, specs=None):
+        self.specs = specs or MANAGER_SPECS
+        self.instances = {}
+
+    def __getitem__(self, name):
+        if name not in self.instances:
+            if name not in self.specs:
+                raise KeyError(name)
+            module_name, class_name, dependencies = self.specs[name]
+            manager_class = getattr(importlib.import_module(module_name), class_name)
+            self.instances[name] = manager_class(*[self[dependency] for dependency in dependencies])
+        return self.instances[name]
+
+    def __contains__(self, name):
+        return name in self.specs
+
+
+def build_managers():
+    """Return the lazy manager mapping used by handle_action, with the database ready"""
+    managers = LazyManagers()
+    managers['db']
+    return managers
+
 
 def main():
     """Main handler function"""
@@ -20,6 +69,14 @@ def main():
             print(json.dumps({"success": False, "error": "No action provided"}))
             return
         
+        if sys.argv[1] == '--server':
+            serve()
+            return
+
+        if sys.argv[1] == '--prefetch':
+            run_prefetches(json.loads(sys.argv[2]))
+            return
+        
         action = sys.argv[1]
         payload = {}
         
@@ -40,15 +97,7 @@ def main():
         
         # Initialize managers with error handling
         try:
-            db_manager = DatabaseManager()
-            auth_manager = AuthManager(db_manager)
-            bank_manager = BankManager(db_manager, auth_manager)
-            transaction_manager = TransactionManager(db_manager, auth_manager)
-            google_sheets_manager = GoogleSheetsManager(db_manager, auth_manager)
-            cost_center_manager = CostCenterManager(db_manager, auth_manager)
-            home_data_manager = HomeDataManager(db_manager, auth_manager, bank_manager, transaction_manager)
-            dashboard_manager = DashboardManager(db_manager, auth_manager)
-            billing_manager = BillingManager(db_manager, auth_manager) 
+            managers = build_managers()
         except Exception as init_error:
             print(json.dumps({
                 "success": False,
@@ -57,23 +106,28 @@ def main():
             }))
             return
         
+        # Spawned processes share read results through a file next to the database
+        set_result_cache(DiskCache(disk_cache_path(managers)))
+        
         # Debug logging to stderr only
         sys.stderr.write(f"Debug: Action={action}, Payload={payload}\n")
         sys.stderr.flush()
         
         # Handle different actions
-        result = handle_action(action, payload, {
-            'auth': auth_manager,
-            'bank': bank_manager,
-            'transaction': transaction_manager,
-            'google_sheets': google_sheets_manager,
-            'cost_center':cost_center_manager,
-            'home_data': home_data_manager,
-            'dashboard': dashboard_manager,
-            'billing': billing_manager
-        })
+        result = handle_action(action, payload, managers)
         
         print(json.dumps(result))
+        sys.stdout.flush()
+
+        # Only neighbours missing from the disk cache are worth a process;
+        # the result is already out, so a failure here is only logged
+        try:
+            requests = uncached(prefetch_requests(action, payload, result), managers)
+        except Exception as e:
+            sys.stderr.write(f"Prefetch check failed: {e}\n")
+            requests = []
+        if requests:
+            spawn_prefetches(requests)
         
     except Exception as e:
         error_result = {
@@ -84,174 +138,487 @@ def main():
         print(json.dumps(error_result))
 
 
-def handle_action(action, payload, managers):
-    """Route actions to appropriate manager methods"""
-    
-    # Database initialization
-    if action == 'init_db_check':
-        return {"success": True, "message": "Database initialized successfully"}
-    
-    # Authentication actions
-    elif action == 'register_user':
-        name = payload.get('name')
-        email = payload.get('email')
-        password = payload.get('password')
-        
-        if not all([name, email, password]):
-            return {"success": False, "error": "Name, email, and password are required"}
-        else:
-            return managers['auth'].register_user(name, email, password)
-    
-    elif action == 'login_user':
-        email = payload.get('email')
-        password = payload.get('password')
-        
-        if not all([email, password]):
-            return {"success": False, "error": "Email and password are required"}
-        else:
-            return managers['auth'].login_user(email, password)
-    
-    elif action == 'google_auth':
-        credential = payload.get('credential')
-        
-        if not credential:
-            return {"success": False, "error": "Google credential is required"}
-        else:
-            return managers['auth'].google_auth(credential)
-    
-    elif action == 'check_auth_status':
-        return managers['auth'].check_auth_status()
-    
-    elif action == 'logout_user':
-        return managers['auth'].logout_user()
-    
-    # Billing actions
-    elif action == 'get_billing_data':
-        return managers['billing'].get_billing_data()
-    
-    elif action == 'add_bill':
-        required_fields = ['date', 'bank_id', 'price', 'state']
-        if not all(field in payload for field in required_fields):
-            return {"success": False, "error": "Date, bank, amount, and description are required"}
-        return managers['billing'].add_bill(payload)
-    
-    elif action == 'delete_bill':
-        bill_id = payload.get('bill_id')
-        if not bill_id:
-            return {"success": False, "error": "Bill ID is required"}
-        return managers['billing'].delete_bill(bill_id)
-    
-    elif action == 'export_billing_data':
-        export_format = payload.get('format', 'csv')
-        filters = payload.get('filters', {})
-        return managers['billing'].export_billing_data(export_format, filters)
-
-    
-    # Bank management actions
-    elif action == 'add_bank':
-        required_fields = ['bank_name', 'account', 'current_balance']
-        if not all(field in payload for field in required_fields):
-            return {"success": False, "error": "Bank name, account, and balance are required"}
-        else:
-            return managers['bank'].add_bank(payload)
-    
-    elif action == 'update_bank':
-        required_fields = ['bank_id', 'bank_name', 'account', 'current_balance']
-        if not all(field in payload for field in required_fields):
-            return {"success": False, "error": "Bank ID, name, account, and balance are required"}
-        else:
-            return managers['bank'].update_bank(payload)
-    
-    elif action == 'delete_bank':
-        bank_id = payload.get('bank_id')
-        if not bank_id:
-            return {"success": False, "error": "Bank ID is required"}
-        else:
-            return managers['bank'].delete_bank(bank_id)
-    
-    # Transaction actions
-    elif action == 'import_transactions':
-        file_path = payload.get('file_path')
-        if not file_path:
-            return {"success": False, "error": "File path is required"}
-        else:
-            return managers['transaction'].import_transactions_from_file(file_path)
-    
-    # Google Sheets actions
-    elif action == 'sync_google_sheets':
-        return managers['google_sheets'].sync_with_google_sheets()
-    # Cost center actions
-    elif action == 'add_cost_center':
-        return managers['cost_center'].add_cost_center(payload)
-    
-    elif action == 'update_cost_center':
-        return managers['cost_center'].update_cost_center(payload)
-    
-    elif action == 'delete_cost_center':
-        cost_center_id = payload.get('cost_center_id')
-        if not cost_center_id:
-            return {"success": False, "error": "Cost center ID is required"}
-        return managers['cost_center'].delete_cost_center(cost_center_id)
-    
-    elif action == 'get_cost_centers_list':
-        return managers['cost_center'].get_cost_centers_list()
-    
-    elif action == 'get_cost_center_options':
-        return managers['cost_center'].get_cost_center_options()
-    
-    elif action == 'get_cost_center_by_id':
-        cost_center_id = payload.get('cost_center_id')
-        if not cost_center_id:
-            return {"success": False, "error": "Cost center ID is required"}
-        return managers['cost_center'].get_cost_center_by_id(cost_center_id)
- 
-    # Home data action
-    elif action == 'get_home_data':
-        return managers['home_data'].get_home_data()
-    # Dashboard actions
-    elif action == 'get_dashboard_data':
-        month = payload.get('month')
-        if not month:
-            return {"success": False, "error": "Month is required"}
-        return managers['dashboard'].get_dashboard_data(month)
-    
-    elif action == 'get_bank_detail_data':
-        bank_id = payload.get('bank_id')
-        month = payload.get('month')
-        if not bank_id or not month:
-            return {"success": False, "error": "Bank ID and month are required"}
-        return managers['dashboard'].get_bank_detail_data(bank_id, month)
-    
-    # Background sync action (for periodic updates)
-    elif action == 'sync_background_data':
-        return {"success": True, "message": "Background sync completed", "timestamp": str(sys.time.time()) if hasattr(sys, 'time') else "unknown"}
-    
-    elif action == 'get_transactions_filtered':
-        return managers['transaction'].get_transactions_with_filters(payload)
-    
-    elif action == 'get_banks_list':
-        return managers['transaction'].get_banks_list()
-    
-    elif action == 'get_cost_centers_list':
-        return managers['transaction'].get_cost_centers_list()
-    
-    elif action == 'export_transactions':
-        format_type = payload.get('format', 'csv')
-        filters = payload.get('filters', {})
-        return managers['transaction'].export_transactions(filters, format_type)
-    
-    elif action == 'get_transaction_statistics':
-        filters = payload.get('filters', {})
-        return managers['transaction'].get_transaction_statistics(filters)
-    
-    elif action == 'delete_transaction':
-        transaction_id = payload.get('transaction_id')
-        if not transaction_id:
-            return {"success": False, "error": "Transaction ID is required"}
-        return managers['transaction'].delete_transaction(transaction_id)
-    
+def disk_cache_path(managers):
+    return os.path.splitext(managers['db'].db_path)[0] + '_cache.db'
+
+
+def spawn_prefetches(requests):
+    """Warm the disk cache for requests from a detached process, so the
+    spawned call that asked for them can exit (and answer) right away"""
+    if getattr(sys, 'frozen', False):
+        command = [sys.executable]
     else:
-        return {"success": False, "error": f"Unknown enhanced action: {action}"}
+        command = [sys.executable, os.path.abspath(__file__)]
+    command += ['--prefetch', json.dumps(requests)]
+    options = {'start_new_session': True}
+    if os.name == 'nt':
+        options = {'creationflags': subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    try:
+        subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, close_fds=True, **options)
+    except OSError as e:
+        sys.stderr.write(f"Failed to start prefetch: {e}\n")
+        sys.stderr.flush()
+
+
+def run_prefetches(requests):
+    """--prefetch mode: cache the results of [action, payload] pairs on disk"""
+    managers = build_managers()
+    set_result_cache(DiskCache(disk_cache_path(managers)))
+    for action_name, payload in requests:
+        try:
+            warm(action_name, payload, managers)
+        except Exception as e:
+            sys.stderr.write(f"Prefetch of {action_name} failed: {e}\n")
+    get_result_cache().close()
+    managers['db'].close()
+
+
+def serve(stdin=None, stdout=None):
+    """Resident mode: answer framed JSON requests until stdin closes.
+
+    See PROTOCOL.md for the frame format. Stray prints from the managers are
+    redirected to stderr so stdout carries nothing but response frames.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(frame):
+        stdout.write(json.dumps(frame) + "\n")
+        stdout.flush()
+
+    try:
+        managers = build_managers()
+    except Exception as init_error:
+        send({
+            "id": None,
+            "event": "error",
+            "error": f"Failed to initialize managers: {str(init_error)}",
+            "traceback": traceback.format_exc()
+        })
+        return
+
+    set_result_cache(MemoryCache())
+    send({"id": None, "event": "ready", "protocol": PROTOCOL_VERSION})
+
+    # Requests are read on a thread so the loop can tell when it is idle and
+    # spend that time computing the results prefetches asked for
+    lines = queue.Queue()
+
+    def read_lines():
+        for line in stdin:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read_lines, daemon=True).start()
+    pending = []
+
+    while True:
+        if pending:
+            try:
+                line = lines.get_nowait()
+            except queue.Empty:
+                action_name, ahead = pending.pop(0)
+                try:
+                    warm(action_name, ahead, managers)
+                except Exception as e:
+                    sys.stderr.write(f"Prefetch of {action_name} failed: {e}\n")
+                    sys.stderr.flush()
+                continue
+        else:
+            line = lines.get()
+        if line is None:
+            break
+
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = action = payload = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request frame must be a JSON object")
+            request_id = request.get('id')
+            action = request.get('action')
+            payload = request.get('payload') or {}
+
+            if action == 'shutdown':
+                send({"id": request_id, "result": {"success": True, "message": "Server stopped"}})
+                break
+
+            # Another process (e.g. a spawn-mode fallback) may have changed the session
+            managers['auth'].load_current_user()
+
+            sys.stderr.write(f"Debug: Request={request_id}, Action={action}, Payload={payload}\n")
+            sys.stderr.flush()
+
+            # Long-running actions stream progress events ahead of the result
+            set_progress_sink(lambda data: send({"id": request_id, "event": "progress", "data": data}))
+            result = handle_action(action, payload, managers)
+        except Exception as e:
+            result = {
+                "success": False,
+                "error": f"Python handler error: {str(e)}",
+                "traceback": traceback.format_exc()
+            }
+        finally:
+            set_progress_sink(None)
+
+        send({"id": request_id, "result": result})
+        pending = (prefetch_requests(action, payload, result) + pending)[:MAX_PENDING_PREFETCHES]
+
+    managers['db'].close()
+
+
+def handle_action(action, payload, managers):
+    """Route actions to the registered handler"""
+    return dispatch(action, payload, managers)
+
+
+# Batch actions
+
+# Each entry bumps the data versions of its own writes
+@action('batch', schema={'required': ['requests']}, error="Batch requires a list of requests",
+        managers=('db', 'auth'), writes=())
+def handle_batch(payload, managers):
+    """Run an ordered list of {action, payload} entries in one round-trip.
+
+    All entries share one database connection and the auth state resolved for
+    the batch. With "snapshot": true every entry must be read-only and they all
+    read from a single transaction, so panels see consistent data. Each entry
+    gets its own result; a failing entry does not stop the rest unless
+    "stop_on_error" is set.
+    """
+    entries = payload.get('requests')
+    if not isinstance(entries, list):
+        return {"success": False, "error": "Batch requires a list of requests"}
+
+    snapshot = bool(payload.get('snapshot', False))
+    stop_on_error = bool(payload.get('stop_on_error', False))
+
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('action'):
+            return {"success": False, "error": "Every batch entry needs an action"}
+        if entry['action'] == 'batch':
+            return {"success": False, "error": "Batches cannot be nested"}
+        spec = get_action(entry['action'])
+        if snapshot and spec is not None and not spec.read_only:
+            return {"success": False, "error": f"Snapshot batches must be read-only: {entry['action']}"}
+
+    results = []
+    with managers['db'].shared_connection(snapshot=snapshot):
+        # Resolve the session once; every entry reuses it
+        managers['auth'].get_current_user()
+
+        for entry in entries:
+            try:
+                result = handle_action(entry['action'], entry.get('payload') or {}, managers)
+            except Exception as e:
+                result = {
+                    "success": False,
+                    "error": f"Python handler error: {str(e)}",
+                    "traceback": traceback.format_exc()
+                }
+            results.append(result)
+            if stop_on_error and not result.get('success'):
+                break
+
+    return {
+        "success": all(result.get('success') for result in results),
+        "results": results
+    }
+
+
+# Database initialization
+
+@action('init_db_check', read_only=True, managers=('db',))
+def init_db_check(payload, managers):
+    return {"success": True, "message": "Database initialized successfully"}
+
+
+# Authentication actions
+
+@action('register_user', schema={'non_empty': ['name', 'email', 'password']},
+        error="Name, email, and password are required", managers=('auth',), writes=('user',))
+def register_user(payload, managers):
+    return managers['auth'].register_user(payload['name'], payload['email'], payload['password'])
+
+
+@action('login_user', schema={'non_empty': ['email', 'password']},
+        error="Email and password are required", managers=('auth',), writes=('user',))
+def login_user(payload, managers):
+    return managers['auth'].login_user(payload['email'], payload['password'])
+
+
+@action('google_auth', schema={'non_empty': ['credential']},
+        error="Google credential is required", managers=('auth',), writes=('user',))
+def google_auth(payload, managers):
+    return managers['auth'].google_auth(payload['credential'])
+
+
+@action('check_auth_status', read_only=True, managers=('auth',))
+def check_auth_status(payload, managers):
+    return managers['auth'].check_auth_status()
+
+
+@action('logout_user', managers=('auth',), writes=('user',))
+def logout_user(payload, managers):
+    return managers['auth'].logout_user()
+
+
+# Billing actions
+
+@action('get_billing_data', read_only=True, managers=('billing',),
+        cache=('billing', 'transactions', 'bank', 'cost_centers'))
+def get_billing_data(payload, managers):
+    return managers['billing'].get_billing_data()
+
+
+@action('add_bill', schema={'required': ['date', 'bank_id', 'price', 'state']},
+        error="Date, bank, amount, and description are required", managers=('billing',),
+        writes=('billing', 'transactions', 'bank'))
+def add_bill(payload, managers):
+    return managers['billing'].add_bill(payload)
+
+
+@action('delete_bill', schema={'non_empty': ['bill_id']}, error="Bill ID is required", managers=('billing',),
+        writes=('billing', 'transactions', 'bank'))
+def delete_bill(payload, managers):
+    return managers['billing'].delete_bill(payload['bill_id'])
+
+
+@action('export_billing_data', managers=('billing',), writes=())
+def export_billing_data(payload, managers):
+    export_format = payload.get('format', 'csv')
+    filters = payload.get('filters', {})
+    return managers['billing'].export_billing_data(export_format, filters)
+
+
+# Bank management actions
+
+@action('add_bank', schema={'required': ['bank_name', 'account', 'current_balance']},
+        error="Bank name, account, and balance are required", managers=('bank',), writes=('bank',))
+def add_bank(payload, managers):
+    return managers['bank'].add_bank(payload)
+
+
+@action('update_bank', schema={'required': ['bank_id', 'bank_name', 'account', 'current_balance']},
+        error="Bank ID, name, account, and balance are required", managers=('bank',), writes=('bank',))
+def update_bank(payload, managers):
+    return managers['bank'].update_bank(payload)
+
+
+@action('delete_bank', schema={'non_empty': ['bank_id']}, error="Bank ID is required", managers=('bank',),
+        writes=('bank', 'transactions', 'billing'))
+def delete_bank(payload, managers):
+    return managers['bank'].delete_bank(payload['bank_id'])
+
+
+# Transaction actions
+
+@action('import_transactions', schema={'non_empty': ['file_path']},
+        error="File path is required", managers=('transaction',), writes=('transactions', 'bank'))
+def import_transactions(payload, managers):
+    return managers['transaction'].import_transactions_from_file(
+        payload['file_path'],
+        stream=payload.get('stream', False),
+        chunk_size=payload.get('chunk_size', 50000),
+        progress=report_progress,
+        on_conflict=payload.get('on_conflict', 'skip'),
+        dry_run=payload.get('dry_run', False)
+    )
+
+
+@action('import_transaction_files', schema={'non_empty': ['file_paths']},
+        error="File paths are required", managers=('transaction',), writes=('transactions', 'bank'))
+def import_transaction_files(payload, managers):
+    return managers['transaction'].import_transactions_from_files(
+        payload['file_paths'],
+        max_workers=payload.get('max_workers'),
+        progress=report_progress,
+        on_conflict=payload.get('on_conflict', 'skip')
+    )
+
+
+@action('get_transactions_filtered', read_only=True, managers=('transaction',), cache=('transactions', 'bank'))
+def get_transactions_filtered(payload, managers):
+    return managers['transaction'].get_transactions_with_filters(payload)
+
+
+@action('get_banks_list', read_only=True, managers=('transaction',), cache=('bank',))
+def get_banks_list(payload, managers):
+    return managers['transaction'].get_banks_list()
+
+
+@action('export_transactions', read_only=True, managers=('transaction',))
+def export_transactions(payload, managers):
+    format_type = payload.get('format', 'csv')
+    filters = payload.get('filters', {})
+    return managers['transaction'].export_transactions(
+        filters, format_type, file_path=payload.get('file_path'), progress=report_progress)
+
+
+@action('get_transaction_statistics', read_only=True, managers=('transaction',),
+        cache=('transactions', 'bank'))
+def get_transaction_statistics(payload, managers):
+    # The transactions page sends its listing filters flat in the payload
+    filters = payload.get('filters', payload)
+    return managers['transaction'].get_transaction_statistics(filters, top_n=payload.get('top_n', 5))
+
+
+@action('delete_transaction', schema={'non_empty': ['transaction_id']},
+        error="Transaction ID is required", managers=('transaction',), writes=('transactions', 'bank'))
+def delete_transaction(payload, managers):
+    return managers['transaction'].delete_transaction(payload['transaction_id'])
+
+
+@action('verify_ledger', read_only=True, managers=('transaction',))
+def verify_ledger(payload, managers):
+    return managers['transaction'].check_ledger()
+
+
+@action('repair_ledger', managers=('transaction',), writes=('transactions', 'bank'))
+def repair_ledger(payload, managers):
+    return managers['transaction'].check_ledger(repair=True)
+
+
+# Google Sheets actions
+
+@action('sync_google_sheets', managers=('google_sheets',))
+def sync_google_sheets(payload, managers):
+    return managers['google_sheets'].sync_with_google_sheets()
+
+
+# Cost center actions
+
+@action('add_cost_center', managers=('cost_center',), writes=('cost_centers',))
+def add_cost_center(payload, managers):
+    return managers['cost_center'].add_cost_center(payload)
+
+
+@action('update_cost_center', managers=('cost_center',), writes=('cost_centers',))
+def update_cost_center(payload, managers):
+    return managers['cost_center'].update_cost_center(payload)
+
+
+@action('delete_cost_center', schema={'non_empty': ['cost_center_id']},
+        error="Cost center ID is required", managers=('cost_center',), writes=('cost_centers',))
+def delete_cost_center(payload, managers):
+    return managers['cost_center'].delete_cost_center(payload['cost_center_id'])
+
+
+@action('get_cost_centers_list', read_only=True, managers=('cost_center',), cache=('cost_centers',))
+def get_cost_centers_list(payload, managers):
+    return managers['cost_center'].get_cost_centers_list()
+
+
+@action('get_cost_center_options', read_only=True, managers=('cost_center',), cache=('cost_centers',))
+def get_cost_center_options(payload, managers):
+    return managers['cost_center'].get_cost_center_options()
+
+
+@action('get_cost_center_by_id', schema={'non_empty': ['cost_center_id']},
+        error="Cost center ID is required", read_only=True, managers=('cost_center',), cache=('cost_centers',))
+def get_cost_center_by_id(payload, managers):
+    return managers['cost_center'].get_cost_center_by_id(payload['cost_center_id'])
+
+
+# Home data action
+
+@action('get_home_data', read_only=True, managers=('home_data',), cache=('user', 'bank', 'transactions'))
+def get_home_data(payload, managers):
+    return managers['home_data'].get_home_data()
+
+
+# Dashboard actions
+
+def adjacent_months(payload):
+    """The payload for the months before and after payload['month'] and for
+    the same month a year earlier, which the dashboard compares against"""
+    year, month = map(int, payload['month'].split('-'))
+    index = year * 12 + month - 1
+    return [dict(payload, month=f"{ahead // 12:04d}-{ahead % 12 + 1:02d}")
+            for ahead in (index - 1, index + 1, index - 12)]
+
+
+def dashboard_month_scope(conn, payload, managers):
+    return managers['dashboard'].month_cache_versions(conn, payload['month'])
+
+
+def bank_detail_month_scope(conn, payload, managers):
+    return managers['dashboard'].month_cache_versions(conn, payload['month'], payload['bank_id'])
+
+
+# Month views are cached per month (see month_cache_versions) rather than
+# invalidated by every write to transactions or bank balances
+@action('get_dashboard_data', schema={'non_empty': ['month']}, error="Month is required",
+        read_only=True, managers=('dashboard',), cache=('cost_centers',), cache_scope=dashboard_month_scope,
+        prefetch=adjacent_months)
+def get_dashboard_data(payload, managers):
+    return managers['dashboard'].get_dashboard_data(payload['month'])
+
+
+@action('get_bank_detail_data', schema={'non_empty': ['bank_id', 'month']},
+        error="Bank ID and month are required", read_only=True, managers=('dashboard',),
+        cache=('cost_centers',), cache_scope=bank_detail_month_scope, prefetch=adjacent_months)
+def get_bank_detail_data(payload, managers):
+    return managers['dashboard'].get_bank_detail_data(payload['bank_id'], payload['month'])
+
+
+@action('get_dashboard_range', schema={'non_empty': ['start_month', 'end_month']},
+        error="Start month and end month are required", read_only=True, managers=('dashboard',),
+        cache=('transactions', 'bank', 'cost_centers'))
+def get_dashboard_range(payload, managers):
+    return managers['dashboard'].get_dashboard_range(
+        payload['start_month'], payload['end_month'], bool(payload.get('by_cost_center')))
+
+
+@action('get_bank_balance_series', schema={'non_empty': ['bank_id', 'start_date', 'end_date']},
+        error="Bank ID, start date and end date are required", read_only=True, managers=('dashboard',),
+        cache=('transactions', 'bank'))
+def get_bank_balance_series(payload, managers):
+    return managers['dashboard'].get_bank_balance_series(
+        payload['bank_id'], payload['start_date'], payload['end_date'],
+        payload.get('points'), payload.get('method', 'lttb'))
+
+
+@action('get_analytics_summary', schema={'non_empty': ['group_by']}, error="Group by keys are required",
+        read_only=True, managers=('dashboard',), cache=('transactions', 'bank', 'cost_centers'))
+def get_analytics_summary(payload, managers):
+    return managers['dashboard'].get_analytics_summary(
+        payload['group_by'], payload.get('start'), payload.get('end'), payload.get('bank_ids'))
+
+
+@action('rebuild_month_aggregates', managers=('dashboard',), writes=('transactions',))
+def rebuild_month_aggregates(payload, managers):
+    return managers['dashboard'].rebuild_month_aggregates()
+
+
+# Background sync action (for periodic updates)
+
+@action('sync_background_data', read_only=True)
+def sync_background_data(payload, managers):
+    return {"success": True, "message": "Background sync completed", "timestamp": str(time.time())}
+
+
+# Diagnostics
+
+@action('get_action_timings', read_only=True)
+def get_action_timings(payload, managers):
+    return {"success": True, "timings": ACTION_TIMINGS}
+
+
+@action('get_cache_stats', read_only=True)
+def get_cache_stats(payload, managers):
+    cache = get_result_cache()
+    if cache is None:
+        return {"success": True, "cache": None}
+    return {"success": True, "cache": cache.describe()}
+
 
 if __name__ == "__main__":
+    # Lets the frozen executable act as a worker for the import process pool
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -5,8 +5,8 @@ a = Analysis(
     ['main_handler.py'],
     pathex=[],
     binaries=[],
-    datas=[('auth_manager.py', '.'), ('bank_manager.py', '.'), ('billing_manager.py', '.'), ('cost_center_manager.py', '.'), ('dashboard_manager.py', '.'), ('database_manager.py', '.'), ('google_sheets_manager.py', '.'), ('home_data_manager.py', '.'), ('transaction_manager.py', '.'), ('requirements.txt', '.')],
-    hiddenimports=['sqlite3', 'json', 'argparse', 'sys', 'os', 'traceback', 'datetime', 'pathlib', 'auth_manager', 'bank_manager', 'billing_manager', 'cost_center_manager', 'dashboard_manager', 'database_manager', 'google_sheets_manager', 'home_data_manager', 'transaction_manager'],
+    datas=[('auth_manager.py', '.'), ('bank_manager.py', '.'), ('billing_manager.py', '.'), ('cost_center_manager.py', '.'), ('dashboard_manager.py', '.'), ('database_manager.py', '.'), ('google_sheets_manager.py', '.'), ('home_data_manager.py', '.'), ('transaction_manager.py', '.'), ('schema_migrations.py', '.'), ('action_registry.py', '.'), ('month_aggregates.py', '.'), ('transaction_import.py', '.'), ('transaction_export.py', '.'), ('query_cache.py', '.'), ('ledger.py', '.'), ('analytics_snapshot.py', '.'), ('downsample.py', '.'), ('requirements.txt', '.')],
+    hiddenimports=['sqlite3', 'json', 'argparse', 'sys', 'os', 'traceback', 'datetime', 'pathlib', 'auth_manager', 'bank_manager', 'billing_manager', 'cost_center_manager', 'dashboard_manager', 'database_manager', 'google_sheets_manager', 'home_data_manager', 'transaction_manager', 'schema_migrations', 'action_registry', 'month_aggregates', 'transaction_import', 'transaction_export', 'query_cache', 'ledger', 'analytics_snapshot', 'downsample'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
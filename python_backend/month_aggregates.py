@@ -0,0 +1,138 @@
+"""
+Month Aggregates Module
+Keeps month_transactions as a materialized aggregate of transactions per
+(month, bank, cost center, state)
+
+Every row stores the positive and negative price sums separately, so readers
+can derive both the state-based figures (SUM(price) per state) and the
+sign-based ones (income > 0, expense < 0) without touching raw transactions.
+Writers call one of the refresh functions inside their own transaction after
+changing transactions; the affected (bank, month) groups are recomputed from
+scratch, which keeps the aggregate exact whatever the write was. Bulk imports,
+which only ever insert, add their per-group totals with add_deltas instead.
+
+Every change to a month's rows also bumps that month's counter in
+month_versions (triggers of schema migration 9), which the dashboard cache
+checks; touch_month bumps one for writes that leave the aggregate alone.
+"""
+
+# Recompute the groups of one bank within [start, end) from the raw rows
+REFRESH_SQL = '''
+    INSERT INTO month_transactions (
+        month_date, bank_id, cost_center_id, bank_name, account_name, state,
+        cost_center_name, total_income, total_Expenses, transaction_count, total_fees
+    )
+    SELECT
+        substr(t.date, 1, 7) || '-01',
+        t.bank_id,
+        t.cost_center_id,
+        b.bank_name,
+        b.account,
+        t.state,
+        MAX(t.cost_center_name),
+        COALESCE(SUM(CASE WHEN t.price > 0 THEN t.price ELSE 0 END), 0),
+        COALESCE(SUM(CASE WHEN t.price < 0 THEN -t.price ELSE 0 END), 0),
+        COUNT(*),
+        COALESCE(SUM(t.fee), 0)
+    FROM transactions t
+    JOIN bank b ON b.id = t.bank_id
+    WHERE t.bank_id = ? AND t.date >= ? AND t.date < ?
+    GROUP BY substr(t.date, 1, 7), t.cost_center_id, t.state
+'''
+
+
+def month_start(date_value):
+    """'YYYY-MM-01' for a date, datetime or ISO date string"""
+    return str(date_value)[:7] + '-01'
+
+
+def next_month_start(date_value):
+    """First day of the month after the one date_value falls in"""
+    year, month = int(str(date_value)[:4]), int(str(date_value)[5:7])
+    if month == 12:
+        return f"{year + 1:04d}-01-01"
+    return f"{year:04d}-{month + 1:02d}-01"
+
+
+def touch_month(cursor, bank_id, date_value):
+    """Bump the data version of the month date_value falls in for one bank"""
+    cursor.execute('''
+        INSERT INTO month_versions (bank_id, month_date, version)
+        VALUES (?, ?, abs(random() % 1000000000000))
+        ON CONFLICT (bank_id, month_date) DO UPDATE SET version = version + 1
+    ''', (bank_id, month_start(date_value)))
+
+
+def refresh_bank_months(cursor, bank_id, first_date, last_date=None):
+    """Recompute a bank's aggregate rows for every month from first_date to last_date"""
+    start = month_start(first_date)
+    end = next_month_start(last_date if last_date is not None else first_date)
+
+    cursor.execute('''
+        DELETE FROM month_transactions
+        WHERE bank_id = ? AND month_date >= ? AND month_date < ?
+    ''', (bank_id, start, end))
+    cursor.execute(REFRESH_SQL, (bank_id, start, end))
+
+
+def refresh_bank(cursor, bank_id):
+    """Recompute every aggregate row of one bank"""
+    cursor.execute('SELECT MIN(date), MAX(date) FROM transactions WHERE bank_id = ?', (bank_id,))
+    first_date, last_date = cursor.fetchone()
+
+    cursor.execute('DELETE FROM month_transactions WHERE bank_id = ?', (bank_id,))
+    if first_date is not None:
+        cursor.execute(REFRESH_SQL, (bank_id, month_start(first_date), next_month_start(last_date)))
+
+
+def add_deltas(cursor, deltas):
+    """Add freshly inserted rows' totals into the aggregate.
+
+    deltas are (month_date, bank_id, cost_center_id, state, total_income,
+    total_expenses, transaction_count, total_fees, bank_name, account_name,
+    cost_center_name) tuples, one per group. Bulk writers that only insert use
+    this instead of a refresh, so their cost stays proportional to what they
+    insert rather than to what is already stored for those months.
+    """
+    for (month_date, bank_id, cost_center_id, state, income, expenses, count, fees,
+         bank_name, account_name, cost_center_name) in deltas:
+        cursor.execute('''
+            UPDATE month_transactions
+            SET total_income = total_income + ?,
+                total_Expenses = total_Expenses + ?,
+                transaction_count = transaction_count + ?,
+                total_fees = total_fees + ?
+            WHERE bank_id = ? AND month_date = ? AND cost_center_id IS ? AND state = ?
+        ''', (income, expenses, count, fees, bank_id, month_date, cost_center_id, state))
+        if cursor.rowcount == 0:
+            cursor.execute('''
+                INSERT INTO month_transactions (
+                    month_date, bank_id, cost_center_id, bank_name, account_name, state,
+                    cost_center_name, total_income, total_Expenses, transaction_count, total_fees
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (month_date, bank_id, cost_center_id, bank_name, account_name, state,
+                  cost_center_name, income, expenses, count, fees))
+
+
+def delete_bank(cursor, bank_id):
+    """Drop the aggregate rows of a bank that is being deleted"""
+    cursor.execute('DELETE FROM month_transactions WHERE bank_id = ?', (bank_id,))
+
+
+def rebuild(cursor, user_id=None):
+    """Recompute the aggregate for every bank, or only the banks of one user.
+
+    Returns the number of banks refreshed.
+    """
+    if user_id is None:
+        cursor.execute('SELECT id FROM bank')
+    else:
+        cursor.execute('SELECT id FROM bank WHERE user_id = ?', (user_id,))
+    bank_ids = [row[0] for row in cursor.fetchall()]
+
+    if user_id is None:
+        # Also clears rows left behind by banks that no longer exist
+        cursor.execute('DELETE FROM month_transactions')
+    for bank_id in bank_ids:
+        refresh_bank(cursor, bank_id)
+    return len(bank_ids)
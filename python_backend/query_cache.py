@@ -0,0 +1,286 @@
+"""
+Query Cache Module
+Caches the results of read actions, invalidated by per-table data versions
+
+Every write action bumps the counter of each table it changes in
+data_versions (schema migration 7). A cached result is stored with the
+versions of the tables it was read from and served only while they are
+unchanged, so a write from any process invalidates it; failed results are
+never stored. Versions are read inside the read action's snapshot before the
+handler runs: a write racing with the read can only make the entry look
+older than it is, never newer.
+
+Actions can add a cache scope: finer versions read by a function of the
+payload, such as the month_versions counters (schema migration 9) of the
+months a dashboard month is built from, so writes to other months leave it
+cached. Results can also be computed ahead of a request (prefetch) and
+stored like any other.
+
+The resident server keeps results in memory (MemoryCache); spawn-per-call
+processes share an SQLite file next to the database (DiskCache). Both evict
+the least recently used entries once their size passes a byte cap.
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from datetime import date
+
+# Tables with a data version; derived tables (month_transactions,
+# search_values) change with the transactions they are built from
+DATA_TABLES = ('user', 'bank', 'transactions', 'billing', 'cost_centers')
+
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+DISK_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def read_versions(conn, tables):
+    """Current versions of tables, in order"""
+    rows = conn.execute(
+        f"SELECT table_name, version FROM data_versions WHERE table_name IN ({', '.join('?' * len(tables))})",
+        tables
+    ).fetchall()
+    versions = dict(rows)
+    return [versions.get(table, 0) for table in tables]
+
+
+def bump_versions(conn, tables):
+    """Mark tables as changed; call after the write has been made"""
+    conn.executemany('''
+        INSERT INTO data_versions (table_name, version) VALUES (?, abs(random() % 1000000000000))
+        ON CONFLICT (table_name) DO UPDATE SET version = version + 1
+    ''', [(table,) for table in tables])
+
+
+def cache_key(action_name, payload, user_id):
+    """Key for one read: the action, its payload with keys sorted, the user
+    and the day, since relative date filters ('today', 'month') move with it"""
+    return json.dumps([action_name, payload, user_id, date.today().isoformat()], sort_keys=True, default=str)
+
+
+class CacheStats:
+    """Hit and miss counters, overall and per action"""
+
+    def __init__(self):
+        self.actions = {}
+        self.evictions = 0
+        self.prefetches = 0
+
+    def record(self, action_name, hit):
+        counters = self.actions.setdefault(action_name, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+
+    def as_dict(self):
+        hits = sum(counters["hits"] for counters in self.actions.values())
+        misses = sum(counters["misses"] for counters in self.actions.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": self.evictions,
+            "prefetches": self.prefetches,
+            "actions": self.actions
+        }
+
+
+class MemoryCache:
+    """In-process LRU of results, bounded by their JSON size.
+
+    Results are kept as JSON and decoded on every hit, as DiskCache does, so a
+    caller that changes a result it was handed cannot change later hits.
+    """
+
+    mode = 'memory'
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        # key -> (versions, result JSON, size); dict order is recency order
+        self.entries = {}
+        self.size = 0
+        self.stats = CacheStats()
+
+    def get(self, action_name, key, versions):
+        """The cached result for key if it was stored at these versions, else None"""
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[0] == versions:
+            self.entries[key] = entry
+            self.stats.record(action_name, True)
+            return json.loads(entry[1])
+        if entry is not None:
+            self.size -= entry[2]
+        self.stats.record(action_name, False)
+        return None
+
+    def contains(self, key, versions):
+        """Whether get would hit, without counting it or refreshing recency"""
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] == versions
+
+    def put(self, action_name, key, versions, result, prefetch=False):
+        encoded = json.dumps(result, default=str)
+        size = len(key) + len(encoded)
+        if size > self.max_bytes:
+            return
+        if prefetch:
+            self.stats.prefetches += 1
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[2]
+        self.entries[key] = (versions, encoded, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            evicted = self.entries.pop(next(iter(self.entries)))
+            self.size -= evicted[2]
+            self.stats.evictions += 1
+
+    def clear(self):
+        self.entries = {}
+        self.size = 0
+
+    def describe(self):
+        return dict(self.stats.as_dict(), mode=self.mode, entries=len(self.entries),
+                    bytes=self.size, max_bytes=self.max_bytes)
+
+
+class DiskCache:
+    """LRU of results in an SQLite file, shared by spawn-per-call processes.
+
+    The cache is disposable: it is written without syncing, and any error
+    reading or writing it is reported on stderr and treated as a miss.
+    """
+
+    mode = 'disk'
+
+    def __init__(self, path, max_bytes=DISK_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    versions TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_used_at ON entries (used_at)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS stats (
+                    action TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            self._conn = conn
+        return self._conn
+
+    def _record(self, conn, action_name, hit):
+        column = 'hits' if hit else 'misses'
+        conn.execute(f'''
+            INSERT INTO stats (action, {column}) VALUES (?, 1)
+            ON CONFLICT (action) DO UPDATE SET {column} = {column} + 1
+        ''', (action_name,))
+
+    def _add_total(self, conn, name, count):
+        conn.execute('''
+            INSERT INTO totals (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+        ''', (name, count))
+
+    def _failed(self, error):
+        sys.stderr.write(f"Query cache error: {error}\n")
+        sys.stderr.flush()
+
+    def get(self, action_name, key, versions):
+        """The cached result for key if it was stored at these versions, else None"""
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT versions, result FROM entries WHERE key = ?', (digest,)).fetchone()
+            hit = row is not None and json.loads(row[0]) == versions
+            with conn:
+                if hit:
+                    conn.execute('UPDATE entries SET used_at = ? WHERE key = ?', (time.time(), digest))
+                elif row is not None:
+                    conn.execute('DELETE FROM entries WHERE key = ?', (digest,))
+                self._record(conn, action_name, hit)
+            return json.loads(row[1]) if hit else None
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+
+    def contains(self, key, versions):
+        """Whether get would hit, without counting it or refreshing recency"""
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        try:
+            row = self._connection().execute('SELECT versions FROM entries WHERE key = ?', (digest,)).fetchone()
+            return row is not None and json.loads(row[0]) == versions
+        except sqlite3.Error as e:
+            self._failed(e)
+            return False
+
+    def put(self, action_name, key, versions, result, prefetch=False):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        text = json.dumps(result, default=str)
+        size = len(digest) + len(text)
+        if size > self.max_bytes:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                if prefetch:
+                    self._add_total(conn, 'prefetches', 1)
+                conn.execute('''
+                    INSERT OR REPLACE INTO entries (key, versions, result, size, used_at) VALUES (?, ?, ?, ?, ?)
+                ''', (digest, json.dumps(versions), text, size, time.time()))
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                evicted = 0
+                if total > self.max_bytes:
+                    # Drop the least recently used entries until the rest fit
+                    for stale_key, stale_size in conn.execute(
+                            'SELECT key, size FROM entries ORDER BY used_at').fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        conn.execute('DELETE FROM entries WHERE key = ?', (stale_key,))
+                        total -= stale_size
+                        evicted += 1
+                    self._add_total(conn, 'evictions', evicted)
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def clear(self):
+        try:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM entries')
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def describe(self):
+        stats = CacheStats()
+        entries = size = 0
+        try:
+            conn = self._connection()
+            for action_name, hits, misses in conn.execute('SELECT action, hits, misses FROM stats'):
+                stats.actions[action_name] = {"hits": hits, "misses": misses}
+            totals = dict(conn.execute('SELECT name, value FROM totals').fetchall())
+            stats.evictions = totals.get('evictions', 0)
+            stats.prefetches = totals.get('prefetches', 0)
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        except sqlite3.Error as e:
+            self._failed(e)
+        return dict(stats.as_dict(), mode=self.mode, entries=entries, bytes=size, max_bytes=self.max_bytes)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
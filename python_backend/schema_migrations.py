@@ -0,0 +1,433 @@
+"""
+Schema Migrations Module
+Ordered, idempotent schema steps tracked with SQLite's PRAGMA user_version
+"""
+
+import sqlite3
+
+MIGRATIONS = []
+
+# Rows of transaction_tombstones kept for analytics snapshots (migration 10)
+TOMBSTONE_LIMIT = 100000
+
+
+def migration(version, description):
+    """Register a migration step; steps run in ascending version order"""
+    def register(step):
+        MIGRATIONS.append((version, description, step))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return step
+    return register
+
+
+def latest_version():
+    """Schema version the code expects"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn):
+    """Read the schema version stored in the database header"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def column_exists(cursor, table, column):
+    """Check whether a table already has a column"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def add_column(cursor, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN that is safe to re-run"""
+    if not column_exists(cursor, table, column):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def trigram_supported(cursor):
+    """Whether this SQLite has FTS5 with the trigram tokenizer (3.34+)"""
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(value, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    cursor.execute('DROP TABLE temp.trigram_probe')
+    return True
+
+
+def migrate(conn):
+    """Apply every pending migration in one transaction.
+
+    Returns the list of versions that were applied. The connection must be in
+    autocommit mode (isolation_level=None) so the explicit transaction below is
+    the only one in play.
+    """
+    if get_schema_version(conn) >= latest_version():
+        return []
+
+    cursor = conn.cursor()
+    # Take the write lock before re-reading the version so two processes
+    # starting at the same time cannot both run the same steps
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        current = get_schema_version(conn)
+        applied = []
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            step(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            applied.append(version)
+        cursor.execute('COMMIT')
+        return applied
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+
+
+@migration(1, 'Base tables')
+def create_base_tables(cursor):
+    # Create user table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT,
+            google_sheet TEXT,
+            google_token TEXT,
+            role TEXT NOT NULL DEFAULT 'user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    ''')
+
+    # Create bank table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bank_name TEXT NOT NULL,
+            account TEXT NOT NULL,
+            current_balance REAL NOT NULL DEFAULT 0.0,
+            endpoint TEXT,
+            color TEXT DEFAULT 'blue',
+            user_id INTEGER NOT NULL,
+            role TEXT NOT NULL DEFAULT 'checking',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user(id)
+        )
+    ''')
+
+    # Create area table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS area (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            area_name TEXT NOT NULL
+        )
+    ''')
+
+    # Create cost_center table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cost_centers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            group_name TEXT NOT NULL,
+            cost_center TEXT NOT NULL,
+            area TEXT NOT NULL,
+            state TEXT,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user(id)
+        )
+    ''')
+
+    # Create billing table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS billing (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            state TEXT NOT NULL,
+            bank_name TEXT NOT NULL,
+            account_name TEXT NOT NULL,
+            bank_id INTEGER NOT NULL,
+            price REAL NOT NULL,
+            fee REAL DEFAULT 0,
+            cost_center_id INTEGER,
+            current_balance REAL NOT NULL,
+            after_balance REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (bank_id) REFERENCES bank(id),
+            FOREIGN KEY (cost_center_id) REFERENCES cost_center(id)
+        )
+    ''')
+
+    # Create transaction table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bank_id INTEGER NOT NULL,
+            cost_center_id INTEGER,
+            billing_id INTEGER,
+            bank_name TEXT NOT NULL,
+            account_name TEXT NOT NULL,
+            price REAL NOT NULL,
+            state TEXT NOT NULL,
+            fee REAL DEFAULT 0,
+            cost_center_name TEXT,
+            before_balance REAL NOT NULL,
+            after_balance REAL NOT NULL,
+            date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (bank_id) REFERENCES bank(id),
+            FOREIGN KEY (cost_center_id) REFERENCES cost_center(id),
+            FOREIGN KEY (billing_id) REFERENCES billing(id)
+        )
+    ''')
+
+    # Create month_transaction table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS month_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month_date DATE NOT NULL,
+            bank_id INTEGER NOT NULL,
+            cost_center_id INTEGER,
+            bank_name TEXT NOT NULL,
+            account_name TEXT NOT NULL,
+            state TEXT NOT NULL,
+            cost_center_name TEXT,
+            total_income REAL NOT NULL,
+            total_Expenses REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (bank_id) REFERENCES bank(id),
+            FOREIGN KEY (cost_center_id) REFERENCES cost_center(id)
+        )
+    ''')
+
+    # Create app_settings table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS app_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+@migration(2, 'Indexes for the hot query paths')
+def create_hot_path_indexes(cursor):
+    # Bank lookups by owner: lists ordered by name and the
+    # (bank_name, account, user_id) lookup done by imports and add_bank
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bank_user_name_account
+        ON bank (user_id, bank_name, account)
+    ''')
+
+    # Per-bank transaction ranges ordered by date (rowid breaks ties), covering
+    # the columns the dashboard aggregates read
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_bank_date
+        ON transactions (bank_id, date, state, price, cost_center_id)
+    ''')
+
+    # DELETE FROM transactions WHERE billing_id = ?
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_billing
+        ON transactions (billing_id)
+    ''')
+
+    # Billing records per bank ordered by date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_billing_bank_date
+        ON billing (bank_id, date)
+    ''')
+
+    # Cost center lookups and lists by owner
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cost_centers_user_group
+        ON cost_centers (user_id, group_name, cost_center, area)
+    ''')
+
+
+@migration(3, 'Materialized monthly aggregates')
+def create_month_aggregates(cursor):
+    import month_aggregates
+
+    add_column(cursor, 'month_transactions', 'transaction_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'month_transactions', 'total_fees', 'REAL NOT NULL DEFAULT 0')
+
+    # Dashboard reads are per bank and month range
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_month_transactions_bank_month
+        ON month_transactions (bank_id, month_date)
+    ''')
+
+    # Backfill from the transactions already in the database
+    month_aggregates.rebuild(cursor)
+
+
+@migration(4, 'Ordered indexes for transaction listing')
+def create_listing_indexes(cursor):
+    # (date, rowid) and (price, rowid) match ORDER BY <field>, id, so a listing
+    # page walks the index from its keyset boundary and stops after LIMIT rows
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_date
+        ON transactions (date)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_price
+        ON transactions (price)
+    ''')
+
+
+@migration(5, 'Import fingerprints for idempotent re-import')
+def create_import_fingerprints(cursor):
+    # Set only on imported rows; rows imported before this step keep NULL
+    add_column(cursor, 'transactions', 'import_fingerprint', 'TEXT')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_import_fingerprint
+        ON transactions (import_fingerprint)
+        WHERE import_fingerprint IS NOT NULL
+    ''')
+
+
+@migration(6, 'Search index for the transaction search box')
+def create_transaction_search_index(cursor):
+    # Bank, account and cost center names repeat across many transactions, so
+    # the search index covers their distinct values: a vocabulary table with
+    # an external-content FTS5 trigram index, which matches any substring of
+    # 3+ characters case-insensitively like the LIKE '%term%' it replaces.
+    # Matched values are then looked up through plain column indexes. Without
+    # trigram support (SQLite before 3.34) the index is left out and every
+    # term is matched by LIKE over the vocabulary, as short terms are.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS search_values (
+            id INTEGER PRIMARY KEY,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            UNIQUE (field, value)
+        )
+    ''')
+    if trigram_supported(cursor):
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_values_fts USING fts5(
+                value, content='search_values', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS search_values_fts_insert AFTER INSERT ON search_values BEGIN
+                INSERT INTO search_values_fts (rowid, value) VALUES (new.id, new.value);
+            END
+        ''')
+
+    # Every writer of transactions adds its values to the vocabulary. Values
+    # are never removed; one that no row uses any more simply matches nothing.
+    # One trigger per column, so the common case of a known value costs a
+    # single index probe in the WHEN clause.
+    for field in ('cost_center_name', 'bank_name', 'account_name'):
+        for name, event in (('insert', 'INSERT'), ('update', f'UPDATE OF {field}')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS transactions_search_{field}_{name} AFTER {event} ON transactions
+                WHEN new.{field} IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM search_values WHERE field = '{field}' AND value = new.{field}
+                )
+                BEGIN
+                    INSERT INTO search_values (field, value) VALUES ('{field}', new.{field});
+                END
+            ''')
+
+    for field in ('cost_center_name', 'bank_name', 'account_name'):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_transactions_{field} ON transactions ({field})')
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO search_values (field, value)
+            SELECT DISTINCT '{field}', {field} FROM transactions WHERE {field} IS NOT NULL
+        ''')
+
+
+@migration(7, 'Data versions for the read cache')
+def create_data_versions(cursor):
+    # One counter per table, bumped by every write action (see query_cache).
+    # Counters start at a random point so a recreated database never reuses
+    # versions that an on-disk cache holds results for.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    for table in ('user', 'bank', 'transactions', 'billing', 'cost_centers'):
+        cursor.execute('''
+            INSERT OR IGNORE INTO data_versions (table_name, version)
+            VALUES (?, abs(random() % 1000000000000))
+        ''', (table,))
+
+
+@migration(8, 'Change log for analytics snapshots')
+def create_transaction_tombstones(cursor):
+    # Analytics snapshots (see analytics_snapshot) append new rows by id and
+    # learn of deleted or changed rows from this log. Balance columns are left
+    # out so rechaining a bank does not log every row after the change.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_tombstones (
+            seq INTEGER PRIMARY KEY,
+            transaction_id INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_tombstone_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transaction_tombstones (transaction_id) VALUES (old.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_tombstone_update
+        AFTER UPDATE OF date, price, state, bank_id, cost_center_id ON transactions BEGIN
+            INSERT INTO transaction_tombstones (transaction_id) VALUES (old.id);
+        END
+    ''')
+    # Identifies this database file, so a snapshot of a recreated database is
+    # rebuilt rather than extended
+    cursor.execute('''
+        INSERT OR IGNORE INTO app_settings (key, value, updated_at)
+        VALUES ('database_id', lower(hex(randomblob(8))), CURRENT_TIMESTAMP)
+    ''')
+
+
+@migration(9, 'Month data versions for the dashboard cache')
+def create_month_versions(cursor):
+    # A counter per (bank, month), bumped whenever the month's aggregate rows
+    # change and when a bank's balance chain is rewritten from that month on
+    # (month_aggregates.touch_month). Cached dashboard months compare the
+    # counters of the months they were built from (see query_cache).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS month_versions (
+            bank_id INTEGER NOT NULL,
+            month_date TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (bank_id, month_date)
+        ) WITHOUT ROWID
+    ''')
+    for name, event, rows in (('insert', 'INSERT', ('new',)), ('update', 'UPDATE', ('old', 'new')),
+                              ('delete', 'DELETE', ('old',))):
+        bumps = ''.join(f'''
+                INSERT INTO month_versions (bank_id, month_date, version)
+                VALUES ({row}.bank_id, {row}.month_date, abs(random() % 1000000000000))
+                ON CONFLICT (bank_id, month_date) DO UPDATE SET version = version + 1;''' for row in rows)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS month_transactions_version_{name} AFTER {event} ON month_transactions
+            BEGIN{bumps}
+            END
+        ''')
+
+
+@migration(10, 'Bounded change log for analytics snapshots')
+def cap_transaction_tombstones(cursor):
+    # Only the newest TOMBSTONE_LIMIT tombstones are kept. A snapshot that
+    # has not seen a dropped one is rebuilt instead of patched (see
+    # analytics_snapshot). seq keeps counting up, since the newest row is
+    # never the one deleted.
+    cursor.execute('''
+        DELETE FROM transaction_tombstones
+        WHERE seq <= (SELECT MAX(seq) FROM transaction_tombstones) - ?
+    ''', (TOMBSTONE_LIMIT,))
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transaction_tombstones_cap AFTER INSERT ON transaction_tombstones BEGIN
+            DELETE FROM transaction_tombstones WHERE seq <= new.seq - {int(TOMBSTONE_LIMIT)};
+        END
+    ''')
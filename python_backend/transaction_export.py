@@ -0,0 +1,119 @@
+"""
+Transaction Export Module
+Streams query results straight into CSV or XLSX files
+
+Rows are pulled from the database cursor in batches of FETCH_SIZE and written
+as they arrive, so memory stays flat however many transactions are exported.
+XLSX files are written with xlsxwriter in constant_memory mode, which flushes
+every row to disk once the next one starts; when a sheet reaches Excel's row
+limit the export continues on a new sheet.
+
+Both writers fill a temporary file next to the target and move it into
+place only once it is complete, so a failed export never leaves a
+truncated file at the chosen path.
+"""
+
+import csv
+import os
+import uuid
+from contextlib import contextmanager
+
+EXPORT_COLUMNS = [
+    'date', 'bank_name', 'account_name', 'cost_center_name',
+    'state', 'amount', 'fee', 'before_balance', 'after_balance'
+]
+
+# Select list matching EXPORT_COLUMNS over transactions t; income is positive
+EXPORT_SELECT = '''
+    COALESCE(date(t.date), t.date),
+    t.bank_name,
+    t.account_name,
+    COALESCE(t.cost_center_name, ''),
+    t.state,
+    CASE WHEN t.state = 'Income' THEN COALESCE(t.price, 0) ELSE -COALESCE(t.price, 0) END,
+    COALESCE(t.fee, 0.0),
+    COALESCE(t.before_balance, 0.0),
+    COALESCE(t.after_balance, 0.0)
+'''
+
+FETCH_SIZE = 5000
+
+# Excel's limit per sheet, header row included
+XLSX_MAX_ROWS = 1048576
+
+# Rows between progress reports
+PROGRESS_EVERY = 100000
+
+
+def iter_batches(cursor, fetch_size=FETCH_SIZE):
+    """Yield the rows of an executed query in lists of at most fetch_size"""
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _report(progress, written, reported):
+    if progress and written - reported >= PROGRESS_EVERY:
+        progress({"rows_written": written})
+        return written
+    return reported
+
+
+@contextmanager
+def _replacing(file_path):
+    """Yield a temporary path in file_path's directory that replaces
+    file_path when the block succeeds and is deleted when it fails"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    temporary = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+    try:
+        yield temporary
+        os.replace(temporary, file_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def write_csv(cursor, file_path, progress=None):
+    """Write an executed export query to a CSV file; returns the row count"""
+    written = reported = 0
+    with _replacing(file_path) as temporary:
+        with open(temporary, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(EXPORT_COLUMNS)
+            for rows in iter_batches(cursor):
+                writer.writerows(rows)
+                written += len(rows)
+                reported = _report(progress, written, reported)
+    return written
+
+
+def write_xlsx(cursor, file_path, progress=None):
+    """Write an executed export query to an XLSX file; returns the row count"""
+    import xlsxwriter
+
+    with _replacing(file_path) as temporary:
+        workbook = xlsxwriter.Workbook(temporary, {'constant_memory': True})
+        try:
+            worksheet = None
+            sheet_row = XLSX_MAX_ROWS
+            written = reported = 0
+            for rows in iter_batches(cursor):
+                for row in rows:
+                    if sheet_row == XLSX_MAX_ROWS:
+                        # Rows must be written in order in constant_memory mode,
+                        # so a full sheet is simply left behind for a new one
+                        worksheet = workbook.add_worksheet()
+                        worksheet.write_row(0, 0, EXPORT_COLUMNS)
+                        sheet_row = 1
+                    worksheet.write_row(sheet_row, 0, row)
+                    sheet_row += 1
+                written += len(rows)
+                reported = _report(progress, written, reported)
+            if worksheet is None:
+                workbook.add_worksheet().write_row(0, 0, EXPORT_COLUMNS)
+        finally:
+            workbook.close()
+    return written
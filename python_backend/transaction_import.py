@@ -0,0 +1,632 @@
+"""
+Transaction Import Module
+Column-wise import of bank statement files into the transactions table
+
+The whole file is parsed and validated as columns, banks are resolved in one
+pass, running balances are chained per bank with a grouped cumulative sum in
+date order, and the rows are written with executemany inside the caller's
+transaction, after which each bank is rechained from its earliest imported
+row so rows dated before stored ones fit into the ledger. Very large files can instead be read in fixed-size chunks with
+iter_statement_chunks and imported one chunk per transaction.
+
+Several files (and every sheet of each workbook) can be parsed in parallel
+with parse_sources; the parsed frames come back in input order and are merged
+into one frame, so balances are still chained in a single deterministic pass.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ledger
+import month_aggregates
+
+REQUIRED_COLUMNS = ['date', 'bank_name', 'account_name', 'price', 'state']
+
+# Accepted spellings of state, normalized to what the rest of the app stores
+STATE_VALUES = {'income': 'Income', 'expense': 'Expense'}
+
+# Row numbers and sample values listed per problem in a dry-run report
+MAX_ISSUE_ROWS = 1000
+MAX_ISSUE_VALUES = 5
+
+# Text columns are read as strings so account numbers keep their leading zeros
+TEXT_COLUMNS = {'bank_name': str, 'account_name': str, 'state': str, 'cost_center_name': str}
+
+
+def read_statement(file_path):
+    """Read a CSV or Excel statement into a DataFrame, or None for other formats"""
+    if file_path.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file_path, dtype=TEXT_COLUMNS)
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, dtype=TEXT_COLUMNS)
+    return None
+
+
+def read_statement_sheets(file_path):
+    """Read every sheet of a statement as a list of (sheet_name, DataFrame).
+
+    A CSV file is a single sheet named after nothing (None). Returns None for
+    unsupported formats.
+    """
+    if file_path.endswith(('.xlsx', '.xls')):
+        return list(pd.read_excel(file_path, dtype=TEXT_COLUMNS, sheet_name=None).items())
+    if file_path.endswith('.csv'):
+        return [(None, pd.read_csv(file_path, dtype=TEXT_COLUMNS))]
+    return None
+
+
+def iter_statement_chunks(file_path, chunk_size):
+    """Yield a statement as DataFrames of at most chunk_size rows.
+
+    CSV files are read with pandas' chunked reader and .xlsx files row by row
+    with openpyxl in read-only mode, so memory stays bounded by the chunk size.
+    Legacy .xls files have no streaming reader and are read whole, then split.
+    """
+    if file_path.endswith('.csv'):
+        yield from pd.read_csv(file_path, dtype=TEXT_COLUMNS, chunksize=chunk_size)
+    elif file_path.endswith('.xlsx'):
+        yield from _iter_xlsx_chunks(file_path, chunk_size)
+    elif file_path.endswith('.xls'):
+        df = pd.read_excel(file_path, dtype=TEXT_COLUMNS)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ValueError("Unsupported file format")
+
+
+def _iter_xlsx_chunks(file_path, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+
+        def to_frame(values):
+            df = pd.DataFrame(values, columns=header)
+            for column in TEXT_COLUMNS:
+                if column in df.columns:
+                    df[column] = df[column].astype('string')
+            return df
+
+        chunk = []
+        yielded = False
+        for values in rows:
+            if not any(value is not None for value in values):
+                continue
+            chunk.append(values[:len(header)])
+            if len(chunk) == chunk_size:
+                yield to_frame(chunk)
+                yielded = True
+                chunk = []
+        # A header-only sheet still yields one (empty) frame for the column check
+        if chunk or not yielded:
+            yield to_frame(chunk)
+    finally:
+        workbook.close()
+
+
+def missing_columns(df):
+    """Required columns absent from a statement"""
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def parse_dates(values):
+    """Parse a date column to 'YYYY-MM-DD' strings, NaN where unparseable.
+
+    The format is inferred once for the whole column; only the values that do
+    not fit it fall back to per-value parsing.
+    """
+    parsed = pd.to_datetime(values, errors='coerce')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors='coerce', format='mixed')
+    return parsed.dt.strftime('%Y-%m-%d')
+
+
+def check_frame(df, first_row=1):
+    """Normalize a statement column-wise and find its problems.
+
+    Returns (frame, problems): frame holds every row with typed columns (NaN
+    where a value did not parse) and a `row` column carrying the 1-based row
+    number in the file; problems is a list of (code, column, message,
+    blocking, mask) in reporting order, mask marking the affected rows.
+    Non-blocking problems are imported with a fallback value.
+    """
+    rows = np.arange(first_row, first_row + len(df))
+    fee = pd.to_numeric(df['fee'], errors='coerce') if 'fee' in df.columns else None
+    frame = pd.DataFrame({
+        'row': rows,
+        'bank_name': df['bank_name'].str.strip(),
+        'account_name': df['account_name'].str.strip(),
+        'date': parse_dates(df['date']),
+        'price': pd.to_numeric(df['price'], errors='coerce'),
+        'state': df['state'].str.strip().str.lower().map(STATE_VALUES),
+        'fee': fee.fillna(0.0) if fee is not None else 0.0,
+        'cost_center_name': df['cost_center_name'] if 'cost_center_name' in df.columns else None,
+    }, index=df.index)
+
+    problems = [
+        ('missing_bank_name', 'bank_name', 'missing bank_name', True,
+         frame['bank_name'].isna() | (frame['bank_name'] == '')),
+        ('missing_account_name', 'account_name', 'missing account_name', True,
+         frame['account_name'].isna() | (frame['account_name'] == '')),
+        ('invalid_date', 'date', 'invalid date', True, frame['date'].isna()),
+        ('invalid_price', 'price', 'invalid price', True, frame['price'].isna()),
+        ('invalid_state', 'state', 'state must be Income or Expense', True, frame['state'].isna()),
+    ]
+    if fee is not None:
+        problems.append(('invalid_fee', 'fee', 'fee is not a number, imported as 0', False,
+                         df['fee'].notna() & fee.isna()))
+    return frame, [(code, column, message, blocking, mask.to_numpy())
+                   for code, column, message, blocking, mask in problems]
+
+
+def prepare_frame(df, first_row=1):
+    """Validate and normalize a statement column-wise.
+
+    Returns (frame, errors): frame holds the valid rows with typed columns and
+    a `row` column carrying the 1-based row number in the file; errors is a
+    list of "Row N: ..." messages for the rows that were dropped.
+    """
+    frame, problems = check_frame(df, first_row)
+    rows = frame['row'].to_numpy()
+
+    invalid = np.zeros(len(frame), dtype=bool)
+    messages = {}
+    for _, _, message, blocking, mask in problems:
+        if not blocking:
+            continue
+        for row in rows[mask & ~invalid]:
+            messages[row] = f"Row {row}: {message}"
+        invalid |= mask
+
+    errors = [messages[row] for row in sorted(messages)]
+    return valid_rows(frame, invalid), errors
+
+
+def blocking_mask(problems, size):
+    """Rows with at least one blocking problem"""
+    invalid = np.zeros(size, dtype=bool)
+    for _, _, _, blocking, mask in problems:
+        if blocking:
+            invalid |= mask
+    return invalid
+
+
+def valid_rows(frame, invalid):
+    """The rows of a checked frame not marked invalid, ready to import"""
+    frame = frame[~invalid]
+    frame['cost_center_name'] = frame['cost_center_name'].astype(object).where(
+        frame['cost_center_name'].notna(), None)
+    return frame
+
+
+def describe_problems(df, frame, problems, max_rows=MAX_ISSUE_ROWS):
+    """Structured form of check_frame's problems for a dry run.
+
+    One entry per problem that occurs, with the affected row numbers (the
+    first max_rows of them), their total count and a few of the offending raw
+    values, e.g. the unknown spellings of state.
+    """
+    rows = frame['row'].to_numpy()
+    issues = []
+    for code, column, message, blocking, mask in problems:
+        count = int(mask.sum())
+        if not count:
+            continue
+        raw = df[column][mask].dropna().astype(str).unique()[:MAX_ISSUE_VALUES]
+        issues.append({
+            "code": code,
+            "column": column,
+            "message": message,
+            "blocking": blocking,
+            "count": count,
+            "rows": rows[mask][:max_rows].tolist(),
+            "values": raw.tolist(),
+        })
+    return issues
+
+
+def source_label(file_path, sheet_name=None):
+    """How a file, or one sheet of a workbook, is named in import messages"""
+    name = os.path.basename(file_path)
+    return f"{name} [{sheet_name}]" if sheet_name is not None else name
+
+
+def parse_source(file_path):
+    """Read and validate every sheet of one statement file.
+
+    Runs in a worker process, so it only returns picklable data: a dict with
+    the valid rows of all sheets (in sheet order), the row error messages, the
+    sheets skipped for lacking required columns, and `error` when the file
+    could not be read at all.
+    """
+    parsed = {"file_path": file_path, "frame": None, "rows": 0, "sheets": 0, "errors": [], "skipped": []}
+    try:
+        sheets = read_statement_sheets(file_path)
+    except Exception as e:
+        parsed["error"] = f"{source_label(file_path)}: {str(e)}"
+        return parsed
+    if sheets is None:
+        parsed["error"] = f"{source_label(file_path)}: Unsupported file format"
+        return parsed
+
+    frames = []
+    for sheet_name, df in sheets:
+        label = source_label(file_path, sheet_name)
+        missing = missing_columns(df)
+        if missing:
+            parsed["skipped"].append(f"{label}: Missing required columns: {', '.join(missing)}")
+            continue
+        frame, errors = prepare_frame(df)
+        frame['source'] = label
+        parsed["sheets"] += 1
+        parsed["rows"] += len(df)
+        parsed["errors"].extend(f"{label} {message}" for message in errors)
+        frames.append(frame)
+
+    if frames:
+        parsed["frame"] = pd.concat(frames, ignore_index=True)
+    return parsed
+
+
+def parse_sources(file_paths, max_workers=None, on_parsed=None):
+    """Parse many statement files, in a process pool when there is more than one.
+
+    Results are returned in the order of file_paths whatever order the workers
+    finish in; on_parsed, when given, is called with each result as it is
+    collected.
+    """
+    results = []
+    if len(file_paths) == 1:
+        results.append(parse_source(file_paths[0]))
+        if on_parsed:
+            on_parsed(results[-1])
+        return results
+
+    workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for parsed in executor.map(parse_source, file_paths):
+            results.append(parsed)
+            if on_parsed:
+                on_parsed(parsed)
+    return results
+
+
+def merge_parsed(results):
+    """Concatenate parsed frames in input order, ready for chain_balances.
+
+    chain_balances sorts stably by bank and date, so rows of one bank from
+    different files and sheets interleave by date and fall back to file, sheet
+    and row order on equal dates.
+    """
+    frames = [parsed["frame"] for parsed in results if parsed["frame"] is not None and not parsed["frame"].empty]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def existing_banks(cursor, user_id):
+    """Map the user's (bank_name, account) pairs to (bank_id, balance)"""
+    cursor.execute('SELECT bank_name, account, id, current_balance FROM bank WHERE user_id = ?', (user_id,))
+    banks = {}
+    for bank_name, account, bank_id, balance in cursor.fetchall():
+        banks.setdefault((bank_name, account), (bank_id, balance))
+    return banks
+
+
+def resolve_banks(cursor, user_id, frame):
+    """Map every (bank_name, account_name) in the frame to (bank_id, balance).
+
+    Existing banks are read with one query; missing ones are created.
+    """
+    banks = existing_banks(cursor, user_id)
+
+    keys = frame[['bank_name', 'account_name']].drop_duplicates().itertuples(index=False, name=None)
+    for key in keys:
+        if key not in banks:
+            cursor.execute('''
+                INSERT INTO bank (bank_name, account, current_balance, user_id, role)
+                VALUES (?, ?, 0.0, ?, 'checking')
+            ''', (key[0], key[1], user_id))
+            banks[key] = (cursor.lastrowid, 0.0)
+    return banks
+
+
+def chain_balances(frame, banks, sort_by_date=True):
+    """Add bank_id, before_balance and after_balance columns.
+
+    Rows are stably sorted by bank and date (file order breaks ties) and each
+    bank's balance runs on from its current balance. With sort_by_date=False
+    balances run in file order. Either way they are provisional:
+    write_transactions rechains every bank it writes to in (date, id) order,
+    so the stored balances do not depend on sorting or chunk boundaries.
+    """
+    matched = _match_banks(frame, banks)
+    frame = frame.assign(bank_id=matched['bank_id'].to_numpy(), opening=matched['opening'].to_numpy())
+    frame = frame.sort_values(['bank_id', 'date'] if sort_by_date else ['bank_id'], kind='stable')
+
+    signed = np.where(frame['state'] == 'Income', frame['price'], -frame['price'])
+    running = pd.Series(signed, index=frame.index).groupby(frame['bank_id']).cumsum()
+    frame['after_balance'] = frame['opening'] + running
+    frame['before_balance'] = frame['after_balance'] - signed
+    return frame.drop(columns='opening')
+
+
+def _match_banks(frame, banks):
+    lookup = pd.DataFrame(list(banks.values()), columns=['bank_id', 'opening'],
+                          index=pd.MultiIndex.from_tuples(list(banks.keys())))
+    return lookup.reindex(pd.MultiIndex.from_arrays([frame['bank_name'], frame['account_name']]))
+
+
+class OccurrenceCounter:
+    """Counts how often each fingerprint base has been seen across chunks.
+
+    Keeps one sorted uint64 key and one count per distinct base, so a
+    streaming import carries its occurrence counters in a few bytes per
+    distinct row instead of a dict of strings.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def number(self, bases):
+        """0-based occurrence number of every base, continuing from earlier calls"""
+        keys = np.array([int(base[:16], 16) for base in bases], dtype=np.uint64)
+        within = pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy()
+
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        previous = np.zeros(len(keys), dtype=np.int64)
+        previous[found] = self.counts[positions[found]]
+
+        merged, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, np.ones(len(keys))]),
+                                  minlength=len(merged)).astype(np.int64)
+        self.keys = merged
+        return previous + within
+
+
+def add_fingerprints(frame, user_id, occurrences=None):
+    """Add an import_fingerprint column identifying each row's content.
+
+    The fingerprint hashes the owner, bank, account, date, amount, state, fee
+    and cost center, followed by the row's occurrence number among identical
+    rows (in frame order), so genuinely repeated transactions on one day stay
+    distinct while re-importing the same statement reproduces the same values.
+    Pass an OccurrenceCounter to keep the numbering running across chunks.
+    """
+    columns = [frame[column].tolist() for column in
+               ('bank_name', 'account_name', 'date', 'price', 'state', 'fee', 'cost_center_name')]
+    # 96 bits of SHA-1 over the unit-separated fields; floats by their repr at 6 decimals
+    bases = [
+        hashlib.sha1(f"{user_id}\x1f{bank}\x1f{account}\x1f{date}\x1f{round(price, 6)!r}\x1f{state}"
+                     f"\x1f{round(fee, 6)!r}\x1f{cost_center or ''}".encode('utf-8')).hexdigest()[:24]
+        for bank, account, date, price, state, fee, cost_center in zip(*columns)
+    ]
+    numbers = (occurrences or OccurrenceCounter()).number(bases).tolist()
+    return frame.assign(import_fingerprint=[f"{base}:{number}" for base, number in zip(bases, numbers)])
+
+
+def find_existing(cursor, frame, banks, stored_up_to):
+    """Classify fingerprinted rows against what is already stored.
+
+    Returns (skipped, conflicting) boolean arrays. Skipped rows carry a
+    fingerprint that is already present. Conflicting rows are new by
+    fingerprint, but the same bank already has a transaction on that date for
+    that amount that either predates fingerprints or differs in state, fee or
+    cost center, so the row may be a re-issued copy of it. Only rows with an
+    id up to stored_up_to count for conflicts, so rows written earlier by the
+    same (chunked) import are not held against it. Both checks are
+    index probes through a temp table, so their cost follows the size of the
+    import rather than of the table.
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS import_keys (
+            position INTEGER PRIMARY KEY,
+            fingerprint TEXT,
+            bank_id INTEGER,
+            date TEXT,
+            price REAL,
+            state TEXT,
+            fee REAL,
+            cost_center_name TEXT
+        )
+    ''')
+    cursor.execute('DELETE FROM import_keys')
+    cursor.executemany('INSERT INTO import_keys VALUES (?, ?, ?, ?, ?, ?, ?, ?)', zip(
+        range(len(frame)), frame['import_fingerprint'].tolist(),
+        _match_banks(frame, banks)['bank_id'].tolist(), frame['date'].tolist(), frame['price'].tolist(),
+        frame['state'].tolist(), frame['fee'].tolist(), frame['cost_center_name'].tolist()
+    ))
+
+    skipped = np.zeros(len(frame), dtype=bool)
+    cursor.execute('''
+        SELECT k.position FROM import_keys k
+        WHERE EXISTS (SELECT 1 FROM transactions t WHERE t.import_fingerprint = k.fingerprint)
+    ''')
+    skipped[[row[0] for row in cursor.fetchall()]] = True
+
+    conflicting = np.zeros(len(frame), dtype=bool)
+    cursor.execute('''
+        SELECT k.position FROM import_keys k
+        WHERE NOT EXISTS (SELECT 1 FROM transactions t WHERE t.import_fingerprint = k.fingerprint)
+          AND EXISTS (
+              SELECT 1 FROM transactions t
+              WHERE t.bank_id = k.bank_id AND t.date = k.date
+                AND t.state IN ('Income', 'Expense') AND t.price = k.price AND t.id <= ?
+                AND (t.import_fingerprint IS NULL OR t.state IS NOT k.state
+                     OR t.fee IS NOT k.fee OR t.cost_center_name IS NOT k.cost_center_name)
+          )
+    ''', (stored_up_to,))
+    conflicting[[row[0] for row in cursor.fetchall()]] = True
+
+    cursor.execute('DELETE FROM import_keys')
+    return skipped, conflicting
+
+
+def write_transactions(cursor, frame):
+    """Insert the chained rows, add them to their banks' aggregates, then
+    rechain each bank from its earliest imported row.
+
+    The balances chain_balances assigned run on from the bank's current
+    balance, which is only right for rows dated after every stored one. The
+    rechain rewrites the rows that land earlier (and the stored rows after
+    them), carrying the chain's opening balance when they land first, and
+    sets each bank's closing balance.
+    """
+    bank_ids = frame['bank_id'].unique().tolist()
+    openings = {bank_id: ledger.opening_balance(cursor, bank_id) for bank_id in bank_ids}
+    first_id = last_transaction_id(cursor) + 1
+
+    cursor.executemany('''
+        INSERT INTO transactions (
+            bank_id, bank_name, account_name, price, state, fee,
+            cost_center_name, before_balance, after_balance, date, import_fingerprint
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', zip(
+        frame['bank_id'].tolist(), frame['bank_name'].tolist(), frame['account_name'].tolist(),
+        frame['price'].tolist(), frame['state'].tolist(), frame['fee'].tolist(),
+        frame['cost_center_name'].tolist(), frame['before_balance'].tolist(),
+        frame['after_balance'].tolist(), frame['date'].tolist(), frame['import_fingerprint'].tolist()
+    ))
+
+    # Imported rows carry no cost_center_id, so they group under NULL
+    months = frame.assign(
+        month_date=frame['date'].str.slice(0, 7) + '-01',
+        income=frame['price'].clip(lower=0),
+        expenses=(-frame['price']).clip(lower=0),
+    )
+    totals = months.groupby(['month_date', 'bank_id', 'state'], sort=False).agg(
+        income=('income', 'sum'), expenses=('expenses', 'sum'), count=('price', 'size'),
+        fees=('fee', 'sum'), bank_name=('bank_name', 'first'), account_name=('account_name', 'first'),
+        cost_center_name=('cost_center_name', 'max'),
+    ).reset_index()
+    month_aggregates.add_deltas(cursor, zip(
+        totals['month_date'].tolist(), totals['bank_id'].tolist(), [None] * len(totals),
+        totals['state'].tolist(), totals['income'].tolist(), totals['expenses'].tolist(),
+        totals['count'].tolist(), totals['fees'].tolist(), totals['bank_name'].tolist(),
+        totals['account_name'].tolist(),
+        [name if isinstance(name, str) else None for name in totals['cost_center_name'].tolist()]
+    ))
+
+    # Every imported row has an id from first_id on, so (earliest date,
+    # first_id) precedes all of a bank's new rows and none of its older ones
+    # on later dates
+    earliest = frame.groupby('bank_id', sort=False)['date'].min()
+    for bank_id, date in zip(earliest.index.tolist(), earliest.tolist()):
+        ledger.rechain(cursor, bank_id, date, first_id, opening=openings[bank_id])
+
+
+def last_transaction_id(cursor):
+    """Highest transaction id, taken before an import starts writing"""
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+    return cursor.fetchone()[0]
+
+
+def import_prepared(cursor, user_id, frame, sort_by_date=True, occurrences=None, on_conflict='skip',
+                    stored_up_to=None):
+    """Write an already validated frame, leaving out rows that are already stored.
+
+    Returns {"inserted", "skipped", "conflicting", "conflicts"}; conflicts
+    holds one message per conflicting row. Conflicting rows are held back
+    unless on_conflict is 'insert'. A chunked import passes the
+    last_transaction_id from before its first chunk as stored_up_to.
+    """
+    outcome = {"inserted": 0, "skipped": 0, "conflicting": 0, "conflicts": []}
+    if frame is None or frame.empty:
+        return outcome
+
+    banks = resolve_banks(cursor, user_id, frame)
+    frame = add_fingerprints(frame, user_id, occurrences)
+    if stored_up_to is None:
+        stored_up_to = last_transaction_id(cursor)
+    skipped, conflicting = find_existing(cursor, frame, banks, stored_up_to)
+
+    sources = frame['source'] if 'source' in frame.columns else None
+    for position in np.flatnonzero(conflicting):
+        prefix = f"{sources.iloc[position]} " if sources is not None else ''
+        outcome["conflicts"].append(
+            f"{prefix}Row {frame['row'].iloc[position]}: an existing transaction has the same bank, "
+            f"date and amount but was entered separately or differs in state, fee or cost center")
+
+    keep = ~skipped if on_conflict == 'insert' else ~(skipped | conflicting)
+    outcome["skipped"] = int(skipped.sum())
+    outcome["conflicting"] = int(conflicting.sum())
+    frame = frame[keep]
+    if not frame.empty:
+        write_transactions(cursor, chain_balances(frame, banks, sort_by_date))
+    outcome["inserted"] = len(frame)
+    return outcome
+
+
+def preview_import(cursor, user_id, frame, on_conflict='skip'):
+    """Per-bank effect importing the valid rows of frame would have, without writing.
+
+    Rows are classified as an import would (new, already imported, conflicting)
+    and the new ones summed per bank. Banks that do not exist yet are listed
+    with bank_id None and an opening balance of 0. The fingerprint lookup uses
+    a temp table, so run this inside a transaction that is rolled back.
+    """
+    if frame.empty:
+        return []
+
+    banks = existing_banks(cursor, user_id)
+    known = dict(banks)
+    for key in frame[['bank_name', 'account_name']].drop_duplicates().itertuples(index=False, name=None):
+        known.setdefault(key, (None, 0.0))
+
+    frame = add_fingerprints(frame, user_id)
+    skipped, conflicting = find_existing(cursor, frame, known, last_transaction_id(cursor))
+    held = skipped if on_conflict == 'insert' else skipped | conflicting
+    new = ~held
+    signed = np.where(frame['state'] == 'Income', frame['price'], -frame['price'])
+    frame = frame.assign(
+        new=new, skipped=skipped, conflicting=conflicting,
+        income=np.where(new & (frame['state'] == 'Income').to_numpy(), frame['price'], 0.0),
+        expenses=np.where(new & (frame['state'] == 'Expense').to_numpy(), frame['price'], 0.0),
+        net=np.where(new, signed, 0.0),
+        new_date=frame['date'].where(new),
+    )
+    per_bank = frame.groupby(['bank_name', 'account_name'], sort=True).agg(
+        rows=('row', 'size'), new_rows=('new', 'sum'), skipped_rows=('skipped', 'sum'),
+        conflicting_rows=('conflicting', 'sum'), income=('income', 'sum'), expenses=('expenses', 'sum'),
+        net_change=('net', 'sum'), first_date=('new_date', 'min'), last_date=('new_date', 'max'),
+    )
+
+    preview = []
+    for (bank_name, account_name), totals in per_bank.iterrows():
+        bank_id, opening = known[(bank_name, account_name)]
+        preview.append({
+            "bank_name": bank_name,
+            "account_name": account_name,
+            "bank_id": bank_id,
+            "new_bank": bank_id is None,
+            "rows": int(totals['rows']),
+            "new_rows": int(totals['new_rows']),
+            "skipped_rows": int(totals['skipped_rows']),
+            "conflicting_rows": int(totals['conflicting_rows']),
+            "income": round(float(totals['income']), 2),
+            "expenses": round(float(totals['expenses']), 2),
+            "net_change": round(float(totals['net_change']), 2),
+            "opening_balance": round(float(opening or 0.0), 2),
+            "closing_balance": round(float(opening or 0.0) + float(totals['net_change']), 2),
+            "first_date": totals['first_date'] if isinstance(totals['first_date'], str) else None,
+            "last_date": totals['last_date'] if isinstance(totals['last_date'], str) else None,
+        })
+    return preview
+
+
+def import_frame(cursor, user_id, df, first_row=1, sort_by_date=True, occurrences=None, on_conflict='skip',
+                 stored_up_to=None):
+    """Import a parsed statement or chunk; returns (outcome, errors) as import_prepared and prepare_frame"""
+    frame, errors = prepare_frame(df, first_row)
+    outcome = import_prepared(cursor, user_id, frame, sort_by_date, occurrences, on_conflict, stored_up_to)
+    return outcome, errors
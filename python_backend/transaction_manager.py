@@ -1,13 +1,54 @@
-import pandas as pd
+import base64
+import hashlib
+import json
+import os
+import time
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Any
 
+import ledger
+import month_aggregates
+
 class TransactionManager:
+    # Sortable columns; nullable ones are coalesced so keyset comparisons hold
+    SORT_FIELDS = {
+        'date': 't.date',
+        'price': 't.price',
+        'state': 't.state',
+        'bank_name': 't.bank_name',
+        'cost_center_name': "COALESCE(t.cost_center_name, '')",
+        'created_at': "COALESCE(t.created_at, '')"
+    }
+    # Sort fields with an ordered (field, rowid) index; see schema migration 4
+    INDEXED_SORT_FIELDS = ('date', 'price')
+    COUNT_CACHE_SIZE = 32
+    # Shortest search term the trigram index can answer
+    SEARCH_INDEX_MIN_LENGTH = 3
+    # Search matches listed as values; broader terms fall back to LIKE
+    SEARCH_MAX_VALUES = 500
+    # Below this many matching rows a search is driven by the column indexes:
+    # a page sorts all its matches, so it switches to walking the sort index
+    # much sooner than a count or aggregate, which has to visit every match
+    SEARCH_PAGE_INDEX_ROWS = 5000
+    SEARCH_SCAN_INDEX_ROWS = 200000
+
     def __init__(self, db_manager, auth_manager):
         self.db = db_manager
         self.auth = auth_manager
+        # (where sql, params) -> ((total_changes, data_version), count)
+        self._count_cache = {}
+        # Whether schema migration 6 could create the trigram index; read once
+        self._search_index = None
 
     def get_transactions_with_filters(self, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """List one page of transactions.
+
+        Pages are addressed either by `page` (LIMIT/OFFSET) or, when the client
+        sends back the `nextCursor`/`prevCursor` of the page it is showing, by
+        `cursor` (keyset: the index seeks straight to the page boundary, so deep
+        pages cost the same as the first one). The total count is cached until
+        the data changes and can be skipped with `include_count: false`.
+        """
         try:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
@@ -18,106 +59,82 @@ class TransactionManager:
             page = filters.get('page', 1)
             limit = filters.get('limit', 10)
             offset = (page - 1) * limit
+            include_count = filters.get('include_count', True)
             
-            # Extract sorting parameters
+            # Extract sorting parameters; id breaks ties so the order is total
             sort_field = filters.get('sort_field', 'date')
-            sort_direction = filters.get('sort_direction', 'desc')
+            if sort_field not in self.SORT_FIELDS:
+                sort_field = 'date'
+            sort_direction = 'ASC' if str(filters.get('sort_direction', 'desc')).lower() == 'asc' else 'DESC'
+            sort_expression = self.SORT_FIELDS[sort_field]
+            
+            # The search is probed once for both the page and the count, as far
+            # as the count needs when one is taken
+            search = None
+            if filters.get('search') and filters['search'].strip():
+                probe_rows = self.SEARCH_SCAN_INDEX_ROWS if include_count else self.SEARCH_PAGE_INDEX_ROWS
+                search = self._compile_search(filters['search'].strip(), probe_rows)
+            
+            where_sql, where_params = self._compile_filters(filters, paging=True, search=search)
+            filter_key = self._filter_key(where_sql, where_params)
             
-            # Build the base query
-            base_query = '''
+            # A cursor only applies to the filters and order it was issued for
+            cursor_token = self._decode_cursor(filters.get('cursor'))
+            if cursor_token and cursor_token[:3] != [sort_field, sort_direction, filter_key]:
+                cursor_token = None
+            
+            # CROSS JOIN keeps transactions as the outer loop so an indexed sort
+            # field is read in order instead of sorting every row of the user
+            join = 'CROSS JOIN' if sort_field in self.INDEXED_SORT_FIELDS else 'JOIN'
+            query = f'''
                 SELECT t.id, t.bank_name, t.account_name, t.price, t.state, t.fee,
                        t.cost_center_name, t.before_balance, t.after_balance, t.date,
-                       b.color as bank_color, t.created_at
+                       b.color as bank_color, t.created_at, {sort_expression}
                 FROM transactions t
-                JOIN bank b ON t.bank_id = b.id
-                WHERE b.user_id = ?
+                {join} bank b ON t.bank_id = b.id
+                WHERE {where_sql}
             '''
-            
-            query_params = [self.auth.current_user_id]
-            
-            # Apply filters
-            conditions = []
-            
-            # Search filter
-            if filters.get('search') and filters['search'].strip():
-                search_term = f"%{filters['search'].strip()}%"
-                conditions.append('''
-                    (t.cost_center_name LIKE ? OR 
-                     t.bank_name LIKE ? OR 
-                     t.account_name LIKE ?)
-                ''')
-                query_params.extend([search_term, search_term, search_term])
-            
-            # Date range filters
-            if filters.get('dateRange') and filters['dateRange'] != 'all':
-                date_condition = self._get_date_condition(filters['dateRange'])
-                if date_condition:
-                    conditions.append(date_condition)
-            
-            # Custom date range
-            if filters.get('startDate') and filters['startDate'].strip():
-                conditions.append('t.date >= ?')
-                query_params.append(filters['startDate'])
-            
-            if filters.get('endDate') and filters['endDate'].strip():
-                conditions.append('t.date <= ?')
-                query_params.append(filters['endDate'])
-            
-            # Bank filter
-            if filters.get('bank') and filters['bank'] != 'all':
-                conditions.append('t.bank_name = ?')
-                query_params.append(filters['bank'])
-            
-            # State filter (income/outgoing)
-            if filters.get('state') and filters['state'] != 'all':
-                conditions.append('t.state = ?')
-                query_params.append(filters['state'])
-            
-            # Cost center filter
-            if filters.get('costCenter') and filters['costCenter'] != 'all':
-                conditions.append('t.cost_center_name = ?')
-                query_params.append(filters['costCenter'])
-            
-            # Amount range filters
-            if filters.get('minAmount') and filters['minAmount']:
-                conditions.append('t.price >= ?')
-                query_params.append(float(filters['minAmount']))
-            
-            if filters.get('maxAmount') and filters['maxAmount']:
-                conditions.append('t.price <= ?')
-                query_params.append(float(filters['maxAmount']))
-            
-            # Add conditions to query
-            if conditions:
-                base_query += ' AND ' + ' AND '.join(conditions)
-            
-            # Add sorting
-            valid_sort_fields = ['date', 'price', 'state', 'bank_name', 'cost_center_name', 'created_at']
-            if sort_field in valid_sort_fields:
-                sort_direction = 'ASC' if sort_direction.lower() == 'asc' else 'DESC'
-                base_query += f' ORDER BY t.{sort_field} {sort_direction}'
-            else:
-                base_query += ' ORDER BY t.date DESC, t.created_at DESC'
-            
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # Get total count for pagination
-            count_query = base_query.replace(
-                'SELECT t.id, t.bank_name, t.account_name, t.price, t.state, t.fee, t.cost_center_name, t.before_balance, t.after_balance, t.date, b.color as bank_color, t.created_at',
-                'SELECT COUNT(*)'
-            ).split('ORDER BY')[0]  # Remove ORDER BY for count query
-            
-            cursor.execute(count_query, query_params)
-            result = cursor.fetchone()
-            total_count = result[0] if result is not None else 0
-            
-            # Get paginated results
-            paginated_query = base_query + ' LIMIT ? OFFSET ?'
-            query_params.extend([limit, offset])
-            
-            cursor.execute(paginated_query, query_params)
-            rows = cursor.fetchall()
+            query_params = list(where_params)
+            
+            backwards = False
+            if cursor_token:
+                boundary_value, boundary_id, position = cursor_token[3:]
+                backwards = position == 'before'
+                # Rows strictly after the boundary in the direction of travel
+                forward = (sort_direction == 'DESC') != backwards
+                comparison = '<' if forward else '>'
+                query += f'''
+                    AND {sort_expression} {comparison}= ?
+                    AND ({sort_expression} {comparison} ? OR t.id {comparison} ?)
+                '''
+                query_params.extend([boundary_value, boundary_value, boundary_id])
+            
+            order_direction = sort_direction
+            if backwards:
+                order_direction = 'ASC' if sort_direction == 'DESC' else 'DESC'
+            query += f' ORDER BY {sort_expression} {order_direction}, t.id {order_direction}'
+            
+            # One extra row tells whether there is another page in this direction
+            query += ' LIMIT ?'
+            query_params.append(limit + 1)
+            if not cursor_token and offset:
+                query += ' OFFSET ?'
+                query_params.append(offset)
+            
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+            
+                total_count = None
+                if include_count:
+                    total_count = self._count_transactions(conn, *self._compile_filters(filters, search=search))
+            
+                cursor.execute(query, query_params)
+                rows = cursor.fetchall()
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if backwards:
+                rows.reverse()
             
             transactions = []
             for row in rows:
@@ -136,10 +153,21 @@ class TransactionManager:
                     "created_at": row[11]
                 })
             
-            conn.close()
+            if backwards:
+                has_next, has_prev = True, has_more
+            else:
+                has_next, has_prev = has_more, bool(cursor_token) or page > 1
+            
+            cursor_prefix = [sort_field, sort_direction, filter_key]
+            next_cursor = prev_cursor = None
+            if rows:
+                if has_next:
+                    next_cursor = self._encode_cursor(cursor_prefix + [rows[-1][12], rows[-1][0], 'after'])
+                if has_prev:
+                    prev_cursor = self._encode_cursor(cursor_prefix + [rows[0][12], rows[0][0], 'before'])
             
             # Calculate pagination info
-            total_pages = (total_count + limit - 1) // limit
+            total_pages = (total_count + limit - 1) // limit if total_count is not None else None
             
             return {
                 "success": True,
@@ -149,8 +177,10 @@ class TransactionManager:
                     "totalPages": total_pages,
                     "totalItems": total_count,
                     "itemsPerPage": limit,
-                    "hasNext": page < total_pages,
-                    "hasPrev": page > 1
+                    "hasNext": has_next,
+                    "hasPrev": has_prev,
+                    "nextCursor": next_cursor,
+                    "prevCursor": prev_cursor
                 }
             }
             
@@ -161,6 +191,184 @@ class TransactionManager:
                     "trackback": traceback.format_exc()
                     }
 
+    def _compile_filters(self, filters: Dict[str, Any], paging: bool = False, search=None):
+        """Turn listing filters into a WHERE clause over transactions t JOIN bank b.
+
+        Returns (sql, params); the clause always restricts to the current user.
+        paging=True tunes a search for reading one sorted page rather than
+        every matching row (see _compile_search). search is a result of
+        _compile_search for the filters' term, compiled here when not given.
+        """
+        conditions = ['b.user_id = ?']
+        params = [self.auth.current_user_id]
+        
+        # Search filter: substring match over cost center, bank and account
+        if filters.get('search') and filters['search'].strip():
+            index_rows = self.SEARCH_PAGE_INDEX_ROWS if paging else self.SEARCH_SCAN_INDEX_ROWS
+            if search is None:
+                search = self._compile_search(filters['search'].strip(), index_rows)
+            (indexed_sql, indexed_params), unindexed, matching = search
+            selective = matching is not None and matching < index_rows
+            search_sql, search_params = (indexed_sql, indexed_params) if selective else unindexed
+            conditions.append(search_sql)
+            params.extend(search_params)
+            if selective:
+                # Let the search drive the join from transactions instead of
+                # walking every row of the user's banks
+                conditions[0] = '+b.user_id = ?'
+        
+        # Date range filters
+        if filters.get('dateRange') and filters['dateRange'] != 'all':
+            date_condition = self._get_date_condition(filters['dateRange'])
+            if date_condition:
+                conditions.append(date_condition)
+        
+        # Custom date range
+        if filters.get('startDate') and filters['startDate'].strip():
+            conditions.append('t.date >= ?')
+            params.append(filters['startDate'])
+        
+        if filters.get('endDate') and filters['endDate'].strip():
+            conditions.append('t.date <= ?')
+            params.append(filters['endDate'])
+        
+        # Bank filter
+        if filters.get('bank') and filters['bank'] != 'all':
+            conditions.append('t.bank_name = ?')
+            params.append(filters['bank'])
+        
+        # State filter (income/outgoing)
+        if filters.get('state') and filters['state'] != 'all':
+            conditions.append('t.state = ?')
+            params.append(filters['state'])
+        
+        # Cost center filter
+        if filters.get('costCenter') and filters['costCenter'] != 'all':
+            conditions.append('t.cost_center_name = ?')
+            params.append(filters['costCenter'])
+        
+        # Amount range filters
+        if filters.get('minAmount') and filters['minAmount']:
+            conditions.append('t.price >= ?')
+            params.append(float(filters['minAmount']))
+        
+        if filters.get('maxAmount') and filters['maxAmount']:
+            conditions.append('t.price <= ?')
+            params.append(float(filters['maxAmount']))
+        
+        return ' AND '.join(conditions), params
+
+    def _compile_search(self, term: str, probe_rows: int):
+        """Search conditions for a term, as (indexed, unindexed, matching).
+
+        The term is first matched against the distinct searched values
+        (search_values, schema migration 6): through the trigram index for 3+
+        characters, by LIKE over the small vocabulary for shorter terms and
+        when this SQLite has no trigram index.
+        Transactions are then filtered on the matched values, either through
+        the column indexes (indexed) or with them disabled by a unary +
+        (unindexed), so a listing walks its sort index and stops after one
+        page and an aggregate scans once; both are (sql, params). matching is
+        the number of rows the term matches, counted up to probe_rows, and
+        _compile_filters takes the indexed form when it is below the bound
+        for its query. It is None when the term is not matched through values,
+        and the two forms are then the same.
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            if self._search_index is None:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_values_fts'")
+                self._search_index = cursor.fetchone() is not None
+            if self._search_index and len(term) >= self.SEARCH_INDEX_MIN_LENGTH:
+                cursor.execute('''
+                    SELECT v.field, v.value FROM search_values v
+                    WHERE v.id IN (SELECT rowid FROM search_values_fts WHERE search_values_fts MATCH ?)
+                ''', ('"' + term.replace('"', '""') + '"',))
+            else:
+                cursor.execute("SELECT field, value FROM search_values WHERE value LIKE ? ESCAPE '\\'",
+                               ('%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',))
+            matches = cursor.fetchall()
+            
+            if not matches:
+                return ('0', []), ('0', []), None
+            if len(matches) > self.SEARCH_MAX_VALUES:
+                # Too many distinct values to list; matches this broad are
+                # best served by the scan anyway
+                like = f"%{term}%"
+                condition = ('''
+                    (t.cost_center_name LIKE ? OR
+                     t.bank_name LIKE ? OR
+                     t.account_name LIKE ?)
+                ''', [like, like, like])
+                return condition, condition, None
+            
+            values = {}
+            for field, value in matches:
+                values.setdefault(field, []).append(value)
+            
+            def condition(prefix):
+                parts, params = [], []
+                for field in ('cost_center_name', 'bank_name', 'account_name'):
+                    if field in values:
+                        parts.append(f"{prefix}t.{field} IN ({', '.join('?' * len(values[field]))})")
+                        params.extend(values[field])
+                return '(' + ' OR '.join(parts) + ')', params
+            
+            indexed_sql, indexed_params = condition('')
+            cursor.execute(f'''
+                SELECT COUNT(*) FROM (SELECT 1 FROM transactions t WHERE {indexed_sql} LIMIT ?)
+            ''', indexed_params + [probe_rows])
+            return (indexed_sql, indexed_params), condition('+'), cursor.fetchone()[0]
+
+    def _filter_key(self, where_sql: str, where_params) -> str:
+        """Short fingerprint of a compiled filter, used to tie cursors to it"""
+        digest = hashlib.sha1(json.dumps([where_sql, list(where_params)], default=str).encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _encode_cursor(self, token) -> str:
+        """Opaque, URL-safe form of a cursor token"""
+        return base64.urlsafe_b64encode(json.dumps(token).encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, value):
+        """Decode a cursor sent back by the client; anything malformed is ignored"""
+        if not value:
+            return None
+        try:
+            token = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        except (ValueError, TypeError, AttributeError):
+            return None
+        if not isinstance(token, list) or len(token) != 6 or token[5] not in ('after', 'before'):
+            return None
+        return token
+
+    def _count_transactions(self, conn, where_sql: str, where_params) -> int:
+        """COUNT(*) for a compiled filter, cached until the database changes.
+
+        The cache is keyed on the filter and validated against this connection's
+        total_changes and PRAGMA data_version, which move on any local or
+        external commit respectively, so paging through a result set only counts
+        once.
+        """
+        version = (conn.total_changes, conn.execute('PRAGMA data_version').fetchone()[0])
+        key = (where_sql, tuple(where_params))
+        cached = self._count_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        
+        cursor = conn.execute(f'''
+            SELECT COUNT(*)
+            FROM transactions t
+            JOIN bank b ON t.bank_id = b.id
+            WHERE {where_sql}
+        ''', where_params)
+        total_count = cursor.fetchone()[0]
+        
+        self._count_cache.pop(key, None)
+        self._count_cache[key] = (version, total_count)
+        while len(self._count_cache) > self.COUNT_CACHE_SIZE:
+            self._count_cache.pop(next(iter(self._count_cache)))
+        return total_count
+
     def _get_date_condition(self, date_range: str) -> Optional[str]:
         """Generate SQL condition for date range filters"""
         try:
@@ -192,25 +400,24 @@ class TransactionManager:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT DISTINCT id, bank_name, color
-                FROM bank 
-                WHERE user_id = ?
-                ORDER BY bank_name
-            ''', (self.auth.current_user_id,))
+                cursor.execute('''
+                    SELECT DISTINCT id, bank_name, color
+                    FROM bank 
+                    WHERE user_id = ?
+                    ORDER BY bank_name
+                ''', (self.auth.current_user_id,))
             
-            banks = []
-            for row in cursor.fetchall():
-                banks.append({
-                    "id": row[0],
-                    "bank_name": row[1],
-                    "color": row[2] or '#6B7280'
-                })
+                banks = []
+                for row in cursor.fetchall():
+                    banks.append({
+                        "id": row[0],
+                        "bank_name": row[1],
+                        "color": row[2] or '#6B7280'
+                    })
             
-            conn.close()
             return {"success": True, "banks": banks}
             
         except Exception as e:
@@ -226,26 +433,25 @@ class TransactionManager:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # Get cost centers from transactions (dynamic list)
-            cursor.execute('''
-                SELECT DISTINCT t.cost_center_name
-                FROM transactions t
-                JOIN bank b ON t.bank_id = b.id
-                WHERE b.user_id = ? AND t.cost_center_name IS NOT NULL AND t.cost_center_name != ''
-                ORDER BY t.cost_center_name
-            ''', (self.auth.current_user_id,))
-            
-            cost_centers = []
-            for row in cursor.fetchall():
-                cost_centers.append({
-                    "id": row[0],  # Using name as ID for simplicity
-                    "cost_center_name": row[0]
-                })
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+            
+                # Get cost centers from transactions (dynamic list)
+                cursor.execute('''
+                    SELECT DISTINCT t.cost_center_name
+                    FROM transactions t
+                    JOIN bank b ON t.bank_id = b.id
+                    WHERE b.user_id = ? AND t.cost_center_name IS NOT NULL AND t.cost_center_name != ''
+                    ORDER BY t.cost_center_name
+                ''', (self.auth.current_user_id,))
+            
+                cost_centers = []
+                for row in cursor.fetchall():
+                    cost_centers.append({
+                        "id": row[0],  # Using name as ID for simplicity
+                        "cost_center_name": row[0]
+                    })
             
-            conn.close()
             return {"success": True, "cost_centers": cost_centers}
             
         except Exception as e:
@@ -254,56 +460,58 @@ class TransactionManager:
                     "error": f"Failed to get cost center: {str(e)}",
                     "traceback": traceback.format_exc(),
                     }
-    def export_transactions(self, filters: Dict[str, Any] = None, format: str = 'csv') -> Dict[str, Any]:
-        """Export transactions to CSV or Excel"""
+    def export_transactions(self, filters: Dict[str, Any] = None, format: str = 'csv',
+                            file_path: Optional[str] = None, progress=None) -> Dict[str, Any]:
+        """Export transactions to CSV or Excel.
+
+        Every transaction matching the listing filters is exported, in the
+        listing's sort order, straight from the database cursor into the file
+        (see transaction_export), so memory does not grow with the export.
+        """
         try:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
-            # Get all transactions without pagination for export
-            export_filters = filters.copy() if filters else {}
-            export_filters.pop('page', None)
-            export_filters.pop('limit', None)
-            export_filters['limit'] = 999999
-            
-            result = self.get_transactions_with_filters(export_filters)
-            if not result['success']:
-                return result
-            
-            transactions = result['transactions']
+            import transaction_export
+
+            filters = filters or {}
+            where_sql, where_params = self._compile_filters(filters)
             
-            if not transactions:
+            sort_field = filters.get('sort_field', 'date')
+            if sort_field not in self.SORT_FIELDS:
+                sort_field = 'date'
+            sort_direction = 'ASC' if str(filters.get('sort_direction', 'desc')).lower() == 'asc' else 'DESC'
+            sort_expression = self.SORT_FIELDS[sort_field]
+            # As in the listing, an indexed sort field is walked in index order,
+            # which also spares a sort of the whole export
+            join = 'CROSS JOIN' if sort_field in self.INDEXED_SORT_FIELDS else 'JOIN'
+            
+            excel = format.lower() in ('excel', 'xlsx')
+            if not file_path:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                file_path = f"transactions_export_{timestamp}.{'xlsx' if excel else 'csv'}"
+            
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {transaction_export.EXPORT_SELECT}
+                    FROM transactions t
+                    {join} bank b ON t.bank_id = b.id
+                    WHERE {where_sql}
+                    ORDER BY {sort_expression} {sort_direction}, t.id {sort_direction}
+                ''', where_params)
+            
+                writer = transaction_export.write_xlsx if excel else transaction_export.write_csv
+                records_exported = writer(cursor, file_path, progress)
+            
+            if not records_exported:
+                os.remove(file_path)
                 return {"success": False, "error": "No transactions to export"}
             
-            # Convert to DataFrame
-            df = pd.DataFrame(transactions)
-            
-            # Format the data for export
-            df['amount'] = df.apply(lambda row: row['price'] if row['state'] == 'income' else -row['price'], axis=1)
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-            
-            # Select and reorder columns for export
-            export_columns = [
-                'date', 'bank_name', 'account_name', 'cost_center_name',
-                'state', 'amount', 'fee', 'before_balance', 'after_balance'
-            ]
-            df_export = df[export_columns]
-            
-            # Generate filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"transactions_export_{timestamp}"
-            
-            if format.lower() == 'excel':
-                filepath = f"{filename}.xlsx"
-                df_export.to_excel(filepath, index=False)
-            else:
-                filepath = f"{filename}.csv"
-                df_export.to_csv(filepath, index=False)
-            
             return {
                 "success": True,
-                "file_path": filepath,
-                "records_exported": len(transactions)
+                "file_path": file_path,
+                "records_exported": records_exported
             }
             
         except Exception as e:
@@ -312,62 +520,74 @@ class TransactionManager:
                     "error": f"Failed to export transactions: {str(e)}",
                     "traceback": traceback.format_exc(),
                     }
-    def get_transaction_statistics(self, filters: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Get transaction statistics for dashboard/summary"""
+
+    def get_transaction_statistics(self, filters: Dict[str, Any] = None, top_n: int = 5) -> Dict[str, Any]:
+        """Get transaction statistics for dashboard/summary.
+
+        Covers every transaction matching the listing filters (pagination keys
+        are ignored), aggregated in SQL by one grouped query that yields the
+        per-state totals and the top_n cost centers by amount.
+        """
         try:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
-            stats_filters = filters.copy() if filters else {}
-            stats_filters.pop('page', None)
-            stats_filters.pop('limit', None)
-            stats_filters['limit'] = 999999
-
-            result = self.get_transactions_with_filters(filters)
-            if not result['success']:
-                return result
-            
-            transactions = result['transactions']
-            
-            # Calculate statistics
-            total_income = sum(t['price'] for t in transactions if t['state'] == 'Income')
-            total_expenses = sum(t['price'] for t in transactions if t['state'] == 'Expense')
-            total_fees = sum(t['fee'] for t in transactions)
-            net_amount = total_income - total_expenses - total_fees
-            
-            income_count = len([t for t in transactions if t['state'] == 'Income'])
-            expense_count = len([t for t in transactions if t['state'] == 'Expense'])
-            
-            # Top categories by amount
-            category_totals = {}
-            for t in transactions:
-                category = t['cost_center_name'] or 'Uncategorized'
-                if category not in category_totals:
-                    category_totals[category] = {'amount': 0, 'count': 0}
-                category_totals[category]['amount'] += t['price']
-                category_totals[category]['count'] += 1
-            
-            top_categories = sorted(
-                category_totals.items(),
-                key=lambda x: x[1]['amount'],
-                reverse=True
-            )[:5]
+            
+            where_sql, where_params = self._compile_filters(filters or {})
+            
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+            
+                # One pass over the matching rows: the (state, cost center)
+                # groups are built once and rolled up both ways
+                cursor.execute(f'''
+                    WITH grouped AS MATERIALIZED (
+                        SELECT t.state AS state,
+                               COALESCE(NULLIF(t.cost_center_name, ''), 'Uncategorized') AS name,
+                               COUNT(*) AS count,
+                               COALESCE(SUM(t.price), 0) AS amount,
+                               COALESCE(SUM(t.fee), 0) AS fees
+                        FROM transactions t
+                        JOIN bank b ON t.bank_id = b.id
+                        WHERE {where_sql}
+                        GROUP BY t.state, name
+                    )
+                    SELECT 'state', state, SUM(count), SUM(amount), SUM(fees)
+                    FROM grouped
+                    GROUP BY state
+                    UNION ALL
+                    SELECT * FROM (
+                        SELECT 'category', name, SUM(count), SUM(amount), NULL
+                        FROM grouped
+                        GROUP BY name
+                        ORDER BY SUM(amount) DESC, name
+                        LIMIT ?
+                    )
+                ''', list(where_params) + [int(top_n)])
+                rows = cursor.fetchall()
+            
+            by_state = [row[1:] for row in rows if row[0] == 'state']
+            top_categories = [(name, amount, count) for kind, name, count, amount, _ in rows if kind == 'category']
+            totals = {state: (count, amount, fees) for state, count, amount, fees in by_state}
+            income_count, total_income, _ = totals.get('Income', (0, 0.0, 0.0))
+            expense_count, total_expenses, _ = totals.get('Expense', (0, 0.0, 0.0))
+            total_fees = sum(fees for _, _, fees in totals.values())
             
             return {
                 "success": True,
                 "statistics": {
-                    "total_income": total_income,
-                    "total_expenses": total_expenses,
-                    "total_fees": total_fees,
-                    "net_amount": net_amount,
+                    "total_income": float(total_income),
+                    "total_expenses": float(total_expenses),
+                    "total_fees": float(total_fees),
+                    "net_amount": float(total_income - total_expenses - total_fees),
                     "income_count": income_count,
                     "expense_count": expense_count,
-                    "total_transactions": len(transactions),
+                    "total_transactions": sum(count for count, _, _ in totals.values()),
                     "top_categories": [
                         {
-                            "name": cat[0],
-                            "amount": cat[1]['amount'],
-                            "count": cat[1]['count']
-                        } for cat in top_categories
+                            "name": name,
+                            "amount": float(amount),
+                            "count": count
+                        } for name, amount, count in top_categories
                     ]
                 }
             }
@@ -378,44 +598,38 @@ class TransactionManager:
                     "error": f"Failed to get statistics: {str(e)}",
                     "traceback": traceback.format_exc(),
                     }    
+
     def delete_transaction(self, transaction_id: int) -> Dict[str, Any]:
         """Delete a specific transaction"""
         try:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            # Verify transaction belongs to user
-            cursor.execute('''
-                SELECT t.id, t.bank_id, t.price, t.state, t.fee, t.before_balance
-                FROM transactions t
-                JOIN bank b ON t.bank_id = b.id
-                WHERE t.id = ? AND b.user_id = ?
-            ''', (transaction_id, self.auth.current_user_id))
+                # Verify transaction belongs to user
+                cursor.execute('''
+                    SELECT t.id, t.bank_id, t.price, t.state, t.fee, t.before_balance, t.date
+                    FROM transactions t
+                    JOIN bank b ON t.bank_id = b.id
+                    WHERE t.id = ? AND b.user_id = ?
+                ''', (transaction_id, self.auth.current_user_id))
             
-            transaction = cursor.fetchone()
-            if not transaction:
-                conn.close()
-                return {"success": False, "error": "Transaction not found"}
+                transaction = cursor.fetchone()
+                if not transaction:
+                    return {"success": False, "error": "Transaction not found"}
             
-            bank_id = transaction[1]
-            price = transaction[2]
-            state = transaction[3]
-            fee = transaction[4]
-            before_balance = transaction[5]
+                bank_id = transaction[1]
+                before_balance = transaction[5]
+                transaction_date = transaction[6]
             
-            # Delete transaction
-            cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+                # Delete transaction
+                cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+                month_aggregates.refresh_bank_months(cursor, bank_id, transaction_date)
             
-            # Restore bank balance to before transaction
-            cursor.execute('''
-                UPDATE bank SET current_balance = ? WHERE id = ?
-            ''', (before_balance, bank_id))
-            
-            conn.commit()
-            conn.close()
+                # Later rows and the bank balance lose the deleted movement
+                ledger.rechain(cursor, bank_id, transaction_date, transaction_id, opening=before_balance)
             
             return {"success": True, "message": "Transaction deleted successfully"}
             
@@ -425,135 +639,121 @@ class TransactionManager:
                     "error": f"Failed to delete transactions: {str(e)}",
                     "traceback": traceback.format_exc(),
                     }
-    def get_recent_transactions(self, limit=10):
-        """Get recent transactions for the current user"""
+    def check_ledger(self, repair: bool = False) -> Dict[str, Any]:
+        """Verify the running balances of the current user's banks.
+
+        Reports every bank whose before/after chain or current balance is
+        off; with repair=True those chains are rebuilt from the first broken
+        row on (see ledger).
+        """
         try:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            if repair:
+                with self.db.transaction() as conn:
+                    problems = ledger.repair(conn.cursor(), self.auth.current_user_id)
+            else:
+                with self.db.connection() as conn:
+                    problems = ledger.verify(conn.cursor(), self.auth.current_user_id)
             
-            cursor.execute('''
-                SELECT t.id, t.bank_name, t.account_name, t.price, t.state, t.fee,
-                       t.cost_center_name, t.before_balance, t.after_balance, t.date,
-                       b.color as bank_color
-                FROM transactions t
-                JOIN bank b ON t.bank_id = b.id
-                WHERE b.user_id = ?
-                ORDER BY t.date DESC, t.created_at DESC
-                LIMIT ?
-            ''', (self.auth.current_user_id, limit))
+            return {
+                "success": True,
+                "consistent": not problems,
+                "repaired": repair and bool(problems),
+                "banks": problems
+            }
             
-            transactions = []
-            for row in cursor.fetchall():
-                transactions.append({
-                    "id": row[0],
-                    "bank_name": row[1],
-                    "account_name": row[2],
-                    "price": row[3],
-                    "state": row[4],
-                    "fee": row[5],
-                    "cost_center_name": row[6],
-                    "before_balance": row[7],
-                    "after_balance": row[8],
-                    "date": row[9],
-                    "bank_color": row[10]
-                })
+        except Exception as e:
+            return {"success": False, "error": f"Failed to check balances: {str(e)}"}
+
+    def get_recent_transactions(self, limit=10):
+        """Get recent transactions for the current user"""
+        try:
+            if not self.auth.current_user_id:
+                return {"success": False, "error": "User not authenticated"}
+            
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute('''
+                    SELECT t.id, t.bank_name, t.account_name, t.price, t.state, t.fee,
+                           t.cost_center_name, t.before_balance, t.after_balance, t.date,
+                           b.color as bank_color
+                    FROM transactions t
+                    JOIN bank b ON t.bank_id = b.id
+                    WHERE b.user_id = ?
+                    ORDER BY t.date DESC, t.created_at DESC
+                    LIMIT ?
+                ''', (self.auth.current_user_id, limit))
+            
+                transactions = []
+                for row in cursor.fetchall():
+                    transactions.append({
+                        "id": row[0],
+                        "bank_name": row[1],
+                        "account_name": row[2],
+                        "price": row[3],
+                        "state": row[4],
+                        "fee": row[5],
+                        "cost_center_name": row[6],
+                        "before_balance": row[7],
+                        "after_balance": row[8],
+                        "date": row[9],
+                        "bank_color": row[10]
+                    })
             
-            conn.close()
             return {"success": True, "transactions": transactions}
             
         except Exception as e:
             return {"success": False, "error": f"Failed to get transactions: {str(e)}"}
     
-    def import_transactions_from_file(self, file_path):
-        """Import transactions from Excel or CSV file"""
+    # Row errors returned by a streaming import; the rest are only counted
+    MAX_REPORTED_ERRORS = 100
+
+    def import_transactions_from_file(self, file_path, stream=False, chunk_size=50000, progress=None,
+                                      on_conflict='skip', dry_run=False):
+        """Import transactions from Excel or CSV file.
+
+        With stream=True the file is read and committed chunk_size rows at a
+        time so memory stays flat whatever the file size; progress, when given,
+        is called with a running summary after every chunk.
+
+        Rows already imported before (same import fingerprint) are skipped, so
+        re-running an overlapping statement only adds what is new. Rows that
+        look like a different version of a stored transaction are held back
+        as conflicts unless on_conflict is 'insert'.
+
+        With dry_run=True nothing is written: the file is validated and the
+        per-bank effect of importing it is returned instead (see _preview_import).
+        """
         try:
             if not self.auth.current_user_id:
                 return {"success": False, "error": "User not authenticated"}
             
+            import transaction_import
+
+            if dry_run:
+                return self._preview_import(file_path, on_conflict)
+
+            if stream:
+                return self._import_transactions_streaming(file_path, chunk_size, progress, on_conflict)
+
             # Read file based on extension
-            if file_path.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
-            elif file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            else:
+            df = transaction_import.read_statement(file_path)
+            if df is None:
                 return {"success": False, "error": "Unsupported file format"}
             
             # Expected columns: date, bank_name, account_name, price, state, fee, cost_center_name
-            required_columns = ['date', 'bank_name', 'account_name', 'price', 'state']
-            
-            # Check if required columns exist
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            missing_columns = transaction_import.missing_columns(df)
             if missing_columns:
                 return {"success": False, "error": f"Missing required columns: {', '.join(missing_columns)}"}
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                outcome, errors = transaction_import.import_frame(
+                    conn.cursor(), self.auth.current_user_id, df, on_conflict=on_conflict)
             
-            imported_count = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # Get or create bank account
-                    cursor.execute('''
-                        SELECT id, current_balance FROM bank 
-                        WHERE bank_name = ? AND account = ? AND user_id = ?
-                    ''', (row['bank_name'], row['account_name'], self.auth.current_user_id))
-                    
-                    bank_result = cursor.fetchone()
-                    if not bank_result:
-                        # Create bank account if it doesn't exist
-                        cursor.execute('''
-                            INSERT INTO bank (bank_name, account, current_balance, user_id, role)
-                            VALUES (?, ?, 0.0, ?, 'checking')
-                        ''', (row['bank_name'], row['account_name'], self.auth.current_user_id))
-                        bank_id = cursor.lastrowid
-                        current_balance = 0.0
-                    else:
-                        bank_id = bank_result[0]
-                        current_balance = bank_result[1]
-                    
-                    # Calculate balances
-                    price = float(row['price'])
-                    fee = float(row.get('fee', 0))
-                    state = row['state'].lower()
-                    
-                    before_balance = current_balance
-                    if state == 'Income':
-                        after_balance = before_balance + price 
-                    else:  # outgoing
-                        after_balance = before_balance - price 
-                    
-                    # Insert transaction
-                    cursor.execute('''
-                        INSERT INTO transactions (
-                            bank_id, bank_name, account_name, price, state, fee,
-                            cost_center_name, before_balance, after_balance, date
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        bank_id, row['bank_name'], row['account_name'], price, state, fee,
-                        row.get('cost_center_name', ''), before_balance, after_balance,
-                        pd.to_datetime(row['date']).date()
-                    ))
-                    
-                    # Update bank balance
-                    cursor.execute('''
-                        UPDATE bank SET current_balance = ? WHERE id = ?
-                    ''', (after_balance, bank_id))
-                    
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Row {index + 1}: {str(e)}")
-                    continue
-            
-            conn.commit()
-            conn.close()
-            
-            result = {"success": True, "imported_count": imported_count}
+            result = {"success": True, "failed_count": len(errors), **self._import_counts(outcome)}
             if errors:
                 result["errors"] = errors
             
@@ -561,22 +761,202 @@ class TransactionManager:
             
         except Exception as e:
             return {"success": False, "error": f"Failed to import transactions: {str(e)}"}
-    
+
+    def _preview_import(self, file_path, on_conflict='skip'):
+        """Validate a statement and preview its import without writing anything.
+
+        Every problem is reported with the row numbers it affects, and the
+        valid rows are classified and summed per bank as the real import
+        would, inside a read transaction that is rolled back.
+        """
+        import transaction_import
+
+        df = transaction_import.read_statement(file_path)
+        if df is None:
+            return {"success": False, "error": "Unsupported file format"}
+
+        result = {"success": True, "dry_run": True, "total_rows": len(df)}
+        missing_columns = transaction_import.missing_columns(df)
+        if missing_columns:
+            result.update(can_import=False, missing_columns=missing_columns, issues=[], banks=[])
+            return result
+
+        frame, problems = transaction_import.check_frame(df)
+        invalid = transaction_import.blocking_mask(problems, len(frame))
+        valid = transaction_import.valid_rows(frame, invalid)
+
+        with self.db.shared_connection(snapshot=True) as conn:
+            banks = transaction_import.preview_import(conn.cursor(), self.auth.current_user_id, valid, on_conflict)
+
+        result.update(
+            can_import=sum(bank["new_rows"] for bank in banks) > 0,
+            valid_rows=len(valid),
+            invalid_rows=int(invalid.sum()),
+            new_rows=sum(bank["new_rows"] for bank in banks),
+            skipped_rows=sum(bank["skipped_rows"] for bank in banks),
+            conflicting_rows=sum(bank["conflicting_rows"] for bank in banks),
+            issues=transaction_import.describe_problems(df, frame, problems),
+            banks=banks
+        )
+        return result
+
+    def _import_counts(self, outcome):
+        """Result fields for an import outcome; imported_count is what was inserted"""
+        counts = {
+            "imported_count": outcome["inserted"],
+            "skipped_count": outcome["skipped"],
+            "conflicting_count": outcome["conflicting"]
+        }
+        if outcome["conflicts"]:
+            counts["conflicts"] = outcome["conflicts"][:self.MAX_REPORTED_ERRORS]
+        return counts
+
+    def _import_transactions_streaming(self, file_path, chunk_size, progress=None, on_conflict='skip'):
+        """Import a statement one chunk per transaction.
+
+        Each chunk is chained in file order against the balances the previous
+        chunk committed, then rechained in (date, id) order as it is written,
+        so every committed chunk leaves the ledger consistent and the result
+        matches a bulk import of the same file. A failure stops the import;
+        the chunks already committed stay.
+        """
+        import transaction_import
+
+        if not file_path.endswith(('.csv', '.xlsx', '.xls')):
+            return {"success": False, "error": "Unsupported file format"}
+
+        started = time.perf_counter()
+        summary = {"rows_done": 0, "rows_imported": 0, "rows_skipped": 0, "rows_conflicting": 0,
+                   "rows_failed": 0, "chunks": 0, "rows_per_second": 0.0}
+        errors = []
+        conflicts = []
+        occurrences = transaction_import.OccurrenceCounter()
+        stored_up_to = None
+
+        try:
+            for chunk in transaction_import.iter_statement_chunks(file_path, max(1, int(chunk_size))):
+                if summary["chunks"] == 0:
+                    missing_columns = transaction_import.missing_columns(chunk)
+                    if missing_columns:
+                        return {"success": False,
+                                "error": f"Missing required columns: {', '.join(missing_columns)}"}
+            
+                with self.db.transaction() as conn:
+                    cursor = conn.cursor()
+                    if stored_up_to is None:
+                        stored_up_to = transaction_import.last_transaction_id(cursor)
+                    outcome, chunk_errors = transaction_import.import_frame(
+                        cursor, self.auth.current_user_id, chunk,
+                        first_row=summary["rows_done"] + 1, sort_by_date=False,
+                        occurrences=occurrences, on_conflict=on_conflict, stored_up_to=stored_up_to)
+            
+                summary["chunks"] += 1
+                summary["rows_done"] += len(chunk)
+                summary["rows_imported"] += outcome["inserted"]
+                summary["rows_skipped"] += outcome["skipped"]
+                summary["rows_conflicting"] += outcome["conflicting"]
+                summary["rows_failed"] += len(chunk_errors)
+                summary["rows_per_second"] = round(summary["rows_done"] / max(time.perf_counter() - started, 1e-9), 1)
+                errors.extend(chunk_errors[:self.MAX_REPORTED_ERRORS - len(errors)])
+                conflicts.extend(outcome["conflicts"][:self.MAX_REPORTED_ERRORS - len(conflicts)])
+            
+                if progress:
+                    progress(dict(summary, action="import_transactions", file_path=file_path))
+        except Exception as e:
+            return {"success": False,
+                    "error": f"Failed to import transactions: {str(e)}",
+                    "imported_count": summary["rows_imported"],
+                    "progress": summary}
+
+        result = {
+            "success": True,
+            "imported_count": summary["rows_imported"],
+            "skipped_count": summary["rows_skipped"],
+            "conflicting_count": summary["rows_conflicting"],
+            "failed_count": summary["rows_failed"],
+            "progress": summary
+        }
+        if errors:
+            result["errors"] = errors
+        if conflicts:
+            result["conflicts"] = conflicts
+        return result
+
+    def import_transactions_from_files(self, file_paths, max_workers=None, progress=None, on_conflict='skip'):
+        """Import many statement files, every sheet of each workbook, at once.
+
+        Files are parsed in parallel worker processes; the parsed rows are then
+        merged per bank in date order and written in one transaction, so the
+        chained balances do not depend on which worker finished first. A file
+        that cannot be read fails the whole import before anything is written;
+        sheets without the required columns are skipped and reported.
+        """
+        try:
+            if not self.auth.current_user_id:
+                return {"success": False, "error": "User not authenticated"}
+
+            import transaction_import
+
+            started = time.perf_counter()
+            summary = {"files_done": 0, "files_total": len(file_paths), "rows_done": 0}
+
+            def on_parsed(parsed):
+                summary["files_done"] += 1
+                summary["rows_done"] += parsed["rows"]
+                if progress:
+                    progress(dict(summary, action="import_transaction_files", file_path=parsed["file_path"]))
+
+            results = transaction_import.parse_sources(list(file_paths), max_workers, on_parsed)
+
+            unreadable = [parsed["error"] for parsed in results if "error" in parsed]
+            if unreadable:
+                return {"success": False, "error": "Failed to read statements", "errors": unreadable}
+
+            skipped = [message for parsed in results for message in parsed["skipped"]]
+            if not any(parsed["sheets"] for parsed in results):
+                return {"success": False, "error": "No sheet has the required columns", "errors": skipped}
+
+            frame = transaction_import.merge_parsed(results)
+            with self.db.transaction() as conn:
+                outcome = transaction_import.import_prepared(
+                    conn.cursor(), self.auth.current_user_id, frame, on_conflict=on_conflict)
+
+            errors = [message for parsed in results for message in parsed["errors"]]
+            result = {
+                "success": True,
+                "failed_count": len(errors),
+                **self._import_counts(outcome),
+                "files": [{
+                    "file_path": parsed["file_path"],
+                    "sheets": parsed["sheets"],
+                    "rows": parsed["rows"],
+                    "failed": len(parsed["errors"]),
+                } for parsed in results],
+                "elapsed_seconds": round(time.perf_counter() - started, 3)
+            }
+            if errors:
+                result["errors"] = errors[:self.MAX_REPORTED_ERRORS]
+            if skipped:
+                result["skipped_sheets"] = skipped
+            return result
+
+        except Exception as e:
+            return {"success": False, "error": f"Failed to import transactions: {str(e)}"}
+
     def calculate_total_balance(self):
         """Calculate total balance across all user's bank accounts"""
         try:
             if not self.auth.current_user_id:
                 return 0.0
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT SUM(current_balance) FROM bank WHERE user_id = ?
-            ''', (self.auth.current_user_id,))
+                cursor.execute('''
+                    SELECT SUM(current_balance) FROM bank WHERE user_id = ?
+                ''', (self.auth.current_user_id,))
             
-            result = cursor.fetchone()
-            conn.close()
+                result = cursor.fetchone()
             
             return result[0] if result[0] is not None else 0.0
             
@@ -590,16 +970,15 @@ class TransactionManager:
             if not self.auth.current_user_id:
                 return 0.0
             
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT SUM(current_balance) FROM bank 
-                WHERE user_id = ? AND role != 'business'
-            ''', (self.auth.current_user_id,))
+                cursor.execute('''
+                    SELECT SUM(current_balance) FROM bank 
+                    WHERE user_id = ? AND role != 'business'
+                ''', (self.auth.current_user_id,))
             
-            result = cursor.fetchone()
-            conn.close()
+                result = cursor.fetchone()
             
             return result[0] if result[0] is not None else 0.0
             